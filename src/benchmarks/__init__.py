@@ -0,0 +1,9 @@
+"""
+Performance benchmarks of the transcription pipeline
+
+Every benchmark is a module, that runs as a script and writes machine-readable results,
+which can be compared with results of another commit:
+
+    python -m src.benchmarks.preprocessing --output before.json
+    python -m src.benchmarks.preprocessing --compare before.json
+"""
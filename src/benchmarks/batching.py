@@ -0,0 +1,186 @@
+"""
+Batched inference benchmark
+
+Cuts a sample recording into short clips and transcribes them one by one and in batches of several sizes,
+reporting throughput, speedup over sequential transcription and the share of clips, which batched
+transcripts are identical to sequential ones:
+
+    python -m src.benchmarks.batching sample.mp3 --model tiny --clips 32 --batch-sizes 1 4 8 16 --output results.json
+
+Batch size 1 is sequential transcription, that the others are compared with.
+Pass `--compare` with results of another commit to find regressions, exit code is non-zero if any is found
+"""
+
+import argparse
+from dataclasses import asdict, dataclass
+from pathlib import Path
+import sys
+from time import perf_counter
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from src.transcriber.audio_processor import AudioPreprocessor
+from src.transcriber.schemas import ModelSettings
+from src.transcriber.spool import AudioSpool
+from src.transcriber.transcriber import Transcriber
+from .report import Report, write_regressions
+
+
+@dataclass
+class CaseResult:
+    batch_size: int
+    clips: int
+    elapsed_s: float = 0.0  #: Time to transcribe all clips
+    per_file_ms: float = 0.0  #: Transcription time per clip
+    files_per_s: float = 0.0
+    speedup: float = 1.0  #: Sequential transcription time divided by batched one
+    identical: float = 1.0  #: Share of clips, which transcripts are the same as sequential ones
+
+
+def cut_clips(audio: np.ndarray, count: int, duration: float, sr: int = 16_000) -> List[np.ndarray]:
+    """
+    Cuts consecutive clips from audio, starting over, if audio is too short
+
+    :param audio: audio data
+    :param count: clips count
+    :param duration: clip duration, seconds
+    :param sr: sample rate
+    :return: clips
+    """
+    length = int(duration * sr)
+    if len(audio) < length:
+        audio = np.tile(audio, length // max(1, len(audio)) + 1)
+    starts = range(0, len(audio) - length + 1, length)
+    return [np.ascontiguousarray(audio[starts[i % len(starts)] :][:length]) for i in range(count)]
+
+
+def run_case(
+    transcriber: Transcriber, clips: List[np.ndarray], preset: ModelSettings, batch_size: int
+) -> List[Transcriber.Transcription]:
+    """
+    Transcribes clips in batches
+
+    :param transcriber: transcriber with loaded model
+    :param clips: audio clips
+    :param preset: transcription settings
+    :param batch_size: clips per batch, 1 to transcribe clips one by one
+    :return: transcriptions of clips
+    """
+    if batch_size == 1:
+        return [transcriber.transcribe(clip, preset, Path(f"clip{i}"))[0] for i, clip in enumerate(clips)]
+
+    transcriptions = []
+    for start in range(0, len(clips), batch_size):
+        items = [(clip, preset, Path(f"clip{start + i}"), None) for i, clip in enumerate(clips[start : start + batch_size])]
+        for result in transcriber.transcribe_batch(items):
+            if isinstance(result, BaseException):
+                raise result
+            transcriptions.append(result[0])
+    return transcriptions
+
+
+def get_parser() -> argparse.ArgumentParser:
+    """
+    Creates command line arguments parser
+
+    :return: parser
+    """
+    parser = argparse.ArgumentParser(prog="python -m src.benchmarks.batching", description=__doc__.split("\n\n")[0])
+    parser.add_argument("sample", type=Path, help="recording to cut clips from")
+    parser.add_argument(
+        "--model",
+        choices=[model.name for model in Transcriber.load_available_models()],
+        default="tiny",
+        help="model to transcribe with (default: %(default)s)",
+    )
+    parser.add_argument("--int8", action="store_true", help="use model with int8 quantized linear layers")
+    parser.add_argument(
+        "--preset",
+        choices=[preset.name for preset in Transcriber.load_model_settings_presets()],
+        default="universal",
+        help="preprocessing and transcription preset (default: %(default)s)",
+    )
+    parser.add_argument("-l", "--language", choices=list(Transcriber.load_available_languages()), help="audio language code")
+    parser.add_argument("--clips", type=int, default=32, help="clips count (default: %(default)s)")
+    parser.add_argument("--clip-duration", type=float, default=8.0, help="clip duration, seconds (default: %(default)s)")
+    parser.add_argument(
+        "--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16], help="batch sizes to measure (default: %(default)s)"
+    )
+    parser.add_argument("-o", "--output", type=Path, help="file to write JSON results to")
+    parser.add_argument("--compare", type=Path, help="JSON results to compare with, e.g. of the previous commit")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="relative growth considered a regression (default: %(default)s)"
+    )
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    if args.clips < 1 or any(size < 1 for size in args.batch_sizes):
+        parser.error("clips count and batch sizes must be positive")
+    if not 0 < args.clip_duration <= 30:
+        parser.error("clip duration must be within a single 30 seconds window")
+    if not args.sample.is_file():
+        parser.error(f"sample recording not found: {args.sample}")
+
+    preset = next(preset for preset in Transcriber.load_model_settings_presets() if preset.name == args.preset)
+    preset = preset.model_copy(update={"language": args.language})
+    report = Report(
+        benchmark="batching",
+        key=("batch_size",),
+        metrics=("per_file_ms",),
+        parameters={name: value for name, value in vars(args).items() if name not in ("output", "compare")},
+    )
+    report.parameters["sample"] = str(args.sample)
+
+    spool = AudioSpool()
+    try:
+        audio = np.array(AudioPreprocessor(spool)(args.sample, preset, 16_000).audio.open())
+    finally:
+        spool.clear()
+    clips = cut_clips(audio, args.clips, args.clip_duration)
+
+    transcriber = Transcriber()
+    model = next(model for model in transcriber.available_models if model.name == args.model)
+    transcriber.model = transcriber.load_model(model.model_copy(update={"quantized": args.int8}))
+    # The first transcription warms up torch kernels, so that it is not accounted in sequential time
+    transcriber.transcribe(clips[0], preset, Path("warmup"))
+
+    sequential: Optional[CaseResult] = None
+    reference: List[Transcriber.Transcription] = []
+    for batch_size in sorted(set(args.batch_sizes) | {1}):
+        start = perf_counter()
+        transcriptions = run_case(transcriber, clips, preset, batch_size)
+        elapsed = perf_counter() - start
+
+        result = CaseResult(
+            batch_size, len(clips), elapsed, elapsed / len(clips) * 1_000, len(clips) / elapsed if elapsed > 0 else 0.0
+        )
+        if sequential is None:
+            sequential, reference = result, transcriptions
+        else:
+            result.speedup = sequential.elapsed_s / elapsed
+            result.identical = sum(
+                transcription.text == expected.text for transcription, expected in zip(transcriptions, reference, strict=True)
+            ) / len(clips)
+        report.results.append(asdict(result))
+        sys.stderr.write(
+            f"batch {batch_size}: {result.files_per_s:.2f} files/s, {result.speedup:.2f}x, {result.identical:.0%} identical\n"
+        )
+
+    report.write_table(["batch_size", "clips", "elapsed_s", "per_file_ms", "files_per_s", "speedup", "identical"])
+    if args.output is not None:
+        report.save(args.output)
+
+    if args.compare is not None:
+        baseline = Report.load(args.compare)
+        regressions = report.compare(baseline, args.threshold)
+        write_regressions(regressions, baseline)
+        return 1 if len(regressions) > 0 else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
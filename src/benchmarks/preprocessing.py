@@ -0,0 +1,268 @@
+"""
+Audio preprocessing benchmark
+
+Generates synthetic speech-like recordings of several sample rates, channel counts, durations and formats,
+preprocesses every recording with every preset and reports real-time factor, peak memory and time of every stage:
+
+    python -m src.benchmarks.preprocessing --durations 60 3600 14400 --output results.json
+
+Stage times are the ones, that audio preprocessor records for the transcription engine.
+Every case runs in a fresh process, so that peak memory of one case does not hide the others.
+Pass `--compare` with results of another commit to find regressions, exit code is non-zero if any is found
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+import multiprocessing
+from pathlib import Path
+import sys
+from tempfile import TemporaryDirectory
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import soundfile as sf
+
+from src.transcriber.audio_processor import AudioPreprocessor
+from src.transcriber.schemas import ModelSettings
+from src.transcriber.spool import AudioSpool
+from src.transcriber.timing import timed
+from src.transcriber.transcriber import Transcriber
+from src.transcriber.worker import peak_rss
+from .report import Report, write_regressions
+
+
+#: Sound file subtype of every benchmarked format
+FORMATS = {"wav": "PCM_16", "flac": "PCM_16", "ogg": "VORBIS"}
+
+
+def synthesize(path: Path, sr: int, channels: int, duration: float, seed: int = 0, block_s: int = 10) -> Path:
+    """
+    Writes speech-like recording: voiced bursts of harmonics with syllable rate envelope,
+    separated by pauses, over background noise and mains hum
+
+    Recording is generated and written by blocks, so that long recordings fit in memory
+
+    :param path: output file, its suffix defines format
+    :param sr: sample rate
+    :param channels: channels count
+    :param duration: recording duration, seconds
+    :param seed: random generator seed
+    :param block_s: block duration, seconds
+    :return: output file
+    """
+    rng = np.random.default_rng(seed)
+    frames = int(duration * sr)
+
+    # Alternate speech and pause segments, seconds
+    bounds, voiced, position = [0.0], [], 0.0
+    while position < duration:
+        is_voiced = len(voiced) % 2 == 0
+        position += rng.uniform(1.5, 6.0) if is_voiced else rng.uniform(0.3, 2.0)
+        bounds.append(position)
+        voiced.append(is_voiced)
+    bounds = np.array(bounds)
+    pitches = rng.uniform(100, 240, size=len(voiced))
+
+    with sf.SoundFile(path, mode="w", samplerate=sr, channels=channels, subtype=FORMATS[path.suffix[1:]]) as file:
+        for start in range(0, frames, block_s * sr):
+            t = np.arange(start, min(start + block_s * sr, frames)) / sr
+            segment = np.searchsorted(bounds, t, side="right") - 1
+            is_voiced = np.array(voiced)[segment]
+            pitch = pitches[segment]
+
+            speech = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+            envelope = 0.5 * (1 - np.cos(2 * np.pi * 4 * t))  # About 4 syllables per second
+            signal = 0.3 * speech * envelope * is_voiced
+            signal += 0.05 * np.sin(2 * np.pi * 50 * t) + 0.005 * rng.standard_normal(len(t))
+
+            block = np.repeat(signal[:, np.newaxis], channels, axis=1)
+            block[:, 1:] *= 0.8
+            block[:, 1:] += 0.005 * rng.standard_normal((len(t), channels - 1))
+            file.write(np.clip(block, -1, 1).astype(np.float32))
+    return path
+
+
+@dataclass
+class CaseResult:
+    """
+    Preprocessing measurements of a single recording with a single preset
+    """
+
+    preset: str
+    format: str
+    sr: int
+    channels: int
+    duration: float  #: Recording duration, seconds
+    elapsed: float = 0.0  #: Preprocessing time, seconds
+    rtf: float = 0.0  #: Real-time factor: preprocessing time divided by recording duration
+    peak_rss_mb: Optional[float] = None  #: Peak memory of the process
+    base_rss_mb: Optional[float] = None  #: Memory of the process before preprocessing
+    rss_increase_mb: Optional[float] = None  #: Peak memory growth during preprocessing over the peak before it
+    kept_duration: float = 0.0  #: Duration of audio left after silence removal, seconds
+    chunks: int = 0  #: Chunks count, that audio is split into
+    stages: Dict[str, float] = field(default_factory=dict)  #: Stage -> time, seconds
+
+    def to_dict(self) -> Dict[str, object]:
+        """
+        Flattens result for report, stage times become `<stage>_s` fields
+        """
+        data = asdict(self)
+        data.update({f"{stage}_s": elapsed for stage, elapsed in data.pop("stages").items()})
+        return data
+
+
+def megabytes(value: Optional[int]) -> Optional[float]:
+    return value / 1024**2 if value is not None else None
+
+
+def run_case(path: Path, preset: ModelSettings, target_sr: int = 16_000) -> Dict[str, object]:
+    """
+    Preprocesses recording once, the same way the transcription engine does.
+    Runs in a separate process
+
+    :param path: recording
+    :param preset: preset to take preprocessing settings from
+    :param target_sr:
+    :return: measurements
+    """
+    base_rss = peak_rss()
+    spool = AudioSpool()
+    try:
+        prepared, elapsed = timed(AudioPreprocessor(spool), path, preset, target_sr)
+    finally:
+        spool.clear()
+
+    return {
+        "elapsed": elapsed,
+        "peak_rss": peak_rss(),
+        "base_rss": base_rss,
+        "kept_duration": prepared.audio.duration,
+        "chunks": len(prepared.chunks),
+        "stages": prepared.timings,
+    }
+
+
+def measure(path: Path, preset: ModelSettings, result: CaseResult, repeat: int = 1) -> CaseResult:
+    """
+    Runs the case in fresh processes and keeps the fastest run time and the largest memory usage
+
+    :param path: recording
+    :param preset: preset
+    :param result: case description to fill with measurements
+    :param repeat: runs count
+    :return: filled result
+    """
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            run = pool.submit(run_case, path, preset).result()
+
+        if result.elapsed == 0.0 or run["elapsed"] < result.elapsed:
+            result.elapsed = run["elapsed"]
+            result.stages = run["stages"]
+        if run["peak_rss"] is not None:
+            result.peak_rss_mb = max(result.peak_rss_mb or 0.0, megabytes(run["peak_rss"]))
+            result.base_rss_mb = megabytes(run["base_rss"])
+            result.rss_increase_mb = max(result.rss_increase_mb or 0.0, megabytes(run["peak_rss"] - run["base_rss"]))
+        result.kept_duration = run["kept_duration"]
+        result.chunks = run["chunks"]
+
+    result.rtf = result.elapsed / result.duration
+    return result
+
+
+def get_parser() -> argparse.ArgumentParser:
+    """
+    Creates command line arguments parser
+
+    :return: parser
+    """
+    parser = argparse.ArgumentParser(prog="python -m src.benchmarks.preprocessing", description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--durations", type=float, nargs="+", default=[60, 600], help="recording durations, seconds (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--sample-rates", type=int, nargs="+", default=[16_000, 48_000], help="recording sample rates (default: %(default)s)"
+    )
+    parser.add_argument("--channels", type=int, nargs="+", default=[1, 2], help="recording channels (default: %(default)s)")
+    parser.add_argument(
+        "--formats", nargs="+", choices=list(FORMATS), default=["wav", "flac"], help="recording formats (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--presets",
+        nargs="+",
+        choices=[preset.name for preset in Transcriber.load_model_settings_presets()],
+        help="presets to run (default: all)",
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="runs of every case (default: %(default)s)")
+    parser.add_argument("--audio-dir", type=Path, help="directory to keep generated recordings in for further runs")
+    parser.add_argument("-o", "--output", type=Path, help="file to write JSON results to")
+    parser.add_argument("--compare", type=Path, help="JSON results to compare with, e.g. of the previous commit")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="relative growth considered a regression (default: %(default)s)"
+    )
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    if args.repeat < 1:
+        parser.error("repeat count must be positive")
+
+    presets = [
+        preset for preset in Transcriber.load_model_settings_presets() if args.presets is None or preset.name in args.presets
+    ]
+    report = Report(
+        benchmark="preprocessing",
+        key=("preset", "format", "sr", "channels", "duration"),
+        metrics=("rtf", "peak_rss_mb"),
+        parameters={name: value for name, value in vars(args).items() if name not in ("audio_dir", "output", "compare")},
+    )
+
+    with TemporaryDirectory() as tmp_dir:
+        audio_dir = args.audio_dir or Path(tmp_dir)
+        audio_dir.mkdir(parents=True, exist_ok=True)
+        for duration in args.durations:
+            for sr in args.sample_rates:
+                for channels in args.channels:
+                    for audio_format in args.formats:
+                        path = audio_dir / f"synthetic_{duration:g}s_{sr}hz_{channels}ch.{audio_format}"
+                        if not path.exists():
+                            synthesize(path, sr, channels, duration)
+                        for preset in presets:
+                            result = CaseResult(preset.name, audio_format, sr, channels, duration)
+                            report.results.append(measure(path, preset, result, args.repeat).to_dict())
+                            sys.stderr.write(f"{path.name} {preset.name}: rtf {result.rtf:.4f}\n")
+
+    report.write_table(
+        [
+            "preset",
+            "format",
+            "sr",
+            "channels",
+            "duration",
+            "rtf",
+            "peak_rss_mb",
+            "rss_increase_mb",
+            "decode_s",
+            "resample_s",
+            "filter_s",
+            "normalize_s",
+            "vad_s",
+        ]
+    )
+    if args.output is not None:
+        report.save(args.output)
+
+    if args.compare is not None:
+        baseline = Report.load(args.compare)
+        regressions = report.compare(baseline, args.threshold)
+        write_regressions(regressions, baseline)
+        return 1 if len(regressions) > 0 else 0
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""
+Quantized model comparison
+
+Transcribes a sample recording with float and int8 quantized variants of every model and reports
+inference speedup, memory savings and transcript drift of the quantized model against the float one:
+
+    python -m src.benchmarks.quantization sample.mp3 --models tiny base --repeat 3 --output results.json
+
+Every variant runs in a fresh process, so that memory of one model does not hide the other.
+Quantized weights are prepared before measurements, so that one-time quantization is reported separately.
+Pass `--compare` with results of another commit to find regressions, exit code is non-zero if any is found
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+import multiprocessing
+from pathlib import Path
+import re
+import sys
+from tempfile import TemporaryDirectory
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.transcriber.audio_processor import AudioPreprocessor
+from src.transcriber.schemas import ModelSettings, WhisperModel
+from src.transcriber.spool import AudioSpool
+from src.transcriber.timing import timed
+from src.transcriber.transcriber import Transcriber
+from src.transcriber.worker import peak_rss
+from .preprocessing import megabytes
+from .report import Report, write_regressions
+
+
+@dataclass
+class CaseResult:
+    """
+    Measurements of a single model variant on the sample recording
+    """
+
+    model: str
+    variant: str  #: float or int8
+    duration: float  #: Transcribed audio duration, seconds
+    load_s: float = 0.0  #: Model load time, seconds
+    transcribe_s: float = 0.0  #: Fastest transcription time, seconds
+    rtf: float = 0.0  #: Real-time factor: transcription time divided by audio duration
+    peak_rss_mb: Optional[float] = None  #: Peak memory of the process
+    rss_increase_mb: Optional[float] = None  #: Peak memory growth over the process before model load
+    speedup: float = 1.0  #: Float model transcription time divided by this variant one
+    memory_saving: Optional[float] = None  #: Share of float model memory growth, that this variant saves
+    wer: float = 0.0  #: Word error rate of the transcript against float model transcript
+    text: str = ""
+
+
+def words(text: str) -> List[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """
+    Counts word substitutions, deletions and insertions, that turn reference into hypothesis
+
+    :param reference: reference transcript
+    :param hypothesis: compared transcript
+    :return: edit distance in words divided by reference words count
+    """
+    ref, hyp = words(reference), words(hypothesis)
+    if len(ref) == 0:
+        return float(len(hyp) > 0)
+
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, start=1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def prepare_weights(model: WhisperModel) -> float:
+    """
+    Downloads float checkpoint and quantizes it, if it is not cached yet. Runs in a separate process
+
+    :param model: model description
+    :return: preparation time, seconds
+    """
+    transcriber = Transcriber()
+    _, elapsed = timed(transcriber.load_model, model)
+    return elapsed
+
+
+def run_case(model: WhisperModel, audio_file: Path, preset: ModelSettings, repeat: int) -> Dict[str, object]:
+    """
+    Loads model and transcribes audio several times. Runs in a separate process
+
+    :param model: model description
+    :param audio_file: prepared audio, saved with numpy
+    :param preset: transcription settings
+    :param repeat: transcriptions count
+    :return: measurements and transcript
+    """
+    audio = np.load(audio_file)
+    base_rss = peak_rss()
+    transcriber = Transcriber()
+    transcriber.model, load_s = timed(transcriber.load_model, model)
+
+    elapsed = []
+    for _ in range(repeat):
+        (transcription, _, _), duration = timed(transcriber.transcribe, audio, preset, audio_file)
+        elapsed.append(duration)
+    return {
+        "load_s": load_s,
+        "transcribe_s": min(elapsed),
+        "peak_rss": peak_rss(),
+        "base_rss": base_rss,
+        "text": transcription.text,
+    }
+
+
+def measure(model: WhisperModel, audio_file: Path, preset: ModelSettings, repeat: int, duration: float) -> CaseResult:
+    """
+    Runs model variant in a fresh process
+
+    :param model: model description
+    :param audio_file: prepared audio, saved with numpy
+    :param preset: transcription settings
+    :param repeat: transcriptions count
+    :param duration: audio duration, seconds
+    :return: variant result without comparison to float model
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        run = pool.submit(run_case, model, audio_file, preset, repeat).result()
+
+    result = CaseResult(
+        model.name,
+        "int8" if model.quantized else "float",
+        duration,
+        load_s=run["load_s"],
+        transcribe_s=run["transcribe_s"],
+        rtf=run["transcribe_s"] / duration,
+        text=run["text"],
+    )
+    if run["peak_rss"] is not None:
+        result.peak_rss_mb = megabytes(run["peak_rss"])
+        result.rss_increase_mb = megabytes(run["peak_rss"] - run["base_rss"])
+    return result
+
+
+def compare(float_result: CaseResult, quantized_result: CaseResult) -> None:
+    """
+    Fills quantized variant speedup, memory saving and drift against float model
+
+    :param float_result: float model result
+    :param quantized_result: quantized model result to fill
+    """
+    quantized_result.speedup = float_result.transcribe_s / quantized_result.transcribe_s
+    if float_result.rss_increase_mb and quantized_result.rss_increase_mb is not None:
+        quantized_result.memory_saving = 1 - quantized_result.rss_increase_mb / float_result.rss_increase_mb
+    quantized_result.wer = word_error_rate(float_result.text, quantized_result.text)
+
+
+def get_parser() -> argparse.ArgumentParser:
+    """
+    Creates command line arguments parser
+
+    :return: parser
+    """
+    parser = argparse.ArgumentParser(prog="python -m src.benchmarks.quantization", description=__doc__.split("\n\n")[0])
+    parser.add_argument("sample", type=Path, help="recording to transcribe")
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        choices=[model.name for model in Transcriber.load_available_models()],
+        default=["tiny", "base"],
+        help="models to compare (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--preset",
+        choices=[preset.name for preset in Transcriber.load_model_settings_presets()],
+        default="universal",
+        help="preprocessing and transcription preset (default: %(default)s)",
+    )
+    parser.add_argument("-l", "--language", choices=list(Transcriber.load_available_languages()), help="audio language code")
+    parser.add_argument("--repeat", type=int, default=1, help="transcriptions of every variant (default: %(default)s)")
+    parser.add_argument("-o", "--output", type=Path, help="file to write JSON results to")
+    parser.add_argument("--compare", type=Path, help="JSON results to compare with, e.g. of the previous commit")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="relative growth considered a regression (default: %(default)s)"
+    )
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    if args.repeat < 1:
+        parser.error("repeat count must be positive")
+    if not args.sample.is_file():
+        parser.error(f"sample recording not found: {args.sample}")
+
+    preset = next(preset for preset in Transcriber.load_model_settings_presets() if preset.name == args.preset)
+    # Quantized layers run on CPU only, so both variants are compared in full precision
+    preset = preset.model_copy(update={"language": args.language, "fp16": False})
+    report = Report(
+        benchmark="quantization",
+        key=("model", "variant"),
+        metrics=("transcribe_s", "peak_rss_mb", "wer"),
+        parameters={name: value for name, value in vars(args).items() if name not in ("output", "compare")},
+    )
+    report.parameters["sample"] = str(args.sample)
+
+    with TemporaryDirectory() as tmp_dir:
+        spool = AudioSpool()
+        try:
+            prepared = AudioPreprocessor(spool)(args.sample, preset, 16_000)
+            audio = prepared.audio.open()
+            audio_file = Path(tmp_dir) / "audio.npy"
+            np.save(audio_file, audio)
+            duration = len(audio) / 16_000
+        finally:
+            spool.clear()
+
+        for model in Transcriber.load_available_models():
+            if model.name not in args.models:
+                continue
+            quantized_model = model.model_copy(update={"quantized": True})
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                elapsed = pool.submit(prepare_weights, quantized_model).result()
+            sys.stderr.write(f"{model.name}: quantized weights ready in {elapsed:.1f}s\n")
+
+            float_result = measure(model, audio_file, preset, args.repeat, duration)
+            quantized_result = measure(quantized_model, audio_file, preset, args.repeat, duration)
+            compare(float_result, quantized_result)
+            for result in (float_result, quantized_result):
+                report.results.append(asdict(result))
+            sys.stderr.write(
+                f"{model.name}: int8 is {quantized_result.speedup:.2f}x faster, WER against float {quantized_result.wer:.3f}\n"
+            )
+
+    report.write_table(["model", "variant", "load_s", "transcribe_s", "rtf", "peak_rss_mb", "speedup", "memory_saving", "wer"])
+    if args.output is not None:
+        report.save(args.output)
+
+    if args.compare is not None:
+        baseline = Report.load(args.compare)
+        regressions = report.compare(baseline, args.threshold)
+        write_regressions(regressions, baseline)
+        return 1 if len(regressions) > 0 else 0
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""
+Benchmark results storage and comparison
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import json
+import os
+from pathlib import Path
+import platform
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional, Sequence, TextIO, Tuple
+
+from src.settings import settings
+
+
+def git_commit() -> Optional[str]:
+    """
+    Gets current commit of the source directory
+
+    :return: commit hash, if source directory is a git repository
+    """
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True, timeout=10
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip()
+
+
+def environment() -> Dict[str, Any]:
+    """
+    Describes the machine and the code version, that results were measured with
+
+    :return: JSON-serializable environment description
+    """
+    return {
+        "version": settings.version,
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+@dataclass
+class Report:
+    """
+    Results of a benchmark run
+
+    Every result is a flat dictionary of case parameters and measured metrics
+    """
+
+    benchmark: str  #: Benchmark name
+    key: Tuple[str, ...]  #: Result fields, that identify a case
+    metrics: Tuple[str, ...]  #: Result fields, where larger values are worse
+    parameters: Dict[str, Any] = field(default_factory=dict)
+    results: List[Dict[str, Any]] = field(default_factory=list)
+    environment: Dict[str, Any] = field(default_factory=environment)
+    created: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+
+    def case(self, result: Dict[str, Any]) -> Tuple[Any, ...]:
+        """
+        Gets case identifier of the result
+
+        :param result: case result
+        :return: values of key fields
+        """
+        return tuple(result.get(name) for name in self.key)
+
+    def save(self, path: Path) -> None:
+        """
+        Writes report to JSON file
+
+        :param path: output file
+        """
+        data = {
+            "benchmark": self.benchmark,
+            "key": list(self.key),
+            "metrics": list(self.metrics),
+            "parameters": self.parameters,
+            "environment": self.environment,
+            "created": self.created,
+            "results": self.results,
+        }
+        path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path) -> "Report":
+        """
+        Reads report from JSON file
+
+        :param path: report file
+        :return: report
+        """
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return cls(
+            benchmark=data["benchmark"],
+            key=tuple(data["key"]),
+            metrics=tuple(data["metrics"]),
+            parameters=data["parameters"],
+            results=data["results"],
+            environment=data["environment"],
+            created=data["created"],
+        )
+
+    def compare(self, baseline: "Report", threshold: float = 0.1) -> List[Tuple[Tuple[Any, ...], str, float, float]]:
+        """
+        Finds cases, that got worse than in the baseline report
+
+        :param baseline: report to compare with, e.g. of the previous commit
+        :param threshold: relative metric growth, that is considered a regression
+        :return: case, metric, baseline value, current value of every regression
+        """
+        if baseline.benchmark != self.benchmark:
+            raise ValueError(f"Cannot compare {self.benchmark} results with {baseline.benchmark} results")
+
+        previous = {baseline.case(result): result for result in baseline.results}
+        return [
+            (self.case(result), metric, before[metric], result[metric])
+            for result in self.results
+            if (before := previous.get(self.case(result))) is not None
+            for metric in self.metrics
+            if before.get(metric) and result.get(metric) is not None and result[metric] > before[metric] * (1 + threshold)
+        ]
+
+    def write_table(self, columns: Sequence[str], output: TextIO = sys.stdout) -> None:
+        """
+        Writes results as a human-readable table
+
+        :param columns: result fields to show
+        :param output: stream to write to
+        """
+        rows = [[self.format(result.get(column)) for column in columns] for result in self.results]
+        widths = [max(len(column), *(len(row[i]) for row in rows)) for i, column in enumerate(columns)]
+        output.write("  ".join(column.rjust(width) for column, width in zip(columns, widths, strict=True)) + "\n")
+        for row in rows:
+            output.write("  ".join(value.rjust(width) for value, width in zip(row, widths, strict=True)) + "\n")
+
+    @staticmethod
+    def format(value: Any) -> str:
+        if isinstance(value, float):
+            return f"{value:.4g}"
+        return "-" if value is None else str(value)
+
+
+def write_regressions(
+    regressions: List[Tuple[Tuple[Any, ...], str, float, float]], baseline: Report, output: TextIO = sys.stdout
+) -> None:
+    """
+    Writes comparison summary
+
+    :param regressions: regressions found by `Report.compare`
+    :param baseline: report, that results were compared with
+    :param output: stream to write to
+    """
+    commit = baseline.environment.get("commit") or baseline.created
+    if len(regressions) == 0:
+        output.write(f"No regressions compared to {commit}\n")
+        return
+
+    output.write(f"Regressions compared to {commit}:\n")
+    for case, metric, before, after in regressions:
+        output.write(f"  {', '.join(map(str, case))}: {metric} {before:.4g} -> {after:.4g} ({after / before - 1:+.1%})\n")
@@ -0,0 +1,323 @@
+"""
+Scheduler overhead benchmark
+
+Runs the transcription engine on many tiny synthetic files with a stub Whisper model, that does fixed work
+instead of inference, so that the cost of scheduling itself (pickling, future callbacks, stage hand-offs,
+Qt signals delivery) is separated from model inference:
+
+    python -m src.benchmarks.scheduler --files 10 100 1000 10000 --workers 2 4 8 --output results.json
+
+Reports scheduling overhead per file, transcribe workers utilization and end-to-end makespan.
+Pass `--compare` with results of another commit to find regressions, exit code is non-zero if any is found
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from math import ceil
+import multiprocessing
+from pathlib import Path
+import sys
+from tempfile import TemporaryDirectory
+from threading import Event
+from time import perf_counter, sleep
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import soundfile as sf
+import whisper
+from whisper.model import ModelDimensions
+
+from src.transcriber import checkpoints, topology, worker
+from src.transcriber.engine import TranscriptionEngine
+from src.transcriber.schemas import ModelSettings, WhisperModel
+from src.transcriber.transcriber import Transcriber
+from .report import Report, write_regressions
+
+
+#: Smallest model, that whisper can construct, so that stub model takes no time and memory to load
+STUB_DIMENSIONS = ModelDimensions(
+    n_mels=80,
+    n_audio_ctx=1,
+    n_audio_state=4,
+    n_audio_head=1,
+    n_audio_layer=1,
+    n_vocab=51_865,
+    n_text_ctx=1,
+    n_text_state=4,
+    n_text_head=1,
+    n_text_layer=1,
+)
+
+
+class StubModel(whisper.Whisper):
+    """
+    Whisper model, that sleeps for a fixed time instead of inference
+    """
+
+    def __init__(self, work_s: float) -> None:
+        super().__init__(STUB_DIMENSIONS)
+        self.work_s = work_s
+
+    def transcribe(self, audio: np.ndarray, **options) -> dict:
+        sleep(self.work_s)
+        duration = len(audio) / 16_000
+        segment = {"id": 0, "seek": 0, "start": 0.0, "end": duration, "text": " stub"}
+        return {"text": segment["text"], "segments": [segment], "language": "en"}
+
+
+def init_stub_worker(model: WhisperModel, work_s: float) -> None:
+    """
+    Transcribe pool initializer: replaces whisper model loading with the stub model
+    and initializes worker the same way the engine does
+
+    :param model: model description
+    :param work_s: stub model work time per task, seconds
+    """
+    # Stub model is not converted into memory-mapped checkpoint, which would replace the real one
+    checkpoints.load_model = lambda *args, **kwargs: StubModel(work_s)
+    worker.init_worker(model)
+
+
+class StubTranscriber(Transcriber):
+    """
+    Transcriber, that neither downloads checkpoints nor writes export files
+    """
+
+    @staticmethod
+    def download_model(model: WhisperModel) -> Path:
+        return Path(f"{model.name}.stub")
+
+    def store_transcription(
+        self, transcription: Transcriber.Transcription, target_dir: Path, filename: str, formats: Sequence[str] = ()
+    ) -> Path:
+        return target_dir / filename
+
+
+class StubEngineMixin:
+    """
+    Runs transcribe pool with the stub model and records job timings
+    """
+
+    def __init__(self, work_s: float, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.work_s = work_s
+        self.completed = Event()
+        self.started = self.model_ready = self.finished = 0.0
+        self.failed: List[BaseException] = []
+
+    def start_transcribe_pool(self, model: WhisperModel) -> None:
+        self.stop_transcribe_pool()
+        self.layout = self.admit_layout(model, topology.choose_layout(model, self.workers, threads=1))
+        self.transcribe_pool = ProcessPoolExecutor(
+            self.layout.workers, initializer=init_stub_worker, initargs=(model, self.work_s)
+        )
+
+    def start(self, model: WhisperModel, files: Dict[Path, ModelSettings]) -> None:
+        self.started = perf_counter()
+        super().start(model, files)
+
+    def model_loaded(self, status: worker.WorkerStatus) -> None:
+        self.model_ready = perf_counter()
+        super().model_loaded(status)
+
+    def file_failed(self, path: Path, error: BaseException) -> None:
+        self.failed.append(error)
+        super().file_failed(path, error)
+
+    def task_completed(self) -> None:
+        self.finished = perf_counter()
+        super().task_completed()
+        self.completed.set()
+
+
+class HeadlessStubEngine(StubEngineMixin, TranscriptionEngine):
+    """
+    Engine of the command line interface
+    """
+
+
+def qt_stub_engine(**kwargs) -> StubEngineMixin:
+    """
+    Creates engine of the application, that reports progress with Qt signals
+    to slots running in the application event loop
+
+    :return: engine
+    """
+    from src.ui.bg import ProcessManager
+
+    class QtStubEngine(StubEngineMixin, ProcessManager):
+        pass
+
+    return QtStubEngine(**kwargs)
+
+
+@dataclass
+class CaseResult:
+    """
+    Scheduling measurements of a single job
+    """
+
+    engine: str
+    files: int
+    workers: int
+    work_ms: float  #: Stub model work time per file
+    makespan: float = 0.0  #: Time from job start to its completion, seconds
+    model_ready: float = 0.0  #: Time from job start to the first worker ready, seconds
+    ideal_makespan: float = 0.0  #: Makespan of a scheduler without overhead, seconds
+    overhead_per_file_ms: float = 0.0  #: Makespan excess over the ideal one per file
+    utilization: float = 0.0  #: Share of transcribe workers time spent on stub model work after model is ready
+    throughput: float = 0.0  #: Files per second
+    failed: int = 0
+
+
+def synthesize_files(directory: Path, count: int, duration_ms: int = 250, sr: int = 16_000) -> List[Path]:
+    """
+    Writes tiny noise recordings. Every file has unique content, so that engine does not deduplicate them
+
+    :param directory: output directory
+    :param count: files count
+    :param duration_ms: recording duration
+    :param sr: sample rate
+    :return: recordings
+    """
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(count):
+        path = directory / f"synthetic_{i:05d}.wav"
+        if not path.exists():
+            sf.write(path, 0.1 * rng.standard_normal(sr * duration_ms // 1_000).astype(np.float32), sr, subtype="PCM_16")
+        paths.append(path)
+    return paths
+
+
+def run_case(engine_name: str, files: List[Path], workers: int, work_s: float, export_dir: Path) -> CaseResult:
+    """
+    Runs the job with stub model and measures its timings
+
+    :param engine_name: `qt` to run application engine, `headless` to run command line engine
+    :param files: recordings
+    :param workers: processes count of every pool
+    :param work_s: stub model work time per file, seconds
+    :param export_dir: directory to pass to engine
+    :return: measurements
+    """
+    transcriber = StubTranscriber()
+    model = next(model for model in transcriber.available_models if model.name == "tiny")
+    preset = next(preset for preset in Transcriber.load_model_settings_presets() if preset.name == "universal")
+    options = dict(
+        transcriber=transcriber,
+        work_s=work_s,
+        workers=workers,
+        export_dir=export_dir,
+        audio_cache_size=0,
+        transcription_cache_size=0,
+        # Stub model sleeps per file instead of inference, so files are not batched and spectrograms are not needed
+        batch_size=1,
+        precompute_mel=False,
+    )
+
+    if engine_name == "qt":
+        from PyQt6.QtCore import QCoreApplication
+
+        app = QCoreApplication.instance() or QCoreApplication([])
+        engine = qt_stub_engine(**options)
+        # Signals are delivered to the main thread event loop, as they are in the application
+        engine.signal_task_completed.connect(lambda _: app.quit())
+        for signal in (engine.signal_file_prepared, engine.signal_file_transcribed, engine.signal_file_failed):
+            signal.connect(lambda *_: None)
+        engine.start(model, {file: preset for file in files})
+        app.exec()
+    else:
+        engine = HeadlessStubEngine(**options)
+        engine.start(model, {file: preset for file in files})
+
+    engine.completed.wait()
+    finished = perf_counter()
+    engine.shutdown()
+
+    result = CaseResult(engine=engine_name, files=len(files), workers=workers, work_ms=work_s * 1_000)
+    result.makespan = finished - engine.started
+    result.model_ready = engine.model_ready - engine.started
+    result.ideal_makespan = result.model_ready + ceil(len(files) / workers) * work_s
+    result.overhead_per_file_ms = max(0.0, result.makespan - result.ideal_makespan) / len(files) * 1_000
+    result.utilization = len(files) * work_s / (workers * max(finished - engine.model_ready, 1e-9))
+    result.throughput = len(files) / result.makespan
+    result.failed = len(engine.failed)
+    return result
+
+
+def get_parser() -> argparse.ArgumentParser:
+    """
+    Creates command line arguments parser
+
+    :return: parser
+    """
+    parser = argparse.ArgumentParser(prog="python -m src.benchmarks.scheduler", description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--files", type=int, nargs="+", default=[10, 100, 1_000, 10_000], help="files count of a job (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[4], help="processes count of every pool (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--work-ms", type=float, default=10.0, help="stub model work time per file, milliseconds (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["qt", "headless"],
+        default="qt",
+        help="application engine with Qt signals or command line engine (default: %(default)s)",
+    )
+    parser.add_argument("--audio-dir", type=Path, help="directory to keep generated recordings in for further runs")
+    parser.add_argument("-o", "--output", type=Path, help="file to write JSON results to")
+    parser.add_argument("--compare", type=Path, help="JSON results to compare with, e.g. of the previous commit")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="relative growth considered a regression (default: %(default)s)"
+    )
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    if min(args.files) < 1 or min(args.workers) < 1:
+        parser.error("files and workers count must be positive")
+
+    report = Report(
+        benchmark="scheduler",
+        key=("engine", "files", "workers", "work_ms"),
+        metrics=("overhead_per_file_ms", "makespan"),
+        parameters={name: value for name, value in vars(args).items() if name not in ("audio_dir", "output", "compare")},
+    )
+
+    with TemporaryDirectory() as tmp_dir:
+        audio_dir = args.audio_dir or Path(tmp_dir)
+        audio_dir.mkdir(parents=True, exist_ok=True)
+        files = synthesize_files(audio_dir, max(args.files))
+        for count in args.files:
+            for workers in args.workers:
+                result = run_case(args.engine, files[:count], workers, args.work_ms / 1_000, Path(tmp_dir))
+                report.results.append(asdict(result))
+                sys.stderr.write(
+                    f"{count} files, {workers} workers: makespan {result.makespan:.2f}s, "
+                    f"overhead {result.overhead_per_file_ms:.2f}ms per file\n"
+                )
+
+    report.write_table(
+        ["engine", "files", "workers", "makespan", "model_ready", "ideal_makespan", "overhead_per_file_ms", "utilization"]
+    )
+    if args.output is not None:
+        report.save(args.output)
+
+    if args.compare is not None:
+        baseline = Report.load(args.compare)
+        regressions = report.compare(baseline, args.threshold)
+        write_regressions(regressions, baseline)
+        return 1 if len(regressions) > 0 else 0
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
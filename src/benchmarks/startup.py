@@ -0,0 +1,185 @@
+"""
+Application startup benchmark
+
+Launches the application in fresh interpreters until its main window is shown and reports time of every
+startup stage, with static configuration read from the precompiled snapshot and parsed from YAML:
+
+    python -m src.benchmarks.startup --repeat 5 --output results.json
+
+Reports launch time from process start to the shown window, startup stages, slowest imports and heavy
+modules, that were imported before the window appeared. Pass `--compare` with results of another commit
+to find regressions, exit code is non-zero if any is found
+"""
+
+import argparse
+from dataclasses import asdict, dataclass, field
+import json
+import os
+from pathlib import Path
+import subprocess
+import sys
+from time import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.settings import settings
+from src.transcriber import static
+from .report import Report, write_regressions
+
+
+#: Modules, that are only needed to run a task and must not be imported before the window appears
+HEAVY_MODULES = ("torch", "whisper", "scipy", "polars", "xlsxwriter", "soundfile", "yaml")
+
+#: Runs in a fresh interpreter, shows main window and prints startup timings
+CHILD = """
+import json, sys
+from time import perf_counter, time
+started = perf_counter()
+from src import main
+from src.transcriber.timing import StageTimer
+startup = StageTimer()
+startup.add("main module", perf_counter() - started)
+app, window = main.start(startup)
+shown = perf_counter()
+app.processEvents()
+startup.add("event loop", perf_counter() - shown)
+heavy = [name for name in {heavy!r} if name in sys.modules]
+sys.stdout.write(json.dumps({{"shown": time(), "stages": startup.stages, "heavy": heavy}}))
+window.on_quit()
+"""
+
+
+@dataclass
+class CaseResult:
+    config: str  #: Static configuration source: snapshot or yaml
+    launch_s: float = 0.0  #: Time from process start to the first event loop iteration, fastest run
+    stages: Dict[str, float] = field(default_factory=dict)  #: Startup stages of the fastest run
+    heavy_modules: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        result = asdict(self)
+        stages = result.pop("stages")
+        result.update({f"{stage.replace(' ', '_')}_s": duration for stage, duration in stages.items()})
+        result["heavy_modules"] = ",".join(self.heavy_modules)
+        return result
+
+
+def launch(import_times: bool = False) -> Tuple[dict, str]:
+    """
+    Launches application in a fresh interpreter
+
+    :param import_times: whether to make interpreter report import times
+    :return: child report, child stderr
+    """
+    env = {**os.environ, "QT_QPA_PLATFORM": os.environ.get("QT_QPA_PLATFORM", "offscreen")}
+    command = [sys.executable, *(["-X", "importtime"] if import_times else []), "-c", CHILD.format(heavy=HEAVY_MODULES)]
+    started = time()
+    process = subprocess.run(
+        command, cwd=settings.BASE_DIR.parent, env=env, capture_output=True, text=True, check=True, timeout=120
+    )
+    run = json.loads(process.stdout)
+    run["launch"] = run["shown"] - started
+    return run, process.stderr
+
+
+def slowest_imports(stderr: str, count: int = 10) -> List[Tuple[str, float]]:
+    """
+    Parses interpreter import times report
+
+    :param stderr: output of interpreter launched with `-X importtime`
+    :param count: packages count
+    :return: top-level packages and total import time of their modules in seconds, slowest first
+    """
+    packages: Dict[str, float] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_time, _, name = line.removeprefix("import time:").split("|")
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0.0) + int(self_time) / 1e6
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:count]
+
+
+def run_case(config: str, repeat: int) -> CaseResult:
+    """
+    Launches application several times and keeps the fastest run
+
+    :param config: `snapshot` to use precompiled static configuration, `yaml` to parse YAML files
+    :param repeat: runs count
+    :return: case result
+    """
+    result = CaseResult(config)
+    for _ in range(repeat):
+        if config == "snapshot":
+            static.compile_snapshot()
+        else:
+            static.SNAPSHOT_FILE.unlink(missing_ok=True)
+        run, _ = launch()
+        if result.launch_s == 0.0 or run["launch"] < result.launch_s:
+            result.launch_s = run["launch"]
+            result.stages = run["stages"]
+        result.heavy_modules = run["heavy"]
+    static.compile_snapshot()
+    return result
+
+
+def get_parser() -> argparse.ArgumentParser:
+    """
+    Creates command line arguments parser
+
+    :return: parser
+    """
+    parser = argparse.ArgumentParser(prog="python -m src.benchmarks.startup", description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--configs",
+        choices=["snapshot", "yaml"],
+        nargs="+",
+        default=["snapshot", "yaml"],
+        help="static configuration sources (default: %(default)s)",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="launches of every case (default: %(default)s)")
+    parser.add_argument("-o", "--output", type=Path, help="file to write JSON results to")
+    parser.add_argument("--compare", type=Path, help="JSON results to compare with, e.g. of the previous commit")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="relative growth considered a regression (default: %(default)s)"
+    )
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    if args.repeat < 1:
+        parser.error("repeat count must be positive")
+
+    report = Report(
+        benchmark="startup",
+        key=("config",),
+        metrics=("launch_s", "window_s"),
+        parameters={name: value for name, value in vars(args).items() if name not in ("output", "compare")},
+    )
+    for config in args.configs:
+        result = run_case(config, args.repeat)
+        report.results.append(result.to_dict())
+        sys.stderr.write(f"{config}: window shown in {result.launch_s:.3f}s\n")
+
+    _, stderr = launch(import_times=True)
+    sys.stderr.write("Slowest imports:\n")
+    for name, duration in slowest_imports(stderr):
+        sys.stderr.write(f"  {name}: {duration:.3f}s\n")
+
+    report.write_table(
+        ["config", "launch_s", "main_module_s", "application_s", "imports_s", "window_s", "show_s", "heavy_modules"]
+    )
+    if args.output is not None:
+        report.save(args.output)
+
+    if args.compare is not None:
+        baseline = Report.load(args.compare)
+        regressions = report.compare(baseline, args.threshold)
+        write_regressions(regressions, baseline)
+        return 1 if len(regressions) > 0 else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+"""
+Headless batch transcription
+
+Runs the same preparation and transcription engine as the application does, but without Qt,
+so that it can be used on servers and in scheduled jobs:
+
+    python -m src.cli "recordings/**/*.mp3" --model small --preset phone_call --language en --workers 8
+
+Interrupted batch can be continued by the same command with `--resume`. Exit code is non-zero, if any of the files failed
+"""
+
+import argparse
+from glob import glob, has_magic
+from hashlib import sha256
+import logging
+import multiprocessing
+from pathlib import Path
+import sys
+from threading import Event
+from time import perf_counter
+from typing import Dict, List, Optional, Sequence, TextIO
+
+import soundfile as sf
+
+from src.settings import settings
+from src.transcriber import Transcriber, export, topology
+from src.transcriber.audio_processor import PreparedAudio
+from src.transcriber.engine import DEFAULT_BATCH_SIZE, TranscriptionEngine
+from src.transcriber.journal import JobJournal
+from src.transcriber.timing import TimingsLog
+
+
+class BatchEngine(TranscriptionEngine):
+    """
+    Transcription engine, that reports progress to console and lets caller wait for job completion
+    """
+
+    def __init__(self, output: TextIO = sys.stdout, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.output = output
+        self.completed = Event()
+        self.transcribed: Dict[Path, Path] = {}
+        self.failed: Dict[Path, BaseException] = {}
+        self.removed: Dict[Path, float] = {}  #: Silence removed from every file, seconds
+
+    def file_prepared(self, path: Path, prepared: PreparedAudio) -> None:
+        self.removed[path] = prepared.removed_duration
+
+    def file_transcribed(self, path: Path, export_dir: Path) -> None:
+        self.transcribed[path] = export_dir
+        self.output.write(f"done: {path} -> {export_dir} ({self.removed.get(path, 0.0):.1f}s of silence removed)\n")
+
+    def file_failed(self, path: Path, error: BaseException) -> None:
+        self.failed[path] = error
+        self.output.write(f"failed: {path}: {error}\n")
+
+    def task_completed(self) -> None:
+        self.completed.set()
+
+
+def collect_files(inputs: Sequence[str]) -> List[Path]:
+    """
+    Expands glob patterns and collects existing files, keeping order and removing duplicates
+
+    :param inputs: filepaths or glob patterns
+    :return: files to process
+    """
+    files = {}
+    for item in inputs:
+        candidates = sorted(glob(item, recursive=True)) if has_magic(item) else [item]
+        for candidate in map(Path, candidates):
+            if candidate.is_file():
+                files[candidate.resolve()] = None
+    return list(files)
+
+
+def journal_name(inputs: Sequence[str], output_dir: Path) -> str:
+    """
+    Names job journal after the batch inputs and export directory, so that concurrent batches do not mix,
+    while the same command finds its journal to resume
+
+    :param inputs: filepaths or glob patterns
+    :param output_dir: directory to export transcriptions to
+    :return: journal name
+    """
+    parameters = "\n".join([str(output_dir.expanduser().absolute()), *(str(Path(item).absolute()) for item in inputs)])
+    return f"cli-{sha256(parameters.encode('utf-8')).hexdigest()[:16]}"
+
+
+def audio_duration(path: Path) -> float:
+    """
+    Reads audio duration from file header
+
+    :param path: audio file
+    :return: duration in seconds, 0 if file cannot be read
+    """
+    try:
+        return sf.info(path).duration
+    except (RuntimeError, sf.LibsndfileError):
+        return 0.0
+
+
+def get_parser(transcriber: Transcriber) -> argparse.ArgumentParser:
+    """
+    Creates command line arguments parser
+
+    :param transcriber: transcriber to get available models, presets and languages from
+    :return: parser
+    """
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description="Transcribe audio files with Whisper")
+    parser.add_argument("inputs", nargs="*", help="audio files or glob patterns")
+    parser.add_argument(
+        "-m",
+        "--model",
+        choices=[model.name for model in transcriber.available_models],
+        default=transcriber.default_model.name,
+        help="whisper model (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-p",
+        "--preset",
+        choices=[preset.name for preset in Transcriber.load_model_settings_presets()],
+        default="universal",
+        help="preprocessing and transcription preset (default: %(default)s)",
+    )
+    parser.add_argument("-l", "--language", choices=list(Transcriber.load_available_languages()), help="audio language code")
+    parser.add_argument("--prompt", help="initial prompt")
+    parser.add_argument("--word-timestamps", action="store_true", help="export word timings")
+    parser.add_argument("--condition-on-previous-text", action="store_true", help="condition on previous text")
+    parser.add_argument("--fp16", action="store_true", help="use FP16 inference")
+    parser.add_argument("--int8", action="store_true", help="use model with int8 quantized linear layers, faster on CPU")
+    parser.add_argument(
+        "-w", "--workers", type=int, help="worker processes per stage (default: chosen from CPU cores and the model)"
+    )
+    parser.add_argument(
+        "--threads", type=int, help="torch threads per transcribe process (default: chosen from CPU cores and the model)"
+    )
+    parser.add_argument(
+        "--calibrate",
+        action="store_true",
+        help="measure throughput of several workers and threads layouts on the first file and remember the best one",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="short files to transcribe in a single batch, 1 disables batching (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-precompute-mel",
+        dest="precompute_mel",
+        action="store_false",
+        help="compute log-mel spectrograms in transcribe processes instead of preparation ones",
+    )
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        type=Path,
+        default=Path("~/Downloads").expanduser(),
+        help="directory to export transcriptions to (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-f",
+        "--formats",
+        nargs="+",
+        choices=list(export.WRITERS),
+        default=list(export.DEFAULT_FORMATS),
+        help="segments export formats (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--audio-cache-size",
+        type=int,
+        default=settings.AUDIO_CACHE_SIZE // 1024**2,
+        help="prepared audio cache size budget in MB, 0 disables cache (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--transcription-cache-size",
+        type=int,
+        default=settings.TRANSCRIPTION_CACHE_SIZE // 1024**2,
+        help="transcription cache size budget in MB, 0 disables cache (default: %(default)s)",
+    )
+    parser.add_argument("--timings", type=Path, help="file to append per-file stage timings to as JSON lines")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="resume interrupted batch of the same inputs and output directory: process its files, that are not exported yet",
+    )
+    parser.add_argument(
+        "--journal", type=Path, help="job journal file (default: named after inputs and output directory in the cache)"
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="log engine progress")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    transcriber = Transcriber()
+    parser = get_parser(transcriber)
+    args = parser.parse_args(argv)
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(fmt="%(asctime)s %(name)s [%(levelname)s]: %(message)s"))
+    root = logging.getLogger()
+    root.setLevel(logging.INFO if args.verbose else logging.WARNING)
+    root.addHandler(handler)
+    logging.getLogger("numba").setLevel("WARNING")
+
+    if (args.workers is not None and args.workers < 1) or (args.threads is not None and args.threads < 1):
+        parser.error("workers and threads count must be positive")
+    if args.batch_size < 1:
+        parser.error("batch size must be positive")
+    if args.audio_cache_size < 0 or args.transcription_cache_size < 0:
+        parser.error("cache size must not be negative")
+
+    journal = JobJournal(journal_name(args.inputs, args.output_dir), path=args.journal)
+    job = None
+    if args.resume:
+        job = journal.load()
+        if job is None:
+            parser.error("no interrupted batch to resume")
+        model = next((model for model in transcriber.available_models if model.name == job.model), None)
+        if model is None:
+            parser.error(f"unknown model of interrupted batch: {job.model}")
+        model = model.model_copy(update={"quantized": job.quantized})
+        files = list(job.remaining)
+    else:
+        files = collect_files(args.inputs)
+        if len(files) == 0:
+            parser.error("no audio files found")
+        args.output_dir.mkdir(parents=True, exist_ok=True)
+
+        model = next(model for model in transcriber.available_models if model.name == args.model)
+        model = model.model_copy(update={"quantized": args.int8})
+        preset = next(preset for preset in Transcriber.load_model_settings_presets() if preset.name == args.preset)
+        preset = preset.model_copy(
+            update={
+                "language": args.language,
+                "initial_prompt": args.prompt,
+                "word_timestamps": args.word_timestamps,
+                "condition_on_previous_text": args.condition_on_previous_text,
+                "fp16": args.fp16,
+            }
+        )
+
+    if args.calibrate:
+        transcriber.download_model(model)
+        sample = files[0]
+        best, results = topology.calibrate(model, sample, job.files[sample] if job is not None else preset)
+        for layout, throughput in results.items():
+            sys.stdout.write(f"Calibration: {layout}: {throughput:.2f} audio seconds per second\n")
+        sys.stdout.write(f"Best layout: {best}\n")
+
+    audio_seconds = sum(map(audio_duration, files))
+    engine = BatchEngine(
+        transcriber=transcriber,
+        workers=args.workers,
+        threads=args.threads,
+        export_dir=args.output_dir,
+        audio_cache_size=args.audio_cache_size * 1024**2,
+        transcription_cache_size=args.transcription_cache_size * 1024**2,
+        journal=journal,
+        timings_log=TimingsLog(args.timings) if args.timings is not None else None,
+        export_formats=args.formats,
+        batch_size=args.batch_size,
+        precompute_mel=args.precompute_mel,
+    )
+    start = perf_counter()
+    try:
+        if job is not None:
+            engine.resume(model, job)
+        else:
+            engine.start(model, {file: preset for file in files})
+        engine.completed.wait()
+    except KeyboardInterrupt:
+        sys.stderr.write("Interrupted\n")
+        return 130
+    finally:
+        engine.shutdown()
+    elapsed = perf_counter() - start
+
+    sys.stdout.write(
+        f"Files: {len(engine.transcribed)} transcribed, {len(engine.failed)} failed, {len(files)} total\n"
+        f"Elapsed: {elapsed:.1f}s, throughput: {len(files) / elapsed:.3f} files/s\n"
+        f"Audio: {audio_seconds:.1f}s, real-time factor: {elapsed / audio_seconds if audio_seconds else 0:.3f}\n"
+        f"Silence removed: {sum(engine.removed.values()):.1f}s\n"
+    )
+    if engine.layout is not None:
+        sys.stdout.write(f"Transcribe pool: {engine.layout}, effective concurrency: {engine.concurrency}\n")
+    if engine.batches > 0:
+        sys.stdout.write(f"Batched: {engine.batched_files} files in {engine.batches} batches\n")
+    slowest = engine.stats.slowest_stage
+    if slowest is not None:
+        sys.stdout.write(f"Slowest stage: {slowest[0]} ({slowest[1]:.0%} of stages time)\n")
+    return 1 if len(engine.failed) > 0 else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
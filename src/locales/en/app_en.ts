@@ -26,65 +26,77 @@
 </context><context>
     <name>AudioFilesTable</name>
     <message>
-        <location filename="../../ui/elements/tables/audio_files.py" line="35" />
+        <location filename="../../ui/elements/tables/audio_files.py" line="33" />
         <source>File</source>
         <translation type="unfinished" />
     </message>
     <message>
-        <location filename="../../ui/elements/tables/audio_files.py" line="36" />
+        <location filename="../../ui/elements/tables/audio_files.py" line="34" />
         <source>Language</source>
         <translation type="unfinished" />
     </message>
     <message>
-        <location filename="../../ui/elements/tables/audio_files.py" line="37" />
+        <location filename="../../ui/elements/tables/audio_files.py" line="35" />
         <source>Preset</source>
         <translation type="unfinished" />
     </message>
     <message>
-        <location filename="../../ui/elements/tables/audio_files.py" line="38" />
+        <location filename="../../ui/elements/tables/audio_files.py" line="36" />
+        <source>Prompt</source>
+        <translation type="unfinished" />
+    </message>
+    <message>
+        <location filename="../../ui/elements/tables/audio_files.py" line="37" />
         <source>Word timestamps</source>
         <translation type="unfinished" />
     </message>
     <message>
-        <location filename="../../ui/elements/tables/audio_files.py" line="39" />
+        <location filename="../../ui/elements/tables/audio_files.py" line="38" />
         <source>Condition on previous text</source>
         <translation type="unfinished" />
     </message>
     <message>
-        <location filename="../../ui/elements/tables/audio_files.py" line="40" />
+        <location filename="../../ui/elements/tables/audio_files.py" line="39" />
         <source>FP16</source>
         <translation type="unfinished" />
     </message>
     <message>
-        <location filename="../../ui/elements/tables/audio_files.py" line="53" />
+        <location filename="../../ui/elements/tables/audio_files.py" line="52" />
         <source>Add</source>
         <translation type="unfinished" />
     </message>
     <message>
-        <location filename="../../ui/elements/tables/audio_files.py" line="54" />
+        <location filename="../../ui/elements/tables/audio_files.py" line="53" />
         <source>Remove</source>
         <translation type="unfinished" />
     </message>
     <message>
-        <location filename="../../ui/elements/tables/audio_files.py" line="56" />
+        <location filename="../../ui/elements/tables/audio_files.py" line="55" />
         <source>Add audio</source>
         <translation type="unfinished" />
     </message>
     <message>
-        <location filename="../../ui/elements/tables/audio_files.py" line="60" />
+        <location filename="../../ui/elements/tables/audio_files.py" line="59" />
         <source>Remove selected audio files</source>
         <translation type="unfinished" />
     </message>
     <message>
-        <location filename="../../ui/elements/tables/audio_files.py" line="105" />
+        <location filename="../../ui/elements/tables/audio_files.py" line="104" />
         <source>Add files</source>
         <translation type="unfinished" />
     </message>
     <message>
-        <location filename="../../ui/elements/tables/audio_files.py" line="134" />
+        <location filename="../../ui/elements/tables/audio_files.py" line="133" />
         <source>Undefined</source>
         <translation type="unfinished" />
     </message>
+</context><context>
+    <name>ExportFormatsSelector</name>
+    <message>
+        <location filename="../../ui/elements/selectors/export_formats.py" line="14" />
+        <source>Segments formats</source>
+        <translation type="unfinished" />
+    </message>
 </context><context>
     <name>LanguageSelector</name>
     <message>
@@ -95,41 +107,61 @@
 </context><context>
     <name>MainWindow</name>
     <message>
-        <location filename="../../ui/app.py" line="104" />
+        <location filename="../../ui/app.py" line="122" />
         <source>About</source>
         <translation type="unfinished" />
     </message>
     <message>
-        <location filename="../../ui/app.py" line="108" />
+        <location filename="../../ui/app.py" line="126" />
         <source>Start</source>
         <translation type="unfinished" />
     </message>
     <message>
-        <location filename="../../ui/app.py" line="123" />
+        <location filename="../../ui/app.py" line="142" />
         <source>App name</source>
         <translation type="unfinished" />
     </message>
+    <message>
+        <location filename="../../ui/app.py" line="234" />
+        <source>Unfinished task</source>
+        <translation type="unfinished" />
+    </message>
+    <message>
+        <location filename="../../ui/app.py" line="235" />
+        <source>Previous task was interrupted. Resume it?</source>
+        <translation type="unfinished" />
+    </message>
 </context><context>
     <name>MainWindowHeading</name>
     <message>
-        <location filename="../../ui/app.py" line="20" />
+        <location filename="../../ui/app.py" line="25" />
         <source>App name</source>
         <translation>Whisper GUI</translation>
     </message>
     <message>
-        <location filename="../../ui/app.py" line="22" />
+        <location filename="../../ui/app.py" line="27" />
         <source>Note, that the application just wraps OpenAI model. Besides model downloading, &lt;b&gt;all processes run locally&lt;/b&gt;, so the performance highly depends on your machine resources</source>
         <translation type="unfinished" />
     </message>
 </context><context>
     <name>ModelsSelectionLayout</name>
     <message>
-        <location filename="../../ui/app.py" line="41" />
+        <location filename="../../ui/app.py" line="44" />
+        <source>int8</source>
+        <translation type="unfinished" />
+    </message>
+    <message>
+        <location filename="../../ui/app.py" line="45" />
+        <source>Quantized model runs faster on CPU with slightly different results</source>
+        <translation type="unfinished" />
+    </message>
+    <message>
+        <location filename="../../ui/app.py" line="48" />
         <source>About models</source>
         <translation type="unfinished" />
     </message>
     <message>
-        <location filename="../../ui/app.py" line="53" />
+        <location filename="../../ui/app.py" line="61" />
         <source>Choose model</source>
         <translation type="unfinished" />
     </message>
@@ -177,77 +209,119 @@
         <source>Source</source>
         <translation type="unfinished" />
     </message>
+    <message>
+        <location filename="../../ui/windows/models.py" line="46" />
+        <source>Transcription runs in several processes, which count and threads are chosen from CPU cores, available memory and the model size. To find the fastest layout on this machine, run a batch from the command line with &lt;code&gt;--calibrate&lt;/code&gt; once: the application uses calibrated layouts too</source>
+        <translation type="unfinished" />
+    </message>
+</context><context>
+    <name>QueuedFilesList</name>
+    <message>
+        <location filename="../../ui/windows/running_task.py" line="67" />
+        <source>Move up</source>
+        <translation type="unfinished" />
+    </message>
+    <message>
+        <location filename="../../ui/windows/running_task.py" line="68" />
+        <source>Cancel</source>
+        <translation type="unfinished" />
+    </message>
+    <message>
+        <location filename="../../ui/windows/running_task.py" line="79" />
+        <source>Files queue</source>
+        <translation type="unfinished" />
+    </message>
 </context><context>
     <name>TaskWindow</name>
     <message>
-        <location filename="../../ui/windows/running_task.py" line="41" />
+        <location filename="../../ui/windows/running_task.py" line="176" />
         <source>Running task</source>
         <translation type="unfinished" />
     </message>
     <message>
-        <location filename="../../ui/windows/running_task.py" line="43" />
+        <location filename="../../ui/windows/running_task.py" line="178" />
         <source>Model preparation</source>
         <translation type="unfinished" />
     </message>
     <message>
-        <location filename="../../ui/windows/running_task.py" line="88" />
-        <location filename="../../ui/windows/running_task.py" line="43" />
+        <location filename="../../ui/windows/running_task.py" line="232" />
+        <location filename="../../ui/windows/running_task.py" line="178" />
         <source>Loading</source>
         <translation type="unfinished" />
     </message>
     <message>
-        <location filename="../../ui/windows/running_task.py" line="44" />
+        <location filename="../../ui/windows/running_task.py" line="179" />
         <source>Files preparation</source>
         <translation type="unfinished" />
     </message>
     <message>
-        <location filename="../../ui/windows/running_task.py" line="47" />
+        <location filename="../../ui/windows/running_task.py" line="182" />
+        <source>Throughput</source>
+        <translation type="unfinished" />
+    </message>
+    <message>
+        <location filename="../../ui/windows/running_task.py" line="183" />
+        <source>Slowest stage</source>
+        <translation type="unfinished" />
+    </message>
+    <message>
+        <location filename="../../ui/windows/running_task.py" line="185" />
         <source>Task complete</source>
         <translation type="unfinished" />
     </message>
     <message>
-        <location filename="../../ui/windows/running_task.py" line="88" />
+        <location filename="../../ui/windows/running_task.py" line="232" />
         <source>Ready</source>
         <translation type="unfinished" />
     </message>
+    <message>
+        <location filename="../../ui/windows/running_task.py" line="282" />
+        <source>audio hours per hour</source>
+        <translation type="unfinished" />
+    </message>
 </context><context>
     <name>TranscribedFilesList</name>
     <message>
-        <location filename="../../ui/windows/running_task.py" line="17" />
+        <location filename="../../ui/windows/running_task.py" line="19" />
         <source>Files transcription</source>
         <translation type="unfinished" />
     </message>
+    <message>
+        <location filename="../../ui/windows/running_task.py" line="42" />
+        <source>Failed</source>
+        <translation type="unfinished" />
+    </message>
+    <message>
+        <location filename="../../ui/windows/running_task.py" line="51" />
+        <source>Cancelled</source>
+        <translation type="unfinished" />
+    </message>
 </context><context>
     <name>Transcriber</name>
     <message>
-        <location filename="../../transcriber/transcriber.py" line="65" />
+        <location filename="../../transcriber/transcriber.py" line="101" />
         <source>Source</source>
         <translation type="unfinished" />
     </message>
     <message>
-        <location filename="../../transcriber/transcriber.py" line="66" />
+        <location filename="../../transcriber/transcriber.py" line="102" />
         <source>Language</source>
         <translation type="unfinished" />
     </message>
     <message>
-        <location filename="../../transcriber/transcriber.py" line="67" />
+        <location filename="../../transcriber/transcriber.py" line="103" />
         <source>Created</source>
         <translation type="unfinished" />
     </message>
-    <message>
-        <location filename="../../transcriber/transcriber.py" line="71" />
-        <source>Segments timings can mismatch audio timings, as voice detection was used to remove silence gaps</source>
-        <translation type="unfinished" />
-    </message>
 </context><context>
     <name>WhisperModel</name>
     <message>
-        <location filename="../../transcriber/schemas.py" line="92" />
+        <location filename="../../transcriber/schemas.py" line="103" />
         <source>is loaded</source>
         <translation type="unfinished" />
     </message>
     <message>
-        <location filename="../../transcriber/schemas.py" line="92" />
+        <location filename="../../transcriber/schemas.py" line="103" />
         <source>not loaded</source>
         <translation type="unfinished" />
     </message>
@@ -2,12 +2,17 @@ import logging
 from logging.handlers import RotatingFileHandler
 import multiprocessing
 import sys
+from time import perf_counter
+from typing import TYPE_CHECKING, Tuple
 
 from PyQt6.QtWidgets import QApplication
-from PyQt6.QtCore import QTranslator
+from PyQt6.QtCore import QTimer, QTranslator
 
-from src.ui.app import MainWindow
 from src.settings import settings
+from src.transcriber.timing import StageTimer
+
+if TYPE_CHECKING:
+    from src.ui.app import MainWindow
 
 
 formatter = logging.Formatter(
@@ -29,17 +34,54 @@ root.addHandler(handler)
 logging.getLogger("numba").setLevel("WARNING")
 
 
-def main() -> None:
-    app = QApplication(sys.argv)
-    translator = QTranslator()
-    translator.load(str(settings.BASE_DIR / "locales" / f"app.qm"))
-    app.installTranslator(translator)
+def start(startup: StageTimer) -> Tuple[QApplication, "MainWindow"]:
+    """
+    Creates application and shows main window
+
+    :param startup: timer to record startup stages to
+    :return: application, main window
+    """
+    with startup.measure("application"):
+        app = QApplication(sys.argv)
+        translator = QTranslator()
+        translator.load(str(settings.BASE_DIR / "locales" / f"app.qm"))
+        app.installTranslator(translator)
 
-    window = MainWindow()
-    app.aboutToQuit.connect(window.on_quit)
+    # Application modules are imported here to measure their import time
+    with startup.measure("imports"):
+        from src.ui.app import MainWindow
+
+    with startup.measure("window"):
+        window = MainWindow()
+        app.aboutToQuit.connect(window.on_quit)
 
     root.info("Starting app")
-    window.show()
+    with startup.measure("show"):
+        window.show()
+    return app, window
+
+
+def report_startup(startup: StageTimer) -> None:
+    """
+    Logs time of every startup stage
+
+    :param startup: startup stages timer
+    """
+    total = sum(startup.stages.values())
+    stages = ", ".join(f"{stage} {duration:.3f}s" for stage, duration in startup.stages.items())
+    root.info("Window appeared in %.3fs: %s", total, stages)
+
+
+def main() -> None:
+    startup = StageTimer()
+    app, window = start(startup)
+    shown = perf_counter()
+
+    def on_event_loop_started() -> None:
+        startup.add("event loop", perf_counter() - shown)
+        report_startup(startup)
+
+    QTimer.singleShot(0, on_event_loop_started)
     app.exec()
 
 
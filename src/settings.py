@@ -1,6 +1,6 @@
 from pathlib import Path
 import os
-from typing import Literal
+from typing import Literal, Optional
 
 from pydantic import BaseModel
 
@@ -25,5 +25,12 @@ class Settings(BaseModel):
     CACHE_DIR: Path = Path("~/.cache/whisper").expanduser()
     LOGGING_DIR: Path = CACHE_DIR / "logs"
 
+    # Caches
+    AUDIO_CACHE_SIZE: int = 2 * 1024**3  #: Prepared audio cache size budget, bytes
+    TRANSCRIPTION_CACHE_SIZE: int = 256 * 1024**2  #: Transcription cache size budget, bytes
+    #: Memory budget of transcribe processes kept with models loaded between tasks, bytes.
+    #: If not set, processes are kept, while they fit into available memory
+    MODEL_CACHE_SIZE: Optional[int] = None
+
 
 settings = Settings()
@@ -1,2 +1,11 @@
 from .transcriber import Transcriber
-from .audio_processor import AudioPreprocessor
+
+
+def __getattr__(name: str):
+    # Audio processing imports scipy, which is slow to import, so it is not imported with the package,
+    # but on first access. Submodules, e.g. worker, are imported with `from src.transcriber import worker`
+    if name == "AudioPreprocessor":
+        from .audio_processor import AudioPreprocessor
+
+        return AudioPreprocessor
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,146 +1,400 @@
+from dataclasses import dataclass, field, replace
 from logging import getLogger
 from pathlib import Path
-from typing import Tuple
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
-from scipy.signal import resample_poly, butter, lfilter
 import soundfile as sf
 
-from src.transcriber.schemas import ModelSettings
+from src.transcriber import chunking, mel, vad
+from src.transcriber.cache import PreparedAudioCache, file_digest
+from src.transcriber.schemas import ModelSettings, PreprocessingSettings, VADSettings
+from src.transcriber.spool import AudioSpool, SpooledAudio, SpooledMel
+from src.transcriber.streaming import StreamingHighpass, StreamingResampler
+from src.transcriber.timeline import TimeMap, mask_ranges
+from src.transcriber.timing import StageTimer
+
+
+@dataclass(frozen=True)
+class PreparedAudio:
+    """
+    Audio file prepared for transcription
+    """
+
+    path: Path  #: Source file
+    audio: SpooledAudio
+    preset: ModelSettings
+    chunks: Tuple[chunking.AudioChunk, ...] = ()  #: Parts to transcribe concurrently, if audio is long
+    time_map: Optional[TimeMap] = None  #: Map to original audio timings, if silence was removed
+    cached: bool = False  #: Whether audio was taken from prepared audio cache
+    timings: Dict[str, float] = field(default_factory=dict)  #: Preparation stage -> duration, seconds
+    #: Log-mel spectrogram of the audio, or of all chunks one after another, if it was computed in preparation
+    mel: Optional[SpooledMel] = None
+
+    @property
+    def removed_duration(self) -> float:
+        """
+        Duration of silence removed by VAD, seconds
+        """
+        return self.time_map.removed_duration if self.time_map is not None else 0.0
+
+    def release(self) -> None:
+        """
+        Removes spool files of audio and its spectrogram
+        """
+        self.audio.release()
+        if self.mel is not None:
+            self.mel.release()
 
 
 class AudioPreprocessor:
     eps: float = 1e-9
     frame_ms: int = 30
+    #: Audio is loaded and processed by blocks of this size, frames
+    block_size: int = 2**18
+    #: Long audio is split into chunks of about this duration, seconds
+    chunk_s: int = 300
+    #: Distance from the target chunk end to look for silence in, seconds
+    chunk_search_s: int = 30
+    #: Chunk beginning overlap with the previous chunk, seconds
+    chunk_overlap_s: float = 1.0
 
-    def __init__(self) -> None:
+    def __init__(self, spool: Optional[AudioSpool] = None, cache: Optional[PreparedAudioCache] = None) -> None:
+        """
+        :param spool: spool to store prepared audio in
+        :param cache: prepared audio cache, if preprocessing results should be reused
+        """
         self.logger = getLogger(self.__class__.__name__)
+        self.spool = spool or AudioSpool()
+        self.cache = cache
+        self.timer = StageTimer()
 
-    def __call__(self, path: Path, preset: ModelSettings, target_sr: int = 16_000) -> Tuple[Path, np.ndarray, ModelSettings]:
+    def __call__(
+        self,
+        path: Path,
+        preset: ModelSettings,
+        target_sr: int = 16_000,
+        digest: Optional[str] = None,
+        n_mels: Optional[int] = None,
+    ) -> PreparedAudio:
         """
         Wraps running method to return all data required for process manager
 
+        Processed audio is stored in spool, so that only a small handle is sent between processes.
+        Long audio is also split at silence into chunks, that can be transcribed concurrently.
+        If cache is set, audio prepared earlier with the same preprocessing settings is reused.
+        If mel bins count is set, model-ready log-mel spectrogram of the audio or of every chunk is computed too
+
         :param path: path to audio file
         :param preset: preset
         :param target_sr:
-        :return: path to audio file, processed audio, preset
+        :param digest: audio file content hash, if already calculated
+        :param n_mels: mel bins of the model to compute spectrogram for, spectrogram is not computed if not set
+        :return: prepared audio
+        """
+        self.timer.reset()
+        key, cached = None, None
+        if self.cache is not None:
+            key = self.cache.key(digest or file_digest(path), preset.preprocessing, target_sr, self.frame_ms)
+            with self.timer.measure("cache"):
+                cached = self.cache.load(key, self.spool)
+
+        if cached is not None:
+            audio, spooled, time_map = cached
+            self.logger.debug("Prepared audio cache hit: %s", path.name)
+        else:
+            audio, spooled, time_map = self.run(path, preset.preprocessing, target_sr)
+            if key is not None:
+                with self.timer.measure("cache"):
+                    self.store_cache(key, audio, spooled, time_map)
+
+        with self.timer.measure("split"):
+            chunks = self.split(audio, spooled)
+
+        spooled_mel = None
+        if n_mels is not None:
+            try:
+                with self.timer.measure("mel"):
+                    spooled_mel, chunks = self.prepare_mel(key, audio, spooled, chunks, n_mels)
+            except Exception:
+                spooled.release()
+                raise
+        return PreparedAudio(
+            path=path,
+            audio=spooled,
+            preset=preset,
+            chunks=chunks,
+            time_map=time_map,
+            cached=cached is not None,
+            timings=dict(self.timer.stages),
+            mel=spooled_mel,
+        )
+
+    def prepare_mel(
+        self,
+        key: Optional[str],
+        audio: np.ndarray,
+        spooled: SpooledAudio,
+        chunks: Tuple[chunking.AudioChunk, ...],
+        n_mels: int,
+    ) -> Tuple[SpooledMel, Tuple[chunking.AudioChunk, ...]]:
         """
-        audio = self.run(path, preset.name, target_sr)
-        return path, audio, preset
+        Computes log-mel spectrogram of the audio, or of every chunk, if audio is split, and stores it in spool.
+        Spectrogram is taken from cache, if it was computed for the same prepared audio earlier
 
-    def run(self, path: Path, preset: str, target_sr: int = 16_000) -> np.ndarray:
+        :param key: cache entry key, if cache is set
+        :param audio: prepared audio data
+        :param spooled: spool handle of prepared audio
+        :param chunks: audio chunks
+        :param n_mels: mel bins of the model
+        :return: spool handle of spectrogram, chunks with their spectrograms
         """
-        Runs complete pipeline to preprocess audio data before giving it to Whisper
+        units = [chunk.audio for chunk in chunks] or [spooled]
+        frames = [mel.frames(unit.length) for unit in units]
+        cached = self.cache.load_mel(key, n_mels, sum(frames), self.spool) if key is not None else None
+        if cached is not None:
+            self.logger.debug("Spectrogram cache hit: %s mel bins", n_mels)
+            return cached[1], self.assign_mel(cached[1], chunks, frames)
 
-        Changes processing pipeline and stages parameters depending on user defined preset
+        buffer, spooled_mel = self.spool.allocate_mel(n_mels, sum(frames))
+        try:
+            position = 0
+            for unit, count in zip(units, frames, strict=True):
+                start = unit.offset - spooled.offset
+                buffer[position : position + count] = mel.compute(audio[start : start + unit.length], n_mels).T
+                position += count
+            if isinstance(buffer, np.memmap):
+                buffer.flush()
+        except Exception:
+            spooled_mel.release()
+            raise
 
-        :param path: path to audio file
-        :param preset: preset name
-        :param target_sr:
-        :return: processed audio file, whether VAD was used
+        if key is not None:
+            try:
+                self.cache.store_mel(key, buffer)
+            except OSError as e:
+                self.logger.warning("Unable to cache spectrogram: %s", e)
+        return spooled_mel, self.assign_mel(spooled_mel, chunks, frames)
+
+    @staticmethod
+    def assign_mel(
+        spooled_mel: SpooledMel, chunks: Tuple[chunking.AudioChunk, ...], frames: List[int]
+    ) -> Tuple[chunking.AudioChunk, ...]:
         """
-        normalized_audio = self.normalize(self.load_file(path, target_sr))
-        if preset == "universal":
-            return normalized_audio
+        Gives every chunk the view of its part of the spectrogram
 
-        if preset == "studio":
-            return self.apply_vad(normalized_audio, sr=target_sr, threshold=0.006, pad_ms=200)
+        :param spooled_mel: spectrogram of all chunks one after another
+        :param chunks: audio chunks
+        :param frames: frames count of every chunk
+        :return: chunks with their spectrograms
+        """
+        starts = np.cumsum([0, *frames[:-1]])
+        return tuple(
+            replace(chunk, mel=spooled_mel.view(int(start), int(start) + count))
+            for chunk, start, count in zip(chunks, starts, frames, strict=False)
+        )
 
-        if preset == "phone_call":
-            return self.apply_vad(
-                self.highpass_denoise(normalized_audio, target_sr, 150), target_sr, threshold=0.02, pad_ms=300
-            )
+    def store_cache(self, key: str, audio: np.ndarray, spooled: SpooledAudio, time_map: Optional[TimeMap]) -> None:
+        """
+        Stores prepared audio to cache. Failure to cache does not fail preparation
 
-        if preset == "dictophone":
-            return self.apply_vad(
-                self.highpass_denoise(normalized_audio, target_sr, 80), target_sr, threshold=0.012, pad_ms=250
-            )
+        :param key: cache entry key
+        :param audio: prepared audio
+        :param spooled: spool handle of prepared audio
+        :param time_map: map to original audio timings
+        """
+        try:
+            self.cache.store(key, audio, spooled.sr, time_map)
+        except OSError as e:
+            self.logger.warning("Unable to cache prepared audio: %s", e)
+
+    def run(
+        self, path: Path, preprocessing: PreprocessingSettings, target_sr: int = 16_000
+    ) -> Tuple[np.ndarray, SpooledAudio, Optional[TimeMap]]:
+        """
+        Runs complete pipeline to preprocess audio data before giving it to Whisper
 
-        if preset == "outdoors":
-            return self.apply_vad(
-                self.highpass_denoise(normalized_audio, target_sr, 200), target_sr, threshold=0.04, pad_ms=350
-            )
+        Processing stages and their parameters are defined by user selected preset.
+        Audio is processed in place in spool file, so that memory usage does not depend on audio duration.
+        Stages durations are accumulated in `timer`
 
-        if preset == "music":
-            return self.apply_vad(
-                self.highpass_denoise(normalized_audio, target_sr, 120), target_sr, threshold=0.06, pad_ms=400
-            )
+        :param path: path to audio file
+        :param preprocessing: preset preprocessing settings
+        :param target_sr:
+        :return: processed audio file, its spool handle, map to original audio timings, if VAD removed silence
+        """
+        audio, spooled, peak = self.load_file(path, target_sr, highpass_cutoff=preprocessing.highpass_cutoff)
+        with self.timer.measure("normalize"):
+            audio = self.normalize(audio, peak)
+        if preprocessing.vad is None:
+            return audio, spooled, None
 
-        raise ValueError("Unable to process preset %s" % preset)
+        with self.timer.measure("vad"):
+            audio, time_map = self.apply_vad(audio, sr=target_sr, settings=preprocessing.vad)
+        return audio, replace(spooled, length=len(audio)), time_map
 
-    def load_file(self, path: Path, target_sr: int = 16_000) -> np.ndarray:
+    def load_file(
+        self, path: Path, target_sr: int = 16_000, highpass_cutoff: Optional[int] = None
+    ) -> Tuple[np.ndarray, SpooledAudio, float]:
         """
         Loads audio file, converts it to mono channel and resamples to target SR
 
+        File is read and processed by `block_size` frames and written directly to spool file.
+        Spool file is sized by file header and grows, if decoder delivers more frames, as it may for VBR files
+
         :param path: audio path
         :param target_sr: target SR
-        :return: audio data
+        :param highpass_cutoff: high-pass denoise cutoff, if denoise is required
+        :return: audio data, its spool handle, peak amplitude before denoise
+        """
+        with sf.SoundFile(path.resolve()) as file:
+            if file.channels > 1:
+                self.logger.debug("Converting to mono channel from %s channels", file.channels)
+            if file.samplerate != target_sr:
+                self.logger.debug("Resampling from %s to %s", file.samplerate, target_sr)
+
+            resampler = StreamingResampler(file.samplerate, target_sr, file.frames)
+            highpass = StreamingHighpass(target_sr, highpass_cutoff) if highpass_cutoff else None
+            audio, spooled = self.spool.allocate(resampler.n_out, target_sr)
+
+            blocks = file.blocks(blocksize=self.block_size, dtype="float32", always_2d=True)
+            position, peak = 0, 0.0
+            try:
+                while True:
+                    with self.timer.measure("decode"):
+                        block = next(blocks, None)
+                    if block is None:
+                        break
+                    with self.timer.measure("resample"):
+                        block = resampler.process(block.mean(axis=1))
+                    audio, spooled = self.reserve(audio, spooled, position + len(block))
+                    position, peak = self.write_block(audio, position, peak, block, highpass)
+                with self.timer.measure("resample"):
+                    block = resampler.flush()
+                audio, spooled = self.reserve(audio, spooled, position + len(block))
+                position, peak = self.write_block(audio, position, peak, block, highpass)
+            except Exception:
+                spooled.release()
+                raise
+
+        if resampler.consumed != file.frames:
+            self.logger.info("Decoded %s frames of %s, while its header states %s", resampler.consumed, path.name, file.frames)
+        return audio[:position], replace(spooled, length=position), peak
+
+    def reserve(self, audio: np.ndarray, spooled: SpooledAudio, length: int) -> Tuple[np.ndarray, SpooledAudio]:
         """
-        audio, sr = sf.read(path.resolve(), always_2d=False, dtype="float32")
+        Grows output buffer, if it is shorter than required
 
-        if audio.ndim > 1:
-            self.logger.debug("Converting to mono channel from %s channels", audio.ndim)
-            audio = np.mean(audio, axis=1)
+        :param audio: output buffer
+        :param spooled: handle of the buffer spool file
+        :param length: required samples count
+        :return: output buffer, its spool handle
+        """
+        if length <= len(audio):
+            return audio, spooled
+        # Grows by half at least, so that long underestimated files are not copied block by block
+        return self.spool.grow(audio, spooled, max(length, len(audio) * 3 // 2))
 
-        if sr != target_sr:
-            audio = resample_poly(audio, up=target_sr, down=sr)
-            self.logger.debug("Resampling from %s to %s", sr, target_sr)
+    def write_block(
+        self, audio: np.ndarray, position: int, peak: float, block: np.ndarray, highpass: Optional[StreamingHighpass]
+    ) -> Tuple[int, float]:
+        """
+        Writes loaded block to output buffer
 
-        return audio.astype(np.float32)
+        :param audio: output buffer, long enough for the block
+        :param position: block position in output
+        :param peak: peak amplitude so far
+        :param block: resampled block
+        :param highpass: high-pass filter, if denoise is required
+        :return: next block position, updated peak amplitude
+        """
+        if len(block) == 0:
+            return position, peak
+        peak = max(peak, float(np.max(np.abs(block))))
+        if highpass is not None:
+            with self.timer.measure("filter"):
+                block = highpass.process(block)
+        audio[position : position + len(block)] = block
+        return position + len(block), peak
 
-    def normalize(self, audio: np.ndarray) -> np.ndarray:
+    def normalize(self, audio: np.ndarray, peak: Optional[float] = None) -> np.ndarray:
         """
         Normalizes audio range by min-max scaling
 
+        Audio is scaled in place
+
         :param audio: audio data
+        :param peak: peak amplitude, if already known
         :return: normalized data
         """
-        ratio = np.max(np.abs(audio)) + self.eps
-        return (audio / ratio).astype(np.float32)
+        if peak is None:
+            peak = float(np.max(np.abs(audio))) if len(audio) > 0 else 0.0
+        ratio = np.float32(peak + self.eps)
+        for start in range(0, len(audio), self.block_size):
+            audio[start : start + self.block_size] /= ratio
+        return audio
 
-    @staticmethod
-    def highpass_denoise(audio: np.ndarray, sr: int = 16_000, cutoff: int = 80) -> np.ndarray:
+    def apply_vad(
+        self, audio: np.ndarray, sr: int = 16_000, settings: Optional[VADSettings] = None
+    ) -> Tuple[np.ndarray, Optional[TimeMap]]:
         """
-        Applies high-pass denoise to (normalized) data
+        Cuts out silence elements to speed up Whisper processing
+
+        Kept frames ranges are recorded, so that transcription timings can be restored
+        to the original audio timeline
 
-        :param audio: normalized audio data
+        :param audio: audio data
         :param sr:
-        :param cutoff:
-        :return: denoised audio data
+        :param settings: VAD settings
+        :return: audio with no-speech pieces removed, map to original audio timings
         """
-        b, a = butter(2, cutoff / (sr / 2), btype="highpass")
-        return lfilter(b, a, audio).astype(np.float32)
+        frame_len = int(sr * self.frame_ms / 1_000)
+        mask = vad.get_detector(settings or VADSettings(), sr, self.frame_ms).detect(audio)
+
+        if not mask.any():
+            return audio, None  # Let whisper process the original file
+
+        # Move voiced pieces to the beginning of the buffer
+        position = 0
+        for start, stop in zip(*mask_ranges(mask), strict=True):
+            for block_start in range(start * frame_len, stop * frame_len, self.block_size):
+                block_stop = min(block_start + self.block_size, stop * frame_len)
+                audio[position : position + block_stop - block_start] = audio[block_start:block_stop]
+                position += block_stop - block_start
+
+        time_map = TimeMap.from_mask(mask, frame_len, sr, length=len(audio))
+        self.logger.debug("Applied VAD: %s -> %s, removed %.1fs", audio.shape, (position,), time_map.removed_duration)
+        return audio[:position], time_map
 
-    def apply_vad(self, audio: np.ndarray, sr: int = 16_000, threshold: float = 0.1, pad_ms: int = 200) -> np.ndarray:
+    def frame_energy(self, audio: np.ndarray, sr: int = 16_000) -> np.ndarray:
         """
-        Cuts out silence elements to speed up Whisper processing
+        Calculates mean energy of every `frame_ms` frame
 
         :param audio: audio data
         :param sr:
-        :param threshold:
-        :param pad_ms:
-        :return: audio with no-speech pieces removed
+        :return: energy per frame
         """
         frame_len = int(sr * self.frame_ms / 1_000)
-        # Get energy per frame
-        frames = audio[: len(audio) // frame_len * frame_len]
-        frames = frames.reshape(-1, frame_len)
-        energy = np.mean(frames**2, axis=1)
-
-        # Create mask that seems to be speeched
-        mask = energy > threshold
-        # Widen mask not to cut off beginnings and endings of words
-        pad = int(pad_ms / self.frame_ms)
-        for i in range(1, pad + 1):
-            mask[:-i] |= mask[i:]
-            mask[i:] |= mask[:-i]
-
-        # Get voiced pieces
-        voiced = frames[mask]
-
-        if len(voiced) == 0:
-            return audio  # Let whisper process the original file
-
-        voiced = voiced.reshape(-1)
-        self.logger.debug("Applied VAD: %s -> %s", audio.shape, voiced.shape)
-        return voiced.astype(np.float32)
+        frames = audio[: len(audio) // frame_len * frame_len].reshape(-1, frame_len)
+        return np.einsum("ij,ij->i", frames, frames) / frame_len
+
+    def split(self, audio: np.ndarray, spooled: SpooledAudio) -> Tuple[chunking.AudioChunk, ...]:
+        """
+        Splits long audio at the quietest frames into chunks of about `chunk_s` duration
+
+        :param audio: audio data
+        :param spooled: spooled audio data
+        :return: chunks, if audio is long enough to be split, empty tuple otherwise
+        """
+        frame_len = int(spooled.sr * self.frame_ms / 1_000)
+        points = chunking.find_split_points(
+            self.frame_energy(audio, spooled.sr),
+            frame_len=frame_len,
+            chunk_len=self.chunk_s * spooled.sr,
+            search_len=self.chunk_search_s * spooled.sr,
+        )
+        if len(points) == 0:
+            return ()
+
+        self.logger.debug("Split audio into %s chunks", len(points) + 1)
+        return chunking.split(spooled, points, overlap_len=int(self.chunk_overlap_s * spooled.sr))
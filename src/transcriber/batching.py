@@ -0,0 +1,238 @@
+"""
+Batched inference of short recordings
+
+whisper transcribes a recording window by window, running the encoder and the decoder on a single 30 seconds
+window at a time, so per-call overhead dominates for short recordings. Batched transcription runs
+`whisper.transcribe` of every recording with a replaying model proxy: model calls, that were answered in previous
+rounds, are replayed, and the first unanswered one stops transcription. Pending calls of all recordings are then
+run through the encoder and the decoder as one batch, and the next round starts.
+Recordings are transcribed by the very same whisper code, so results match sequential transcription,
+while the model runs once per round instead of once per recording
+"""
+
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import torch
+import whisper
+from whisper.decoding import DecodingOptions, DecodingTask
+
+from . import mel as mel_spectrogram
+
+
+#: Rounds of batched model calls. Recordings, that still need the model afterwards, call it directly,
+#: as every round replays transcription from the beginning
+MAX_ROUNDS = 8
+
+logger = getLogger(__name__)
+
+#: Whether whisper decoding task has the methods, that batch decoding overrides. They are not a public API,
+#: so with whisper versions, that lack them, recordings are transcribed one by one
+BATCH_DECODING = all(callable(getattr(DecodingTask, name, None)) for name in ("_get_audio_features", "_detect_language"))
+if not BATCH_DECODING:
+    logger.warning("Batch decoding is not supported by whisper %s, recordings are transcribed one by one", whisper.__version__)
+
+
+@dataclass
+class ModelCall:
+    """
+    Model call of a single recording, that is run in a batch
+    """
+
+    method: str  #: `detect_language` or `decode`
+    mel: torch.Tensor  #: Log-mel spectrogram of a 30 seconds window
+    options: Optional[DecodingOptions] = None  #: Decoding options of `decode` call
+
+
+class PendingCallError(Exception):
+    """
+    Stops transcription at the model call, that has not been answered yet
+    """
+
+    def __init__(self, call: ModelCall) -> None:
+        super().__init__(call.method)
+        self.call = call
+
+
+class ReplayModel:
+    """
+    Whisper model proxy, that answers model calls of a single recording with the results of previous rounds.
+    Other attributes and the forward pass, that word timestamps alignment runs, are taken from the model
+    """
+
+    def __init__(self, model: whisper.Whisper, answers: List[Any], live: bool = False) -> None:
+        """
+        :param model: whisper model
+        :param answers: results of the recording model calls in the order of calls
+        :param live: whether to call the model, once answers are over, instead of stopping transcription
+        """
+        self.model = model
+        self.answers = answers
+        self.live = live
+        self.calls = 0
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.model, name)
+
+    def __call__(self, *args, **kwargs) -> torch.Tensor:
+        return self.model(*args, **kwargs)
+
+    def detect_language(self, mel: torch.Tensor, tokenizer=None) -> Any:
+        return self.answer(ModelCall("detect_language", mel))
+
+    def decode(self, mel: torch.Tensor, options: Optional[DecodingOptions] = None) -> Any:
+        return self.answer(ModelCall("decode", mel, options or DecodingOptions()))
+
+    def answer(self, call: ModelCall) -> Any:
+        """
+        Replays the next answered call
+
+        :param call: model call
+        :return: call result
+        :raise PendingCallError: call has not been answered yet
+        """
+        if self.calls < len(self.answers):
+            self.calls += 1
+            return self.answers[self.calls - 1]
+        if not self.live:
+            raise PendingCallError(call)
+        if call.method == "detect_language":
+            return self.model.detect_language(call.mel)
+        return self.model.decode(call.mel, call.options)
+
+
+class BatchDecodingTask(DecodingTask):
+    """
+    Decoding task, that runs beam search and best-of sampling of several windows at once.
+    whisper repeats initial tokens of every window for each beam or sample, but keeps a single copy
+    of the window audio features, which only matches tokens of a single window. Features are repeated the same way,
+    and languages are reported once per window. Language must be set, as it is when `whisper.transcribe` decodes
+    """
+
+    def _get_audio_features(self, mel: torch.Tensor) -> torch.Tensor:
+        return super()._get_audio_features(mel).repeat_interleave(self.n_group, dim=0)
+
+    def _detect_language(self, audio_features: torch.Tensor, tokens: torch.Tensor) -> Tuple[List[str], None]:
+        languages, _ = super()._detect_language(audio_features, tokens)
+        return languages[:: self.n_group], None
+
+
+def encode(model: whisper.Whisper, calls: Dict[int, ModelCall], encoded: Dict[int, Tuple[torch.Tensor, torch.Tensor]]) -> None:
+    """
+    Runs the encoder on windows of the calls as a batch. Window of a recording is encoded once,
+    though language detection and decoding, as well as fallback decoding, call the model with it separately
+
+    :param model: whisper model
+    :param calls: recording index -> pending call
+    :param encoded: recording index -> the last encoded window and its audio features, is updated
+    """
+    missing = [i for i, call in calls.items() if i not in encoded or not torch.equal(encoded[i][0], call.mel)]
+    for dtype in {calls[i].mel.dtype for i in missing}:
+        indices = [i for i in missing if calls[i].mel.dtype == dtype]
+        with torch.no_grad():
+            features = model.encoder(torch.stack([calls[i].mel for i in indices]))
+        for i, audio_features in zip(indices, features, strict=True):
+            encoded[i] = (calls[i].mel, audio_features)
+
+
+def run_calls(
+    model: whisper.Whisper, calls: Dict[int, ModelCall], encoded: Dict[int, Tuple[torch.Tensor, torch.Tensor]]
+) -> Dict[int, Any]:
+    """
+    Answers pending calls of several recordings. Language is detected for all recordings at once,
+    and recordings with the same decoding options are decoded together
+
+    :param model: whisper model
+    :param calls: recording index -> pending call
+    :param encoded: recording index -> the last encoded window and its audio features
+    :return: recording index -> call result
+    """
+    encode(model, calls, encoded)
+    answers = {}
+
+    detect = [i for i, call in calls.items() if call.method == "detect_language"]
+    if len(detect) > 0:
+        tokens, probs = whisper.decoding.detect_language(model, torch.stack([encoded[i][1] for i in detect]))
+        for n, i in enumerate(detect):
+            answers[i] = (tokens[n], probs[n])
+
+    decode = [i for i, call in calls.items() if call.method == "decode"]
+    while len(decode) > 0:
+        options = calls[decode[0]].options
+        if options.language is None:
+            answers[decode[0]] = whisper.decoding.decode(model, encoded[decode[0]][1], options)
+            decode = decode[1:]
+            continue
+        group = [i for i in decode if calls[i].options == options]
+        results = BatchDecodingTask(model, options).run(torch.stack([encoded[i][1] for i in group]))
+        answers.update(zip(group, results, strict=True))
+        decode = [i for i in decode if i not in group]
+    return answers
+
+
+def transcribe(model: ReplayModel, audio: np.ndarray, options: Dict[str, Any], mel: Optional[np.ndarray]) -> dict:
+    """
+    Transcribes recording with the model proxy
+
+    :param model: model proxy of the recording
+    :param audio: audio data
+    :param options: `whisper.transcribe` options
+    :param mel: log-mel spectrogram of the audio, computed by whisper if not set
+    :return: whisper result
+    """
+    with mel_spectrogram.precomputed(mel):
+        return whisper.transcribe(model, audio, **options)
+
+
+def transcribe_batch(
+    model: whisper.Whisper, items: Sequence[Tuple[np.ndarray, Dict[str, Any], Optional[np.ndarray]]]
+) -> List[Union[dict, BaseException]]:
+    """
+    Transcribes several recordings, running the model on their windows as a batch
+
+    :param model: whisper model
+    :param items: audio data, `whisper.transcribe` options and log-mel spectrogram, if computed, of every recording
+    :return: whisper result of every recording, or the error, that its transcription failed with
+    """
+    items = list(items)
+    answers: List[List[Any]] = [[] for _ in items]
+    results: List[Union[dict, BaseException, None]] = [None] * len(items)
+    encoded: Dict[int, Tuple[torch.Tensor, torch.Tensor]] = {}
+    pending = []
+    for i, (audio, options, mel) in enumerate(items):
+        # Every round replays transcription from the beginning, so spectrogram is computed once instead of every round
+        if mel is None:
+            try:
+                items[i] = (audio, options, mel_spectrogram.compute(audio, model.dims.n_mels))
+            except Exception as e:
+                results[i] = e
+                continue
+        pending.append(i)
+
+    rounds = MAX_ROUNDS if BATCH_DECODING else 0
+    for _ in range(rounds):
+        calls = {}
+        for i in pending:
+            try:
+                results[i] = transcribe(ReplayModel(model, answers[i]), *items[i])
+            except PendingCallError as call:
+                calls[i] = call.call
+            except Exception as e:
+                results[i] = e
+        if len(calls) == 0:
+            return results
+
+        for i, answer in run_calls(model, calls, encoded).items():
+            answers[i].append(answer)
+        pending = list(calls)
+
+    if rounds > 0:
+        logger.debug("%s of %s recordings need more than %s model calls", len(pending), len(items), rounds)
+    for i in pending:
+        try:
+            results[i] = transcribe(ReplayModel(model, answers[i], live=True), *items[i])
+        except Exception as e:
+            results[i] = e
+    return results
@@ -0,0 +1,310 @@
+"""
+Disk caches of intermediate results, keyed by audio file content,
+so that reruns of a batch skip the work already done
+"""
+
+from hashlib import sha256
+import json
+from logging import getLogger
+import os
+from pathlib import Path
+from time import time
+from typing import Dict, Optional, Tuple
+from uuid import uuid4
+
+import numpy as np
+
+from src.settings import settings
+from .schemas import ModelSettings, PreprocessingSettings
+from .spool import AudioSpool, SpooledAudio, SpooledMel
+from .timeline import TimeMap
+from .transcriber import Transcriber
+
+
+def file_digest(path: Path, block_size: int = 2**20) -> str:
+    """
+    Calculates hash of the file content
+
+    :param path: file path
+    :param block_size: bytes count to read at once
+    :return: hex digest
+    """
+    digest = sha256()
+    with open(path, mode="rb") as file:
+        while block := file.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    Directory of cache entries, that evicts least recently used entries to stay within the size budget
+
+    Every entry consists of files named after its key. Metadata file `<key>.json` is written last,
+    so that only complete entries are ever read, and its modification time is the entry last use time
+    """
+
+    CACHE_DIR: Path
+    #: Unfinished files older than this are considered left by interrupted writes, seconds
+    stale_tmp_s: int = 3_600
+    #: Changes, whenever cached data format or meaning changes, to invalidate older entries
+    version: int = 1
+
+    def __init__(self, max_bytes: int, directory: Optional[Path] = None) -> None:
+        """
+        :param max_bytes: cache size budget
+        :param directory: cache directory, if not the default one
+        """
+        self.logger = getLogger(self.__class__.__name__)
+        self.max_bytes = max_bytes
+        self.directory = directory or self.CACHE_DIR
+
+    def meta_path(self, key: str) -> Path:
+        """
+        Path of the entry metadata file
+        """
+        return self.directory / f"{key}.json"
+
+    def write_atomic(self, path: Path, data: str) -> None:
+        """
+        Writes text file, so that readers never see it partially written
+
+        :param path: target file
+        :param data: file content
+        """
+        tmp_path = self.directory / f"{path.name}.{uuid4().hex}.tmp"
+        tmp_path.write_text(data, encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def evict(self) -> None:
+        """
+        Removes least recently used entries, until cache fits the size budget.
+        Also removes files left by interrupted writes
+        """
+        now = time()
+        entries: Dict[str, list] = {}  # Key -> last use time, size
+        for path in self.directory.iterdir():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue  # File is removed by another process
+            key = path.name.split(".", 1)[0]
+            entry = entries.setdefault(key, [None, 0])
+            entry[1] += stat.st_size
+            if path.suffix == ".json":
+                entry[0] = stat.st_mtime
+            elif path.suffix == ".tmp" and now - stat.st_mtime > self.stale_tmp_s:
+                path.unlink(missing_ok=True)
+
+        total = sum(size for _, size in entries.values())
+        # Entries without metadata file are being written now or were interrupted
+        complete = sorted((last_use, key) for key, (last_use, _) in entries.items() if last_use is not None)
+        for _, key in complete:
+            if total <= self.max_bytes:
+                break
+            self.meta_path(key).unlink(missing_ok=True)
+            for path in self.directory.glob(f"{key}.*"):
+                path.unlink(missing_ok=True)
+            total -= entries[key][1]
+            self.logger.debug("Evicted cache entry: %s", key)
+
+
+class PreparedAudioCache(DiskCache):
+    """
+    Cache of preprocessed audio
+
+    Every entry is an audio file in float32, so that transcription of cached audio is the same,
+    as of the freshly preprocessed one, and a metadata file with sample rate and map to original audio timings.
+    Entry may also keep log-mel spectrograms of the audio for every mel bins count, that models were run with
+    """
+
+    CACHE_DIR = settings.CACHE_DIR / "audio"
+    #: Entries of version 1 kept audio in float16, which changed transcripts
+    version: int = 2
+    #: Samples count to copy at once
+    block_size: int = 2**18
+
+    def __init__(self, max_bytes: int = settings.AUDIO_CACHE_SIZE, directory: Optional[Path] = None) -> None:
+        super().__init__(max_bytes, directory)
+
+    def key(self, digest: str, preprocessing: PreprocessingSettings, target_sr: int = 16_000, frame_ms: int = 30) -> str:
+        """
+        Creates entry key from audio file content and everything, that affects preprocessing output
+
+        :param digest: audio file content hash
+        :param preprocessing: preprocessing settings
+        :param target_sr:
+        :param frame_ms: VAD frame duration
+        :return: entry key
+        """
+        parameters = f"{self.version}:{digest}:{preprocessing.model_dump_json()}:{target_sr}:{frame_ms}"
+        return sha256(parameters.encode("utf-8")).hexdigest()
+
+    def load(self, key: str, spool: AudioSpool) -> Optional[Tuple[np.ndarray, SpooledAudio, Optional[TimeMap]]]:
+        """
+        Copies cached audio into spool
+
+        :param key: entry key
+        :param spool: spool to copy audio to
+        :return: audio data, its spool handle, map to original audio timings, if entry exists
+        """
+        meta_path = self.meta_path(key)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            stored = np.load(self.directory / f"{key}.npy", mmap_mode="r")
+            audio, spooled = spool.allocate(len(stored), meta["sr"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+        try:
+            for start in range(0, len(stored), self.block_size):
+                audio[start : start + self.block_size] = stored[start : start + self.block_size]
+            os.utime(meta_path)
+        except OSError:
+            spooled.release()
+            return None
+
+        time_map = None
+        if meta["time_map"] is not None:
+            time_map = TimeMap(
+                original_starts=np.array(meta["time_map"]["original_starts"]),
+                compressed_starts=np.array(meta["time_map"]["compressed_starts"]),
+                durations=np.array(meta["time_map"]["durations"]),
+                original_duration=meta["time_map"]["original_duration"],
+            )
+        return audio, spooled, time_map
+
+    def store(self, key: str, audio: np.ndarray, sr: int = 16_000, time_map: Optional[TimeMap] = None) -> None:
+        """
+        Writes audio to cache and evicts old entries, if cache exceeds size budget
+
+        :param key: entry key
+        :param audio: preprocessed audio
+        :param sr:
+        :param time_map: map to original audio timings
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        audio_tmp = self.directory / f"{key}.{uuid4().hex}.npy.tmp"
+        stored = np.lib.format.open_memmap(audio_tmp, mode="w+", dtype=np.float32, shape=(len(audio),))
+        for start in range(0, len(audio), self.block_size):
+            stored[start : start + self.block_size] = audio[start : start + self.block_size]
+        stored.flush()
+        del stored
+        os.replace(audio_tmp, self.directory / f"{key}.npy")
+
+        meta = {
+            "sr": sr,
+            "time_map": None
+            if time_map is None
+            else {
+                "original_starts": time_map.original_starts.tolist(),
+                "compressed_starts": time_map.compressed_starts.tolist(),
+                "durations": time_map.durations.tolist(),
+                "original_duration": time_map.original_duration,
+            },
+        }
+        self.write_atomic(self.meta_path(key), json.dumps(meta))
+        self.evict()
+
+    def mel_path(self, key: str, n_mels: int) -> Path:
+        """
+        Path of the entry spectrogram file
+        """
+        return self.directory / f"{key}.mel{n_mels}.npy"
+
+    def load_mel(self, key: str, n_mels: int, frames: int, spool: AudioSpool) -> Optional[Tuple[np.ndarray, SpooledMel]]:
+        """
+        Copies cached spectrogram into spool
+
+        :param key: entry key
+        :param n_mels: mel bins
+        :param frames: expected frames count
+        :param spool: spool to copy spectrogram to
+        :return: spectrogram of `(frames, n_mels)` shape, its spool handle, if entry has it
+        """
+        try:
+            stored = np.load(self.mel_path(key, n_mels), mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if stored.shape != (frames, n_mels):
+            return None
+
+        mel, spooled = spool.allocate_mel(n_mels, frames)
+        rows = max(1, self.block_size // n_mels)
+        try:
+            for start in range(0, frames, rows):
+                mel[start : start + rows] = stored[start : start + rows]
+        except OSError:
+            spooled.release()
+            return None
+        return mel, spooled
+
+    def store_mel(self, key: str, mel: np.ndarray) -> None:
+        """
+        Adds spectrogram to the cached entry and evicts old entries, if cache exceeds size budget
+
+        :param key: entry key
+        :param mel: spectrogram of `(frames, n_mels)` shape
+        """
+        if not self.meta_path(key).exists():
+            return  # Entry was evicted, there is nothing to add spectrogram to
+        mel_tmp = self.directory / f"{key}.{uuid4().hex}.npy.tmp"
+        stored = np.lib.format.open_memmap(mel_tmp, mode="w+", dtype=np.float32, shape=mel.shape)
+        rows = max(1, self.block_size // mel.shape[1])
+        for start in range(0, len(mel), rows):
+            stored[start : start + rows] = mel[start : start + rows]
+        stored.flush()
+        del stored
+        os.replace(mel_tmp, self.mel_path(key, mel.shape[1]))
+        self.evict()
+
+
+class TranscriptionCache(DiskCache):
+    """
+    Cache of transcriptions, that are already moved to the original audio timeline
+    """
+
+    CACHE_DIR = settings.CACHE_DIR / "transcriptions"
+
+    def __init__(self, max_bytes: int = settings.TRANSCRIPTION_CACHE_SIZE, directory: Optional[Path] = None) -> None:
+        super().__init__(max_bytes, directory)
+
+    @classmethod
+    def key(cls, digest: str, model: str, preset: ModelSettings) -> str:
+        """
+        Creates entry key from audio file content and everything, that affects transcription
+
+        :param digest: audio file content hash
+        :param model: whisper model variant, see `WhisperModel.variant`
+        :param preset: transcription and preprocessing settings
+        :return: entry key
+        """
+        parameters = f"{cls.version}:{digest}:{model}:{preset.model_dump_json(exclude={'name'})}"
+        return sha256(parameters.encode("utf-8")).hexdigest()
+
+    def load(self, key: str) -> Optional[Transcriber.Transcription]:
+        """
+        Reads cached transcription
+
+        :param key: entry key
+        :return: transcription, if entry exists
+        """
+        meta_path = self.meta_path(key)
+        try:
+            data = json.loads(meta_path.read_text(encoding="utf-8"))
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            return None
+        return Transcriber.Transcription(text=data["text"], segments=data["segments"], language=data["language"])
+
+    def store(self, key: str, transcription: Transcriber.Transcription) -> None:
+        """
+        Writes transcription to cache and evicts old entries, if cache exceeds size budget
+
+        :param key: entry key
+        :param transcription: transcription with original audio timings
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        data = {"text": transcription.text, "segments": transcription.segments, "language": transcription.language}
+        self.write_atomic(self.meta_path(key), json.dumps(data, ensure_ascii=False))
+        self.evict()
@@ -0,0 +1,189 @@
+"""
+Memory-mapped Whisper checkpoints
+
+whisper checkpoints keep weights in float16 and `whisper.load_model` reads them into freshly allocated float32
+parameters, so every process deserializes the whole checkpoint and keeps its own copy of the weights.
+Downloaded checkpoint is converted once into float32 checkpoint, that torch maps into memory:
+loading only maps the file, weights are read on first use, and processes share them via the page cache.
+Load time and memory of the conversion load are stored next to the converted checkpoint,
+so that workers can report, how much mapping saved.
+Checkpoint is converted by the parent process before workers start, so that workers do not convert it concurrently
+"""
+
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+import json
+from logging import getLogger
+import os
+from pathlib import Path
+from time import perf_counter
+from typing import Iterator, Optional
+
+import torch
+import whisper
+from whisper.model import ModelDimensions
+
+from src.settings import settings
+from .worker import current_rss
+
+
+MAPPED_DIR = settings.CACHE_DIR / "mapped"
+#: `torch.nn.init` functions, that whisper layers initialize their weights with
+INIT_FUNCTIONS = ("kaiming_uniform_", "uniform_", "normal_", "ones_", "zeros_")
+
+logger = getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class LoadStats:
+    """
+    Cost of loading the original checkpoint with `whisper.load_model`
+    """
+
+    load_time: float  #: Seconds
+    load_rss: Optional[int]  #: Resident memory taken by the model, bytes
+
+
+def mapped_path(name: str, store_dir: Path = MAPPED_DIR) -> Path:
+    """
+    Generates filepath of converted checkpoint. Model layout and checkpoint format may change
+    between torch and whisper versions, so checkpoints are converted per versions
+
+    :param name: whisper model name
+    :param store_dir: directory of converted checkpoints
+    :return: converted checkpoint filepath
+    """
+    return store_dir / f"{name}-torch{torch.__version__}-whisper{whisper.__version__}.pt"
+
+
+def remove_stale(name: str, store_dir: Path = MAPPED_DIR) -> None:
+    """
+    Removes checkpoints of the model, that were converted with other versions, as each takes twice the original size
+
+    :param name: whisper model name
+    :param store_dir: directory of converted checkpoints
+    """
+    current = mapped_path(name, store_dir)
+    unversioned = [store_dir / f"{name}.pt", store_dir / f"{name}.json"]
+    for path in [*unversioned, *store_dir.glob(f"{name}-torch*")]:
+        if path.exists() and path.with_suffix(".pt") != current and path.suffix in (".pt", ".json"):
+            path.unlink(missing_ok=True)
+            logger.debug("Removed stale converted checkpoint: %s", path)
+
+
+def convert(name: str, path: Path, download_root: Path = settings.CACHE_DIR) -> LoadStats:
+    """
+    Loads the original checkpoint and atomically stores its float32 weights in a mappable checkpoint
+
+    :param name: whisper model name
+    :param path: target file
+    :param download_root: original checkpoints directory
+    :return: cost of the original checkpoint load
+    """
+    rss = current_rss()
+    start = perf_counter()
+    model = whisper.load_model(name=name, device="cpu", download_root=download_root)
+    stats = LoadStats(load_time=perf_counter() - start, load_rss=current_rss() - rss if rss is not None else None)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    # torch maps only zip checkpoints with tensors, that are not views of larger storages
+    state = {key: value.detach().float().contiguous().clone() for key, value in model.state_dict().items()}
+    torch.save({"dims": asdict(model.dims), "model_state_dict": state}, tmp)
+    os.replace(tmp, path)
+    path.with_suffix(".json").write_text(json.dumps(asdict(stats)), encoding="utf-8")
+    return stats
+
+
+def prepare(name: str, download_root: Path = settings.CACHE_DIR, store_dir: Path = MAPPED_DIR) -> Path:
+    """
+    Converts downloaded checkpoint, if it is not converted yet or cannot be mapped
+
+    :param name: whisper model name
+    :param download_root: original checkpoints directory
+    :param store_dir: converted checkpoints directory
+    :return: converted checkpoint filepath
+    """
+    path = mapped_path(name, store_dir)
+    if path.exists():
+        try:
+            # Mapping reads only the checkpoint index, weights are not read
+            torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+            return path
+        except Exception as e:
+            logger.warning("Cannot map model %s, converting it again: %s", path, e)
+    stats = convert(name, path, download_root)
+    logger.info("Converted model %s to memory-mapped checkpoint in %.2fs: %s", name, stats.load_time, path)
+    remove_stale(name, store_dir)
+    return path
+
+
+def baseline(name: str, store_dir: Path = MAPPED_DIR) -> Optional[LoadStats]:
+    """
+    Reads cost of the original checkpoint load, that was measured on conversion
+
+    :param name: whisper model name
+    :param store_dir: converted checkpoints directory
+    :return: load stats, if the checkpoint was converted
+    """
+    try:
+        return LoadStats(**json.loads(mapped_path(name, store_dir).with_suffix(".json").read_text(encoding="utf-8")))
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+@contextmanager
+def skip_init() -> Iterator[None]:
+    """
+    Makes torch layers skip random initialization of their weights. Weights stay allocated, but untouched,
+    so they take no resident memory, until they are replaced. Not thread-safe, as it replaces torch functions
+    """
+    originals = {name: getattr(torch.nn.init, name) for name in INIT_FUNCTIONS}
+    for name in INIT_FUNCTIONS:
+        setattr(torch.nn.init, name, lambda tensor, *args, **kwargs: tensor)
+    try:
+        yield
+    finally:
+        for name, function in originals.items():
+            setattr(torch.nn.init, name, function)
+
+
+def load(path: Path, name: str) -> whisper.Whisper:
+    """
+    Maps converted checkpoint into memory
+
+    Model is created without initializing its weights and takes mapped tensors as its parameters,
+    so weights memory is neither filled, nor copied
+
+    :param path: converted checkpoint
+    :param name: whisper model name, that alignment heads are set for
+    :return: model
+    """
+    checkpoint = torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+    with skip_init():
+        model = whisper.Whisper(ModelDimensions(**checkpoint["dims"]))
+    model.load_state_dict(checkpoint["model_state_dict"], assign=True)
+    if name in whisper._ALIGNMENT_HEADS:  # noqa: SLF001
+        model.set_alignment_heads(whisper._ALIGNMENT_HEADS[name])  # noqa: SLF001
+    return model.to("cuda" if torch.cuda.is_available() else "cpu")
+
+
+def load_model(name: str, download_root: Path = settings.CACHE_DIR, store_dir: Path = MAPPED_DIR) -> whisper.Whisper:
+    """
+    Loads model from memory-mapped checkpoint, converting downloaded checkpoint, if it is not converted yet.
+    Worker processes load the model at once, so if the converted checkpoint cannot be mapped, they load
+    the original one instead of converting it concurrently: `prepare` converts it again before the next pool starts
+
+    :param name: whisper model name
+    :param download_root: original checkpoints directory
+    :param store_dir: converted checkpoints directory
+    :return: model
+    """
+    path = mapped_path(name, store_dir)
+    if not path.exists():
+        path = prepare(name, download_root, store_dir)
+    try:
+        return load(path, name)
+    except Exception as e:
+        logger.warning("Cannot map model %s, loading the original checkpoint: %s", path, e)
+    return whisper.load_model(name=name, download_root=download_root)
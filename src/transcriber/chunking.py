@@ -0,0 +1,148 @@
+"""
+Splitting of long recordings into chunks, that are transcribed concurrently,
+and stitching of chunks transcriptions back into a single one
+"""
+
+from collections import Counter
+from dataclasses import dataclass
+import re
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .spool import SpooledAudio, SpooledMel
+from .transcriber import Transcriber
+
+
+@dataclass(frozen=True)
+class AudioChunk:
+    """
+    Part of a long recording
+
+    Chunk audio includes overlap with the previous chunk, while `start` and `end` mark the part
+    of the recording timeline the chunk is responsible for
+    """
+
+    audio: SpooledAudio
+    start: float  #: Seconds from the recording beginning
+    end: float  #: Seconds from the recording beginning
+    mel: Optional[SpooledMel] = None  #: Log-mel spectrogram of chunk audio, if it was computed in preparation
+
+    @property
+    def offset(self) -> float:
+        """
+        Chunk audio beginning, seconds from the recording beginning
+        """
+        return self.audio.offset / self.audio.sr
+
+
+def find_split_points(energy: np.ndarray, frame_len: int, chunk_len: int, search_len: int) -> List[int]:
+    """
+    Finds positions to split audio at: the quietest frame around every `chunk_len` samples
+
+    :param energy: energy per frame
+    :param frame_len: frame length, samples
+    :param chunk_len: target chunk length, samples
+    :param search_len: distance from the target position to look for a quiet frame in, samples
+    :return: split positions, samples
+    """
+    length = len(energy) * frame_len
+    points = []
+    position = 0
+    while length - position > chunk_len + search_len:
+        lo = (position + chunk_len - search_len) // frame_len
+        hi = (position + chunk_len + search_len) // frame_len
+        frame = lo + int(np.argmin(energy[lo:hi]))
+        position = frame * frame_len + frame_len // 2
+        points.append(position)
+    return points
+
+
+def split(audio: SpooledAudio, points: Sequence[int], overlap_len: int) -> Tuple[AudioChunk, ...]:
+    """
+    Creates chunks views of spooled audio
+
+    :param audio: spooled audio to split
+    :param points: split positions, samples
+    :param overlap_len: length of the previous chunk tail to include into the next chunk, samples
+    :return: chunks
+    """
+    bounds = [0, *points, audio.length]
+    return tuple(
+        AudioChunk(
+            audio=audio.view(start - overlap_len if i > 0 else start, stop),
+            start=start / audio.sr,
+            end=stop / audio.sr,
+        )
+        for i, (start, stop) in enumerate(zip(bounds[:-1], bounds[1:], strict=True))
+    )
+
+
+def normalize_text(text: str) -> str:
+    """
+    Simplifies text to compare segments regardless of case, spaces and punctuation
+
+    :param text: segment text
+    :return: normalized text
+    """
+    return re.sub(r"\W+", " ", text).strip().lower()
+
+
+def shift_segment(segment: dict, offset: float, segment_id: int) -> dict:
+    """
+    Moves segment and its words timings by offset
+
+    :param segment: whisper segment
+    :param offset: offset, seconds
+    :param segment_id: new segment id
+    :return: shifted segment copy
+    """
+    shifted = {**segment, "id": segment_id, "start": segment["start"] + offset, "end": segment["end"] + offset}
+    if "seek" in segment:
+        # Seek is measured in mel frames, 100 per second
+        shifted["seek"] = segment["seek"] + round(offset * 100)
+    if "words" in segment:
+        shifted["words"] = [
+            {**word, "start": word["start"] + offset, "end": word["end"] + offset} for word in segment["words"]
+        ]
+    return shifted
+
+
+def merge_transcriptions(
+    parts: Sequence[Transcriber.Transcription], chunks: Sequence[AudioChunk]
+) -> Transcriber.Transcription:
+    """
+    Stitches chunks transcriptions into a single recording transcription
+
+    Segments are moved to the recording timeline. In the overlapping areas, every segment
+    is kept from the chunk that is responsible for the segment middle, and a segment repeating
+    the previous one right at the chunk boundary is dropped
+
+    :param parts: chunks transcriptions in chunks order
+    :param chunks: transcribed chunks
+    :return: recording transcription
+    """
+    segments = []
+    for i, (part, chunk) in enumerate(zip(parts, chunks, strict=True)):
+        # Recording edges belong to the first and the last chunks regardless of segments timings
+        lower = chunk.start if i > 0 else -np.inf
+        upper = chunk.end if i < len(chunks) - 1 else np.inf
+
+        for segment in part.segments:
+            shifted = shift_segment(segment, chunk.offset, len(segments))
+            if not lower <= (shifted["start"] + shifted["end"]) / 2 < upper:
+                continue
+            if (
+                len(segments) > 0
+                and shifted["start"] - segments[-1]["end"] < 1
+                and normalize_text(shifted["text"]) == normalize_text(segments[-1]["text"])
+            ):
+                continue
+            segments.append(shifted)
+
+    languages = Counter(part.language for part in parts if part.language is not None)
+    return Transcriber.Transcription(
+        text="".join(segment["text"] for segment in segments),
+        segments=segments,
+        language=languages.most_common(1)[0][0] if len(languages) > 0 else None,
+    )
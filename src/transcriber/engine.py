@@ -0,0 +1,1270 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial, wraps
+from logging import getLogger
+from pathlib import Path
+from threading import RLock, Thread
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from src.settings import settings
+from .audio_processor import AudioPreprocessor, PreparedAudio
+from .cache import PreparedAudioCache, TranscriptionCache, file_digest
+from .journal import ChunkRecord, JobJournal, JournalledJob
+from .model_cache import ModelCache, WarmPool
+from .chunking import merge_transcriptions
+from .scheduling import FileQueue
+from .schemas import ModelSettings, WhisperModel
+from .spool import AudioSpool
+from .timing import FileTimings, JobStats, TimingsLog, timed
+from .transcriber import Transcriber
+from . import export, memory, topology, worker
+
+
+#: Preparation processes count, unless workers count is set explicitly. Preparation is mostly
+#: decoding and filtering, which is fast compared to inference, so a few processes keep up with it
+DEFAULT_PREPARE_WORKERS = 4
+#: Short files, that are transcribed in a single task, unless batch size is set explicitly
+DEFAULT_BATCH_SIZE = 8
+#: Files up to a single whisper window are batched, seconds
+BATCH_MAX_DURATION = 30.0
+#: Files in progress per preparation process and per file of every transcribe batch. The others wait in the queue,
+#: where they are dispatched in priority order and can be reprioritized or cancelled without any work wasted
+DISPATCH_AHEAD = 2
+
+
+def on_task_complete(func):
+    """
+    Counts decorated callback as a completed task and finishes the job,
+    once there are no more pending tasks
+    """
+
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        # Callbacks come from management threads of different pools
+        with self.lock:
+            result = func(self, *args, **kwargs)
+            self.decrease_pending()
+
+            if self.pending == 0:
+                self.finish()
+        return result
+
+    return wrapper
+
+
+class TranscriptionEngine:
+    """
+    Schedules audio files preparation and transcription in process pools
+
+    Every file flows through the stages independently: it is sent to transcription as soon
+    as it is prepared and the model is loaded. Files are dispatched from the priority queue,
+    so that only a few files are in progress at once. Engine does not depend on any UI: progress is
+    reported via hook methods (`model_loaded`, `file_prepared`, etc.), that subclasses override
+    """
+
+    def __init__(
+        self,
+        transcriber: Transcriber,
+        workers: Optional[int] = None,
+        threads: Optional[int] = None,
+        export_dir: Optional[Path] = None,
+        audio_cache_size: int = settings.AUDIO_CACHE_SIZE,
+        transcription_cache_size: int = settings.TRANSCRIPTION_CACHE_SIZE,
+        journal: Optional[JobJournal] = None,
+        timings_log: Optional[TimingsLog] = None,
+        export_formats: Sequence[str] = export.DEFAULT_FORMATS,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        precompute_mel: bool = True,
+        model_cache_size: Optional[int] = settings.MODEL_CACHE_SIZE,
+        **kwargs,
+    ) -> None:
+        """
+        :param transcriber: transcriber to store transcriptions with
+        :param workers: processes count of every pool, chosen from CPU cores and the model if not set
+        :param threads: torch threads of every transcribe process, chosen from CPU cores and the model if not set
+        :param export_dir: directory to export transcriptions to
+        :param audio_cache_size: prepared audio cache size budget in bytes, 0 disables cache
+        :param transcription_cache_size: transcription cache size budget in bytes, 0 disables cache
+        :param journal: journal to record job progress to, so that interrupted job can be resumed
+        :param timings_log: log to write per-file stage timings to
+        :param export_formats: segments export formats of the next job, see `export.WRITERS`
+        :param batch_size: short files count to transcribe in a single batch, 1 disables batching
+        :param precompute_mel: whether to compute log-mel spectrograms in preparation processes,
+            so that transcribe processes start with the encoder
+        :param model_cache_size: memory budget of transcribe pools kept with models loaded for the next jobs in bytes,
+            0 shuts pool down after every job, pools are kept, while they fit into available memory, if not set
+        """
+        super().__init__(**kwargs)
+        self.logger = getLogger(self.__class__.__name__)
+        self.workers = workers
+        self.threads = threads
+        self.prepare_workers = workers or min(DEFAULT_PREPARE_WORKERS, topology.available_cpus())
+        self.pool = ProcessPoolExecutor(self.prepare_workers)
+        self.logger.debug("Created pool with %s workers", self.prepare_workers)
+        self.transcribe_pool: Optional[ProcessPoolExecutor] = None
+        self.layout: Optional[topology.PoolLayout] = None  #: Layout of the current transcribe pool
+        self.model_cache = ModelCache(model_cache_size)  #: Transcribe pools of previous jobs with models loaded
+        self.budget = memory.MemoryBudget()  #: Memory of transcribe tasks in flight
+        # Exports are written one by one, so that export directories names do not collide
+        self.writer = ThreadPoolExecutor(1, thread_name_prefix="export")
+
+        AudioSpool.clear_stale()
+        self.spool = AudioSpool()
+        self.audio_cache = PreparedAudioCache(audio_cache_size) if audio_cache_size > 0 else None
+        self.transcription_cache = TranscriptionCache(transcription_cache_size) if transcription_cache_size > 0 else None
+        self.audio_cache_hits = self.audio_cache_misses = 0
+        self.transcription_cache_hits = self.duplicates = 0
+        self.batches = self.batched_files = 0
+
+        self.lock = RLock()
+        self.transcriber = transcriber
+        self.model: Optional[WhisperModel] = None
+        self.export_dir = export_dir or Path("~/Downloads").expanduser()
+        self.export_formats = tuple(export_formats)
+        self.batch_size = batch_size
+        self.precompute_mel = precompute_mel
+        self.journal = journal
+        self.timings_log = timings_log
+        self.stats = JobStats()
+        self.__timings: Dict[Path, FileTimings] = {}  #: Files in progress -> their stage timings
+        self.__journalled_chunks: Dict[Path, Dict[int, ChunkRecord]] = {}
+        self.__model_ready = False
+        self.__model_error: Optional[BaseException] = None
+        self.__requested_layout: Optional[topology.PoolLayout] = None  #: Layout, that the current pool was asked for
+        self.__pool_warm = False  #: Whether the current pool was taken from model cache
+        self.__pool_failed = False  #: Whether processes of the current pool failed, so it cannot be reused
+        self.__evictions: List[Thread] = []  #: Threads, that shut down pools evicted from model cache
+        self.__ready_workers = set()
+        self.__waiting_files = []
+        self.__queue = FileQueue()  #: Files, that are not dispatched yet
+        self.__presets: Dict[Path, ModelSettings] = {}  #: Files of the job -> their presets
+        self.__active: Dict[Path, Set[Future]] = {}  #: Dispatched files, that are not transcribed yet -> their futures
+        self.__cancelled: Set[Path] = set()  #: Cancelled files, results of their tasks are dropped
+        #: Transcribe tasks, that wait for memory of tasks in flight:
+        #: worker function, its arguments, memory, done callback and prepared files of the task
+        self.__admission_queue: Deque[Tuple[Callable, tuple, int, Callable[[Future], None], Tuple[PreparedAudio, ...]]] = (
+            deque()
+        )
+        self.__batch: List[PreparedAudio] = []  #: Short prepared files, that wait for a batch to fill up
+        self.__chunks_results = {}
+        self.__transcription_keys: Dict[Path, str] = {}  #: Files in progress -> transcription cache keys
+        self.__duplicates: Dict[str, List[Path]] = {}  #: Transcription cache key -> files identical to one in progress
+        self.__pending_tasks_count = 0
+
+    @property
+    def pending(self) -> int:
+        """
+        Pending tasks count
+        """
+        return self.__pending_tasks_count
+
+    @pending.setter
+    def pending(self, v: int) -> None:
+        """
+        Checks value type and assigns it to internal property,
+        only if current pending count equals 0
+
+        :param v: new pending tasks count
+        :raise TypeError: invalid value type
+        :raise AttributeError: attempt to reassign pending value != 0
+        """
+        if not isinstance(v, int):
+            raise TypeError(f"Cannot use type {type(v)} as int")
+
+        if self.__pending_tasks_count != 0:
+            raise AttributeError("Cannot reassign pending value, when current value != 0")
+
+        self.__pending_tasks_count = v
+        self.logger.debug("Set pending tasks count: %s", self.__pending_tasks_count)
+
+    def decrease_pending(self) -> None:
+        """
+        The only method to decrease pending tasks count
+        """
+        self.__pending_tasks_count -= 1
+
+    def start(self, model: WhisperModel, files: Dict[Path, ModelSettings]) -> None:
+        """
+        Starts job: model loading and files processing
+
+        :param model: model description to transcribe with
+        :param files: files to process with their presets in priority order
+        """
+        if self.journal is not None:
+            self.journal.start(model.name, self.export_dir, files, self.export_formats, model.quantized)
+        self.__journalled_chunks = {}
+        self.run(model, files)
+
+    def resume(self, model: WhisperModel, job: JournalledJob) -> None:
+        """
+        Continues job, that was interrupted: processes files, that are not exported yet,
+        reusing chunks transcribed before interruption
+
+        :param model: model description of the job
+        :param job: job state restored from journal
+        """
+        self.export_dir = job.export_dir
+        self.export_formats = job.export_formats
+        if self.journal is not None:
+            self.journal.reopen()
+        self.__journalled_chunks = job.chunks
+        self.logger.info("Resuming job: %s of %s files remaining", len(job.remaining), len(job.files))
+        self.run(model, job.remaining)
+
+    def run(self, model: WhisperModel, files: Dict[Path, ModelSettings]) -> None:
+        """
+        Submits model loading and files processing
+
+        :param model: model description to transcribe with
+        :param files: files to process with their presets in priority order
+        """
+        # Each file is a task and model loading is one more
+        self.pending = len(files) + 1
+        self.audio_cache_hits = self.audio_cache_misses = 0
+        self.transcription_cache_hits = self.duplicates = 0
+        self.batches = self.batched_files = 0
+        self.stats = JobStats()
+        self.__timings = {path: FileTimings(path, preset.name) for path, preset in files.items()}
+        self.__transcription_keys.clear()
+        self.__duplicates.clear()
+        self.__cancelled.clear()
+        self.submit_load_model(model)
+        self.submit_prepare_files(files)
+
+    def submit_load_model(self, model: WhisperModel) -> None:
+        """
+        Creates task to download model checkpoint, if required. Model itself is loaded
+        only by the transcribe pool processes, that run inference
+
+        :param model: model description to load
+        """
+        self.transcriber._model_description = model
+        self.model = model
+        self.__model_ready = False
+        self.__model_error = None
+        self.__ready_workers.clear()
+        self.__waiting_files.clear()
+        if self.take_warm_pool(model):
+            self.submit_worker_status()
+            return
+        self.submit_download_model(model)
+
+    def submit_download_model(self, model: WhisperModel) -> None:
+        """
+        Creates task to download model checkpoint, once it is downloaded, transcribe pool is started
+
+        :param model: model description to load
+        """
+        future = self.pool.submit(self.transcriber.download_model, model)
+        future.add_done_callback(self.on_model_downloaded)
+
+    def submit_prepare_files(self, files: Dict[Path, ModelSettings]) -> None:
+        """
+        Queues files with priorities of their order and dispatches the first of them
+
+        :param files: files to process with their presets in priority order
+        """
+        with self.lock:
+            self.__queue.clear()
+            self.__presets = dict(files)
+            for priority, (file, preset) in enumerate(files.items()):
+                self.__queue.push(file, preset, priority)
+            self.dispatch_files()
+
+    @property
+    def dispatch_limit(self) -> int:
+        """
+        Files, that are in progress at once: enough to keep preparation processes busy
+        and to collect a batch for every transcribe process
+        """
+        workers = self.layout.workers if self.layout is not None else self.prepare_workers
+        return DISPATCH_AHEAD * (self.prepare_workers + workers * max(1, self.batch_size))
+
+    def dispatch_files(self) -> None:
+        """
+        Creates tasks to hash content of the queued files of the highest priority, while there is room for them,
+        so that files, which transcriptions are known, are not prepared and transcribed again
+        """
+        with self.lock:
+            while len(self.__active) < self.dispatch_limit:
+                queued = self.__queue.pop()
+                if queued is None:
+                    return
+                file, preset = queued
+                future = self.pool.submit(timed, file_digest, file)
+                self.__active[file] = {future}
+                future.add_done_callback(partial(self.on_file_hashed, file, preset))
+
+    def complete_dispatch(self, path: Path) -> None:
+        """
+        Makes room for the next queued file, once the file is transcribed or failed
+
+        :param path: dispatched file
+        """
+        with self.lock:
+            if self.__active.pop(path, None) is not None:
+                self.dispatch_files()
+
+    def track(self, files: Iterable[Path], future: Future) -> None:
+        """
+        Remembers future of the dispatched files, so that their cancellation is completed, once it is done
+
+        :param files: files of the task
+        :param future: task future
+        """
+        with self.lock:
+            for path in files:
+                futures = self.__active.get(path)
+                if futures is not None:
+                    futures.add(future)
+
+    def drop_cancelled(self, path: Path, future: Future) -> bool:
+        """
+        Forgets done future of the file and checks, if the file is cancelled, so that the result is dropped.
+        Cancellation is completed, once no more futures of the file are running
+
+        :param path: dispatched file
+        :param future: done future
+        :return: whether the file is cancelled
+        """
+        with self.lock:
+            futures = self.__active.get(path)
+            if futures is not None:
+                futures.discard(future)
+            if path not in self.__cancelled:
+                return False
+            if futures is not None and len(futures) == 0:
+                self.on_file_cancelled(path)
+            return True
+
+    def reprioritize(self, path: Path, priority: int) -> bool:
+        """
+        Changes priority of the file, that is not dispatched yet. Files of the job have priorities of their order
+
+        :param path: queued file
+        :param priority: new priority, lower values are dispatched first
+        :return: whether the file is queued
+        """
+        with self.lock:
+            queued = self.__queue.reprioritize(path, priority)
+        if queued:
+            self.logger.info("Reprioritized file: %s -> %s", path.name, priority)
+        return queued
+
+    def cancel(self, path: Path) -> bool:
+        """
+        Cancels file, that is not transcribed yet. Its audio is released and its pending tasks are cancelled right away,
+        while results of the tasks, that are already running, are dropped
+
+        :param path: file of the job
+        :return: whether the file is cancelled, transcribed files are exported anyway
+        """
+        with self.lock:
+            if path in self.__cancelled:
+                return False
+            if self.__queue.remove(path):
+                self.__cancelled.add(path)
+                self.on_file_cancelled(path)
+                return True
+            for duplicates in self.__duplicates.values():
+                if path in duplicates:
+                    duplicates.remove(path)
+                    self.__cancelled.add(path)
+                    self.on_file_cancelled(path)
+                    return True
+
+            futures = self.__active.get(path)
+            if futures is None:
+                return False
+            self.__cancelled.add(path)
+            self.withdraw_file(path)
+            self.cancel_futures(path)
+            # Cancelled futures complete cancellation in their callbacks
+            if path in self.__active and len(self.__active[path]) == 0:
+                self.on_file_cancelled(path)
+            return True
+
+    def cancel_futures(self, path: Path) -> None:
+        """
+        Cancels pool tasks of the file, that have not started yet. Batch tasks are shared with other files and keep running
+
+        :param path: dispatched file
+        """
+        with self.lock:
+            futures = self.__active.get(path, set())
+            shared = set().union(*(other for other_path, other in self.__active.items() if other_path != path))
+            for future in list(futures - shared):
+                future.cancel()
+
+    def withdraw_file(self, path: Path) -> None:
+        """
+        Removes prepared file and its chunks from the files, that wait for the model, for a batch or for memory,
+        and releases its audio
+
+        :param path: cancelled file
+        """
+        with self.lock:
+            self.__chunks_results.pop(path, None)
+            withdrawn = [prepared for prepared in [*self.__waiting_files, *self.__batch] if prepared.path == path]
+            self.__waiting_files = [prepared for prepared in self.__waiting_files if prepared.path != path]
+            self.__batch = [prepared for prepared in self.__batch if prepared.path != path]
+
+            kept = deque()
+            for entry in self.__admission_queue:
+                files = entry[4]
+                remaining = [prepared for prepared in files if prepared.path != path]
+                if len(remaining) == len(files):
+                    kept.append(entry)
+                    continue
+                withdrawn.extend(prepared for prepared in files if prepared.path == path)
+                # Other files of a batch are transcribed without the cancelled one
+                if len(remaining) > 0:
+                    kept.append(self.batch_task(remaining))
+            self.__admission_queue = kept
+
+        for prepared in withdrawn:
+            prepared.release()
+
+    def start_transcribe_pool(self, model: WhisperModel) -> None:
+        """
+        Creates pool, which processes load the model once on start and keep it
+        for all the tasks they run
+
+        :param model: model description to load in worker processes
+        """
+        self.stop_transcribe_pool()
+        requested = topology.choose_layout(model, self.workers, self.threads)
+        with self.lock:
+            # Pools of other models are shut down first, if the new one does not fit next to them
+            evicted = self.model_cache.make_room(requested.workers * memory.model_footprint(model))
+        # Their memory must be free, before available memory is measured
+        for entry in evicted:
+            entry.pool.shutdown(wait=True)
+        for thread in self.__evictions:
+            thread.join()
+        self.__evictions.clear()
+        self.layout = self.admit_layout(model, requested)
+        self.transcribe_pool = ProcessPoolExecutor(
+            self.layout.workers, initializer=worker.init_worker, initargs=(model, self.layout.threads)
+        )
+        self.__requested_layout, self.__pool_warm, self.__pool_failed = requested, False, False
+        self.logger.info("Created transcribe pool with %s for model %s", self.layout, model.variant)
+
+    def take_warm_pool(self, model: WhisperModel) -> bool:
+        """
+        Takes transcribe pool, that has the model loaded by one of the previous jobs, from model cache
+
+        :param model: model description to transcribe with
+        :return: whether the pool is taken
+        """
+        requested = topology.choose_layout(model, self.workers, self.threads)
+        with self.lock:
+            warm, evicted = self.model_cache.take(model, requested)
+        self.evict_pools(evicted)
+        if warm is None:
+            return False
+
+        self.stop_transcribe_pool()
+        self.transcribe_pool, self.layout = warm.pool, warm.layout
+        self.__requested_layout, self.__pool_warm, self.__pool_failed = requested, True, False
+        self.admit_layout(model, warm.layout, loaded=True)
+        self.logger.info("Reusing transcribe pool with %s for model %s, loaded by previous job", warm.layout, model.variant)
+        return True
+
+    def evict_pools(self, evicted: List[WarmPool]) -> None:
+        """
+        Shuts down pools evicted from model cache on a separate thread, as jobs start on the GUI thread.
+        The next transcribe pool waits for them to free memory
+
+        :param evicted: evicted pools
+        """
+        if len(evicted) == 0:
+            return
+
+        def shutdown() -> None:
+            for entry in evicted:
+                entry.pool.shutdown(wait=True)
+
+        thread = Thread(target=shutdown, name="evict", daemon=True)
+        thread.start()
+        self.__evictions.append(thread)
+
+    def release_transcribe_pool(self) -> None:
+        """
+        Keeps transcribe pool with its models loaded in model cache for the next jobs.
+        Pool, which processes failed, is shut down
+        """
+        if self.transcribe_pool is None:
+            return
+        if self.__pool_failed or self.__model_error is not None:
+            self.stop_transcribe_pool()
+            return
+
+        pool, self.transcribe_pool = self.transcribe_pool, None
+        with self.lock:
+            self.__admission_queue.clear()
+            self.__batch.clear()
+            self.model_cache.put(WarmPool(self.model, self.__requested_layout, self.layout, pool))
+
+    def admit_layout(self, model: WhisperModel, layout: topology.PoolLayout, loaded: bool = False) -> topology.PoolLayout:
+        """
+        Limits transcribe processes count by available memory and sets memory budget of tasks in flight
+        to the memory, that the models leave
+
+        :param model: model description to load in worker processes
+        :param layout: desired layout
+        :param loaded: whether processes have already loaded the model, so available memory excludes it
+        :return: layout, which models fit into memory
+        """
+        available = memory.available_memory()
+        if available is None:
+            self.logger.info("Available memory is unknown, transcribe tasks are not limited by memory")
+            self.budget = memory.MemoryBudget()
+            return layout
+
+        fit = memory.workers_fit(model, available)
+        if not loaded and fit < layout.workers:
+            self.logger.warning(
+                "Model %s needs ~%sGB per worker, %.1fGB of memory available: %s workers instead of %s",
+                model.variant,
+                model.required_ram,
+                available / memory.GB,
+                fit,
+                layout.workers,
+            )
+            layout = topology.choose_layout(model, fit, self.threads)
+        models = 0 if loaded else layout.workers * memory.model_footprint(model)
+        capacity = max(0, available - memory.HEADROOM - models)
+        self.budget = memory.MemoryBudget(capacity)
+        self.logger.info(
+            "Memory: %.1fGB available, %.1fGB left for audio in flight with %s",
+            available / memory.GB,
+            capacity / memory.GB,
+            layout,
+        )
+        return layout
+
+    def stop_transcribe_pool(self, cancel_futures: bool = False) -> None:
+        """
+        Shuts down transcribe pool, if any, releasing models loaded in its processes
+
+        :param cancel_futures: whether to cancel pending tasks
+        """
+        if self.transcribe_pool is None:
+            return
+        self.transcribe_pool.shutdown(cancel_futures=cancel_futures, wait=False)
+        self.transcribe_pool = None
+        with self.lock:
+            self.__admission_queue.clear()
+            self.__batch.clear()
+        self.logger.debug("Transcribe pool shutdown")
+
+    def shutdown(self) -> None:
+        """
+        Stops all pools, cancelling pending tasks
+        """
+        # Journal is kept for resume, so cancelled tasks must not be recorded
+        journal, self.journal = self.journal, None
+        if journal is not None:
+            journal.close()
+        self.pool.shutdown(cancel_futures=True, wait=False)
+        self.stop_transcribe_pool(cancel_futures=True)
+        with self.lock:
+            self.model_cache.clear()
+        self.writer.shutdown(cancel_futures=True, wait=False)
+        self.spool.clear()
+
+    def submit_transcribe_files(self, files: Iterable[PreparedAudio]) -> None:
+        """
+        Creates tasks to transcribe prepared audio files in model-resident workers.
+        Chunks of long files are transcribed as separate tasks, short files are batched
+
+        :param files: prepared files
+        """
+        for prepared in files:
+            if len(prepared.chunks) > 0:
+                self.submit_transcribe_chunks(prepared)
+            elif self.batch_size > 1 and prepared.audio.duration <= BATCH_MAX_DURATION:
+                with self.lock:
+                    self.__batch.append(prepared)
+                    self.admit_tasks()
+            else:
+                self.submit_transcribe(
+                    worker.transcribe,
+                    (prepared.audio, prepared.preset, prepared.path, prepared.mel),
+                    memory.task_footprint(prepared.audio),
+                    partial(self.on_file_transcribed, prepared),
+                    (prepared,),
+                )
+
+    def submit_transcribe_chunks(self, prepared: PreparedAudio) -> None:
+        """
+        Creates tasks to transcribe chunks of a long file concurrently.
+        Chunks, that were transcribed before job interruption, are reused
+
+        :param prepared: prepared file split into chunks
+        """
+        journalled = self.__journalled_chunks.pop(prepared.path, {})
+        results = [None] * len(prepared.chunks)
+        for i, chunk in enumerate(prepared.chunks):
+            if i in journalled and journalled[i].matches(chunk):
+                results[i] = journalled[i].transcription
+        self.__chunks_results[prepared.path] = results
+
+        reused = sum(result is not None for result in results)
+        if reused == len(results):
+            self.merge_chunks(prepared)
+            return
+        if reused > 0:
+            self.logger.info("Reusing %s of %s chunks of %s", reused, len(results), prepared.path.name)
+
+        for i, chunk in enumerate(prepared.chunks):
+            if results[i] is not None:
+                continue
+            self.submit_transcribe(
+                worker.transcribe,
+                (chunk.audio, prepared.preset, prepared.path, chunk.mel),
+                memory.task_footprint(chunk.audio),
+                partial(self.on_chunk_transcribed, prepared, i),
+                (prepared,),
+            )
+
+    def submit_transcribe(
+        self, task: Callable, args: tuple, size: int, callback: Callable[[Future], None], files: Tuple[PreparedAudio, ...]
+    ) -> None:
+        """
+        Queues transcribe task and sends it to the pool, once its audio fits the memory budget.
+        Tasks are admitted in submission order
+
+        :param task: worker function
+        :param args: worker function arguments
+        :param size: task memory, bytes
+        :param callback: transcribe future done callback
+        :param files: prepared files, that the task transcribes
+        """
+        with self.lock:
+            self.__admission_queue.append((task, args, size, callback, files))
+            self.admit_tasks()
+            if len(self.__admission_queue) > 0:
+                self.budget.deferred += 1
+                self.logger.debug("Transcribe task waits for memory of %s tasks in flight", self.budget.tasks)
+
+    def admit_tasks(self) -> None:
+        """
+        Sends queued transcribe tasks to the pool, while their audio fits the memory budget.
+        Once the queue is empty, collected short files are sent as a batch
+        """
+        with self.lock:
+            while self.transcribe_pool is not None:
+                if len(self.__admission_queue) == 0 and not self.flush_batch():
+                    return
+                task, args, size, callback, files = self.__admission_queue[0]
+                if not self.budget.reserve(size):
+                    return
+                self.__admission_queue.popleft()
+                future = self.transcribe_pool.submit(timed, task, *args)
+                self.track((prepared.path for prepared in files), future)
+                future.add_done_callback(partial(self.on_task_released, size))
+                future.add_done_callback(callback)
+
+    def flush_batch(self) -> bool:
+        """
+        Queues collected short files as a single transcribe task, once the batch is full or a worker is idle,
+        so that files are batched only while workers are busy and never wait for the batch to fill up
+
+        :return: whether the task is queued
+        """
+        with self.lock:
+            if len(self.__batch) == 0:
+                return False
+            if len(self.__batch) < self.batch_size and self.budget.tasks >= self.layout.workers:
+                return False
+            batch, self.__batch = self.__batch[: self.batch_size], self.__batch[self.batch_size :]
+            if len(batch) > 1:
+                self.batches += 1
+                self.batched_files += len(batch)
+            self.__admission_queue.append(self.batch_task(batch))
+            return True
+
+    def batch_task(
+        self, batch: List[PreparedAudio]
+    ) -> Tuple[Callable, tuple, int, Callable[[Future], None], Tuple[PreparedAudio, ...]]:
+        """
+        Creates transcribe task of short files. Single file is transcribed without batching
+
+        :param batch: prepared files
+        :return: admission queue entry: worker function, its arguments, memory, done callback and prepared files
+        """
+        size = sum(memory.task_footprint(prepared.audio) for prepared in batch)
+        if len(batch) == 1:
+            prepared = batch[0]
+            args = (prepared.audio, prepared.preset, prepared.path, prepared.mel)
+            return worker.transcribe, args, size, partial(self.on_file_transcribed, prepared), (prepared,)
+
+        args = ([(prepared.audio, prepared.preset, prepared.path, prepared.mel) for prepared in batch],)
+        return worker.transcribe_batch, args, size, partial(self.on_batch_transcribed, batch), tuple(batch)
+
+    def on_task_released(self, size: int, future: Future) -> None:
+        """
+        Returns memory of completed transcribe task to the budget and admits the next tasks
+
+        :param size: task memory, bytes
+        :param future: completed future
+        """
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self.__pool_failed = True
+        with self.lock:
+            self.budget.release(size)
+            self.admit_tasks()
+
+    @property
+    def concurrency(self) -> int:
+        """
+        Effective transcribe concurrency of the job: the most tasks, that ran at once
+        """
+        if self.layout is None:
+            return 0
+        return min(self.layout.workers, self.budget.peak_tasks)
+
+    def finish(self) -> None:
+        """
+        Releases resources of a completed job and reports completion. Transcribe pool is kept for the next jobs
+        """
+        self.release_transcribe_pool()
+        self.spool.clear()
+        if self.journal is not None:
+            self.journal.remove()
+        if self.audio_cache is not None:
+            self.logger.info("Prepared audio cache: %s hits, %s misses", self.audio_cache_hits, self.audio_cache_misses)
+        self.logger.info(
+            "Transcriptions reused: %s from cache, %s from identical files", self.transcription_cache_hits, self.duplicates
+        )
+        if self.layout is not None:
+            self.logger.info(
+                "Effective concurrency: %s of %s workers, peak audio in flight: %.0fMB, %s tasks waited for memory",
+                self.concurrency,
+                self.layout.workers,
+                self.budget.peak_reserved / 1024**2,
+                self.budget.deferred,
+            )
+        if self.batches > 0:
+            self.logger.info("Batched inference: %s files in %s batches", self.batched_files, self.batches)
+        slowest = self.stats.slowest_stage
+        if slowest is not None:
+            self.logger.info(
+                "Throughput: %.2f audio hours per hour, slowest stage: %s (%.0f%%)",
+                self.stats.throughput,
+                slowest[0],
+                slowest[1] * 100,
+            )
+        self.logger.info("Tasks complete")
+        self.task_completed()
+
+    def on_model_downloaded(self, future: Future) -> None:
+        """
+        Starts transcribe pool and makes every its process load the model
+
+        :param future: future that was downloading model
+        """
+        try:
+            checkpoint = future.result()
+        except Exception as e:
+            self.on_model_failed(e)
+            return
+        self.logger.info("Model checkpoint available: %s", checkpoint)
+
+        self.start_transcribe_pool(self.model)
+        self.submit_worker_status()
+
+    def submit_worker_status(self) -> None:
+        """
+        Requests status of every transcribe process, which reports readiness, once the process has loaded the model
+        """
+        pool = self.transcribe_pool
+        try:
+            # Each submission spawns a process, if there is no idle one, so all workers warm up
+            for _ in range(self.layout.workers):
+                pool.submit(worker.status).add_done_callback(partial(self.on_worker_ready, pool))
+        except BrokenProcessPool as e:
+            if not self.replace_warm_pool(e):
+                raise
+
+    def replace_warm_pool(self, error: BaseException) -> bool:
+        """
+        Starts a new transcribe pool instead of the one taken from model cache, if its processes died meanwhile,
+        e.g. were killed by the system to free memory
+
+        :param error: error of the pool
+        :return: whether the pool was taken from model cache and is replaced
+        """
+        with self.lock:
+            if not self.__pool_warm or self.__model_ready:
+                return False
+            self.__pool_warm = False
+        self.logger.warning(
+            "Transcribe pool of %s, loaded by previous job, is broken, starting a new one: %s", self.model.variant, error
+        )
+        self.__pool_failed = True
+        self.stop_transcribe_pool()
+        self.submit_download_model(self.model)
+        return True
+
+    def on_worker_ready(self, pool: ProcessPoolExecutor, future: Future) -> None:
+        """
+        Logs worker model load statistics and reports model readiness with the first ready worker
+
+        :param pool: transcribe pool of the worker
+        :param future: future that was requesting worker status
+        """
+        try:
+            status: worker.WorkerStatus = future.result()
+        except Exception as e:
+            if pool is not self.transcribe_pool or (isinstance(e, BrokenProcessPool) and self.replace_warm_pool(e)):
+                return
+            with self.lock:
+                if not self.__model_ready and self.__model_error is None:
+                    self.on_model_failed(e)
+            return
+
+        with self.lock:
+            if status.pid in self.__ready_workers:
+                return
+            self.__ready_workers.add(status.pid)
+            first_ready = not self.__model_ready
+            self.__model_ready = True
+
+        if self.__pool_warm:
+            # The model was loaded by one of the previous jobs, there is nothing new to report
+            if first_ready:
+                self.on_model_loaded(status)
+            return
+        self.logger.info(
+            "Worker %s loaded model %s in %.2fs, peak RSS: %s MB",
+            status.pid,
+            status.model,
+            status.load_time,
+            round(status.peak_rss / 1024**2) if status.peak_rss is not None else "unknown",
+        )
+        if status.unmapped_load_time is not None:
+            self.logger.info(
+                "Worker %s mapped model checkpoint: load time %.2fs -> %.2fs, load RSS %s MB -> %s MB",
+                status.pid,
+                status.unmapped_load_time,
+                status.load_time,
+                round(status.unmapped_load_rss / 1024**2) if status.unmapped_load_rss is not None else "unknown",
+                round(status.load_rss / 1024**2) if status.load_rss is not None else "unknown",
+            )
+        if first_ready:
+            self.on_model_loaded(status)
+
+    @on_task_complete
+    def on_model_loaded(self, status: worker.WorkerStatus) -> None:
+        """
+        Reports that the model is loaded in worker processes
+        and starts transcription of the files, that are already prepared
+
+        :param status: status of the first ready worker
+        """
+        self.model_loaded(status)
+        self.logger.info("Model loaded: %s", status.model)
+
+        if len(self.__waiting_files) > 0:
+            self.logger.debug("Submitting %s prepared files waiting for model", len(self.__waiting_files))
+            self.submit_transcribe_files(self.__waiting_files)
+            self.__waiting_files.clear()
+
+    @on_task_complete
+    def on_model_failed(self, error: BaseException) -> None:
+        """
+        Fails files, that wait for the model, as there is nothing to transcribe them with
+
+        :param error: model loading error
+        """
+        self.__model_error = error
+        self.__pool_failed = True
+        self.logger.error("Unable to load model: %s", error, exc_info=error)
+
+        waiting_files, self.__waiting_files = self.__waiting_files, []
+        for prepared in waiting_files:
+            prepared.release()
+            self.on_file_failed(prepared.path, error)
+
+    def on_file_hashed(self, path: Path, preset: ModelSettings, future: Future) -> None:
+        """
+        Reuses transcription of the file, if the same content was transcribed with the same model and settings
+        earlier or is being transcribed in this job. Otherwise, creates task to prepare audio file via audio processor
+
+        :param path: audio file
+        :param preset: file preset
+        :param future: completed future
+        """
+        with self.lock:
+            if self.drop_cancelled(path, future):
+                return
+            try:
+                digest, duration = future.result()
+            except Exception as e:
+                self.on_file_failed(path, e)
+                return
+            self.__timings[path].stages.add("hash", duration)
+
+            key = TranscriptionCache.key(digest, self.model.variant, preset)
+            if key in self.__duplicates:
+                self.logger.info("File %s is identical to one in progress, waiting for its transcription", path.name)
+                self.duplicates += 1
+                self.__timings[path].reused = True
+                # File is reported as reused, once the transcription is ready, as it is queued again,
+                # if the identical file is cancelled
+                self.__duplicates[key].append(path)
+                self.complete_dispatch(path)
+                return
+
+            cached = self.transcription_cache.load(key) if self.transcription_cache is not None else None
+            if cached is not None:
+                self.logger.info("Transcription cache hit: %s", path.name)
+                self.transcription_cache_hits += 1
+                self.__timings[path].reused = True
+                self.file_reused(path)
+                self.complete_dispatch(path)
+                self.on_transcription_ready(path, cached)
+                return
+
+            self.__transcription_keys[path] = key
+            self.__duplicates[key] = []
+
+            processor = AudioPreprocessor(self.spool, self.audio_cache)
+            n_mels = self.model.n_mels if self.precompute_mel else None
+            future = self.pool.submit(processor, path, preset, digest=digest, n_mels=n_mels)
+            self.track([path], future)
+            future.add_done_callback(partial(self.on_file_prepared, path))
+
+    def on_file_prepared(self, path: Path, future: Future) -> None:
+        """
+        Sends prepared audio file to transcription right away, if model is ready.
+        Otherwise, keeps it until model is loaded
+
+        :param path: prepared file
+        :param future: completed future
+        """
+        with self.lock:
+            if self.drop_cancelled(path, future):
+                if not future.cancelled() and future.exception() is None:
+                    future.result().release()
+                return
+            try:
+                prepared: PreparedAudio = future.result()
+            except Exception as e:
+                self.on_file_failed(path, e)
+                return
+
+            timings = self.__timings[path]
+            for stage, duration in prepared.timings.items():
+                timings.stages.add(stage, duration)
+            timings.audio_duration = prepared.audio.duration + prepared.removed_duration
+
+            self.file_prepared(path, prepared)
+            if self.journal is not None:
+                self.journal.file_state(path, JobJournal.PREPARED)
+            self.logger.info(
+                "Prepared file: %s - %s - %.1fs in %s chunks, %.1fs of silence removed%s",
+                path.name,
+                prepared.preset.name,
+                prepared.audio.duration,
+                max(1, len(prepared.chunks)),
+                prepared.removed_duration,
+                " (cached)" if prepared.cached else "",
+            )
+
+            if self.audio_cache is not None:
+                if prepared.cached:
+                    self.audio_cache_hits += 1
+                else:
+                    self.audio_cache_misses += 1
+
+            if self.__model_error is not None:
+                prepared.release()
+                self.on_file_failed(path, self.__model_error)
+            elif self.__model_ready:
+                self.submit_transcribe_files([prepared])
+            else:
+                self.__waiting_files.append(prepared)
+
+    def on_chunk_transcribed(self, prepared: PreparedAudio, index: int, future: Future) -> None:
+        """
+        Collects chunk transcription. Once all chunks of the file are transcribed,
+        stitches them and stores as a whole file transcription
+
+        :param prepared: prepared file, that chunk belongs to
+        :param index: chunk index
+        :param future: completed future
+        """
+        with self.lock:
+            if self.drop_cancelled(prepared.path, future):
+                prepared.release()
+                return
+            results = self.__chunks_results.get(prepared.path)
+            if results is None:
+                # Another chunk of the file has already failed
+                return
+
+            try:
+                (results[index], *_), duration = future.result()
+            except Exception as e:
+                # Other chunks of the file are not transcribed, as the file fails anyway
+                self.withdraw_file(prepared.path)
+                self.cancel_futures(prepared.path)
+                failed = Future()
+                failed.set_exception(e)
+                self.on_file_transcribed(prepared, failed)
+                return
+
+            self.__timings[prepared.path].stages.add("inference", duration)
+            if self.journal is not None:
+                self.journal.chunk_transcribed(prepared.path, index, prepared.chunks[index], results[index])
+            if any(result is None for result in results):
+                return
+            self.complete_dispatch(prepared.path)
+        self.merge_chunks(prepared)
+
+    def merge_chunks(self, prepared: PreparedAudio) -> None:
+        """
+        Stitches transcriptions of all chunks of the file and stores as a whole file transcription
+
+        :param prepared: prepared file, which chunks are all transcribed
+        """
+        with self.lock:
+            results = self.__chunks_results.pop(prepared.path)
+
+        self.logger.debug("Transcribed all %s chunks of %s", len(results), prepared.path.name)
+        merged = Future()
+        # Chunks inference time is already accounted
+        merged.set_result(((merge_transcriptions(results, prepared.chunks), prepared.path, prepared.preset), 0.0))
+        self.on_file_transcribed(prepared, merged)
+
+    def on_batch_transcribed(self, batch: List[PreparedAudio], future: Future) -> None:
+        """
+        Splits batch transcription into files transcriptions. Batch inference time is shared by files equally
+
+        :param batch: prepared files, that were transcribed together
+        :param future: completed future
+        """
+        try:
+            results, duration = future.result()
+        except Exception as e:
+            results, duration = [e] * len(batch), 0.0
+        self.logger.debug("Transcribed batch of %s files in %.2fs", len(batch), duration)
+
+        for prepared, result in zip(batch, results, strict=True):
+            if self.drop_cancelled(prepared.path, future):
+                prepared.release()
+                continue
+            transcribed = Future()
+            if isinstance(result, BaseException):
+                transcribed.set_exception(result)
+            else:
+                transcribed.set_result((result, duration / len(batch)))
+            self.on_file_transcribed(prepared, transcribed)
+
+    def on_file_transcribed(self, prepared: PreparedAudio, future: Future) -> None:
+        """
+        Releases spooled audio, caches transcription and stores it for the file and its duplicates
+
+        :param prepared: prepared file, that was transcribed
+        :param future: completed future
+        """
+        prepared.release()
+        path, preset = prepared.path, prepared.preset
+        with self.lock:
+            if self.drop_cancelled(path, future):
+                return
+            # File cannot be cancelled, once it is transcribed
+            self.complete_dispatch(path)
+        try:
+            (transcription, *_), duration = future.result()
+        except Exception as e:
+            self.on_file_failed(path, e)
+            return
+        self.__timings[path].stages.add("inference", duration)
+
+        self.logger.info("Transcribed file: %s - %s", path.name, preset.name)
+        if self.journal is not None:
+            self.journal.file_state(path, JobJournal.TRANSCRIBED)
+        if prepared.time_map is not None:
+            transcription = prepared.time_map.remap(transcription)
+
+        with self.lock:
+            key = self.__transcription_keys.get(path)
+        if key is not None and self.transcription_cache is not None:
+            try:
+                self.transcription_cache.store(key, transcription)
+            except (OSError, TypeError, ValueError) as e:
+                self.logger.warning("Unable to cache transcription of %s: %s", path.name, e)
+
+        self.on_transcription_ready(path, transcription)
+
+    def on_transcription_ready(self, path: Path, transcription: Transcriber.Transcription) -> None:
+        """
+        Queues export of the transcription for the file and for the identical files, that wait for it.
+        Exports are written by a dedicated thread, so that pool callbacks never wait for disk
+
+        :param path: source file
+        :param transcription: transcription with original audio timings
+        """
+        duplicates = self.pop_duplicates(path)
+        for duplicate in duplicates:
+            self.file_reused(duplicate)
+        for target in [path, *duplicates]:
+            future = self.writer.submit(
+                timed, self.transcriber.store_transcription, transcription, self.export_dir, target.stem, self.export_formats
+            )
+            future.add_done_callback(partial(self.on_file_exported, target))
+
+    @on_task_complete
+    def on_file_exported(self, path: Path, future: Future) -> None:
+        """
+        Reports stored transcription of the file
+
+        :param path: source file
+        :param future: completed export future
+        """
+        timings = self.__timings.pop(path, None)
+        try:
+            export_dir_path, duration = future.result()
+        except Exception as e:
+            self.logger.error("Unable to store transcription of %s: %s", path.name, e, exc_info=e)
+            self.file_failed(path, e)
+            return
+
+        if timings is not None:
+            timings.stages.add("export", duration)
+            self.complete_timings(timings)
+        if self.journal is not None:
+            self.journal.file_state(path, JobJournal.EXPORTED, export_dir_path)
+        self.file_transcribed(path, export_dir_path)
+        self.logger.info("Saved transcription: %s -> %s", path.name, export_dir_path)
+
+    @on_task_complete
+    def on_file_failed(self, path: Path, error: BaseException) -> None:
+        """
+        Counts file, that cannot be processed, as complete. Identical files, that wait for it, fail too
+
+        :param path: failed file
+        :param error: reason
+        """
+        self.logger.error("Unable to process file %s: %s", path.name, error, exc_info=error)
+        self.__timings.pop(path, None)
+        if self.journal is not None:
+            self.journal.file_state(path, JobJournal.FAILED)
+        self.file_failed(path, error)
+
+        for duplicate in self.pop_duplicates(path):
+            self.on_file_failed(duplicate, error)
+        self.complete_dispatch(path)
+
+    @on_task_complete
+    def on_file_cancelled(self, path: Path) -> None:
+        """
+        Counts cancelled file as complete. Identical files, that wait for its transcription, are queued again
+
+        :param path: cancelled file
+        """
+        self.logger.info("Cancelled file: %s", path.name)
+        self.__timings.pop(path, None)
+        if self.journal is not None:
+            self.journal.file_state(path, JobJournal.CANCELLED)
+        self.file_cancelled(path)
+
+        for duplicate in self.pop_duplicates(path):
+            self.duplicates -= 1
+            self.__timings[duplicate].reused = False
+            self.__queue.push(duplicate, self.__presets[duplicate], self.__queue.priorities[duplicate])
+        self.complete_dispatch(path)
+
+    def complete_timings(self, timings: FileTimings) -> None:
+        """
+        Adds timings of exported file to job statistics and timings log
+
+        :param timings: file timings
+        """
+        timings.complete()
+        self.stats.add(timings)
+        if self.timings_log is not None:
+            self.timings_log.write(timings)
+        self.logger.debug(
+            "Timings of %s: %.2fs, real-time factor %s, %s",
+            timings.path.name,
+            timings.total,
+            f"{timings.rtf:.3f}" if timings.rtf is not None else "unknown",
+            ", ".join(f"{stage} {duration:.2f}s" for stage, duration in timings.stages.stages.items()),
+        )
+        self.file_measured(timings)
+
+    def pop_duplicates(self, path: Path) -> List[Path]:
+        """
+        Stops tracking file in progress and returns files identical to it
+
+        :param path: file in progress
+        :return: identical files, that wait for its transcription
+        """
+        with self.lock:
+            key = self.__transcription_keys.pop(path, None)
+            return self.__duplicates.pop(key, []) if key is not None else []
+
+    def model_loaded(self, status: worker.WorkerStatus) -> None:
+        """
+        Hook: model is loaded in worker processes
+
+        :param status: status of the first ready worker
+        """
+
+    def file_prepared(self, path: Path, prepared: PreparedAudio) -> None:
+        """
+        Hook: file is prepared for transcription
+
+        :param path: source file
+        :param prepared: prepared audio
+        """
+
+    def file_reused(self, path: Path) -> None:
+        """
+        Hook: file is not prepared, as its transcription is taken from cache
+        or from identical file in the same job, once that transcription is ready
+
+        :param path: source file
+        """
+
+    def file_measured(self, timings: FileTimings) -> None:
+        """
+        Hook: stage timings of exported file are known. Job statistics include them
+
+        :param timings: file timings
+        """
+
+    def file_transcribed(self, path: Path, export_dir: Path) -> None:
+        """
+        Hook: file is transcribed and stored
+
+        :param path: source file
+        :param export_dir: directory with exported transcription
+        """
+
+    def file_failed(self, path: Path, error: BaseException) -> None:
+        """
+        Hook: file cannot be processed
+
+        :param path: source file
+        :param error: reason
+        """
+
+    def file_cancelled(self, path: Path) -> None:
+        """
+        Hook: file is cancelled and is not exported
+
+        :param path: source file
+        """
+
+    def task_completed(self) -> None:
+        """
+        Hook: all files are processed
+        """
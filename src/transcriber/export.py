@@ -0,0 +1,86 @@
+"""
+Transcription segments export formats
+
+Every format is a function, that writes segments to a file, registered under the format name,
+which is also the file extension. Table libraries are imported by writers on first export
+"""
+
+import json
+from pathlib import Path
+from typing import Callable, Dict, List
+
+
+#: Format name -> function, that writes segments to file
+WRITERS: Dict[str, Callable[[List[dict], Path], None]] = {}
+DEFAULT_FORMATS = ("xlsx",)
+
+
+def register(name: str):
+    """
+    Registers segments writer under the format name
+    """
+
+    def decorator(func: Callable[[List[dict], Path], None]) -> Callable[[List[dict], Path], None]:
+        WRITERS[name] = func
+        return func
+
+    return decorator
+
+
+def timestamp(seconds: float, decimal_marker: str = ".") -> str:
+    """
+    Formats time as subtitles timestamp
+
+    :param seconds: time from the recording beginning
+    :param decimal_marker: milliseconds separator
+    :return: `HH:MM:SS.mmm` timestamp
+    """
+    milliseconds = max(0, round(seconds * 1_000))
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1_000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{decimal_marker}{milliseconds:03d}"
+
+
+def cue_text(segment: dict) -> str:
+    # Arrow would break cue timing line parsing
+    return segment["text"].strip().replace("-->", "->")
+
+
+@register("xlsx")
+def write_xlsx(segments: List[dict], path: Path) -> None:
+    import polars as pl
+    import xlsxwriter
+
+    segments_df = pl.DataFrame(segments, orient="row")
+    with xlsxwriter.Workbook(path) as wb:
+        segments_df.write_excel(wb, worksheet="segments")
+
+
+@register("parquet")
+def write_parquet(segments: List[dict], path: Path) -> None:
+    import polars as pl
+
+    pl.DataFrame(segments, infer_schema_length=None).write_parquet(path)
+
+
+@register("jsonl")
+def write_jsonl(segments: List[dict], path: Path) -> None:
+    with open(path, mode="w", encoding="utf-8") as file:
+        file.writelines(json.dumps(segment, ensure_ascii=False) + "\n" for segment in segments)
+
+
+@register("srt")
+def write_srt(segments: List[dict], path: Path) -> None:
+    with open(path, mode="w", encoding="utf-8") as file:
+        for i, segment in enumerate(segments, start=1):
+            start, end = timestamp(segment["start"], ","), timestamp(segment["end"], ",")
+            file.write(f"{i}\n{start} --> {end}\n{cue_text(segment)}\n\n")
+
+
+@register("vtt")
+def write_vtt(segments: List[dict], path: Path) -> None:
+    with open(path, mode="w", encoding="utf-8") as file:
+        file.write("WEBVTT\n\n")
+        for segment in segments:
+            file.write(f"{timestamp(segment['start'])} --> {timestamp(segment['end'])}\n{cue_text(segment)}\n\n")
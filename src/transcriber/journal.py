@@ -0,0 +1,295 @@
+"""
+On-disk journal of a running job, that lets the next application start resume the job,
+if the application was quit or crashed before the job completed
+"""
+
+from dataclasses import dataclass, field
+import json
+from logging import getLogger
+import os
+from pathlib import Path
+from threading import Lock, Timer
+from typing import Dict, Optional, Sequence, TextIO, Tuple
+
+from src.settings import settings
+from .chunking import AudioChunk
+from .export import DEFAULT_FORMATS
+from .schemas import ModelSettings
+from .transcriber import Transcriber
+
+
+@dataclass(frozen=True)
+class ChunkRecord:
+    """
+    Transcription of a long file chunk, that was completed before the job stopped
+    """
+
+    start: float  #: Seconds from the recording beginning
+    end: float  #: Seconds from the recording beginning
+    transcription: Transcriber.Transcription
+
+    def matches(self, chunk: AudioChunk) -> bool:
+        """
+        Checks if record belongs to the chunk, that the file is split into now
+
+        :param chunk: chunk of the prepared file
+        :return: whether chunk bounds are the same
+        """
+        return abs(self.start - chunk.start) < 1e-6 and abs(self.end - chunk.end) < 1e-6
+
+
+@dataclass
+class JournalledJob:
+    """
+    Job state restored from journal
+    """
+
+    model: str  #: Whisper model name
+    export_dir: Path
+    files: Dict[Path, ModelSettings]
+    export_formats: Tuple[str, ...] = DEFAULT_FORMATS
+    quantized: bool = False  #: Whether the model is int8 quantized
+    states: Dict[Path, str] = field(default_factory=dict)  #: File -> last recorded state
+    exports: Dict[Path, Path] = field(default_factory=dict)  #: File -> export directory
+    chunks: Dict[Path, Dict[int, ChunkRecord]] = field(default_factory=dict)  #: File -> chunk index -> record
+
+    @property
+    def remaining(self) -> Dict[Path, ModelSettings]:
+        """
+        Files, that are not exported yet, with their presets
+        """
+        done = (JobJournal.EXPORTED, JobJournal.CANCELLED)
+        return {path: preset for path, preset in self.files.items() if self.states.get(path) not in done}
+
+
+class JobJournal:
+    """
+    Append-only file of job events. Every event is a JSON line, that is passed to the OS right away,
+    so that the journal survives application crash. Events are synced to disk in batches by a timer thread,
+    so that recording threads do not wait for disk: power loss may lose the last events, whose files are then
+    processed again on resume. Journal is removed, once the job completes
+
+    File states follow each other: queued, prepared, transcribed, exported. Failed files
+    are recorded too and are retried on resume, while cancelled files are not
+    """
+
+    JOURNAL_DIR = settings.CACHE_DIR / "jobs"
+
+    QUEUED = "queued"
+    PREPARED = "prepared"
+    TRANSCRIBED = "transcribed"
+    EXPORTED = "exported"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    #: Delay of syncing recorded events to disk, seconds
+    sync_interval_s: float = 1.0
+
+    def __init__(self, name: str = "app", path: Optional[Path] = None) -> None:
+        """
+        :param name: journal name, so that application and command line jobs do not mix
+        :param path: journal file, if not the one named after the journal in the default directory
+        """
+        self.logger = getLogger(self.__class__.__name__)
+        self.path = path or self.JOURNAL_DIR / f"{name}.jsonl"
+        self.lock = Lock()
+        self.file: Optional[TextIO] = None
+        self.timer: Optional[Timer] = None  #: Scheduled sync, if there are events, that are not synced yet
+
+    def start(
+        self,
+        model: str,
+        export_dir: Path,
+        files: Dict[Path, ModelSettings],
+        export_formats: Sequence[str] = DEFAULT_FORMATS,
+        quantized: bool = False,
+    ) -> None:
+        """
+        Starts journal of a new job, replacing the previous one
+
+        :param model: whisper model name
+        :param export_dir: directory to export transcriptions to
+        :param files: files with their presets
+        :param export_formats: segments export formats
+        :param quantized: whether the model is int8 quantized
+        """
+        self.close()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.path, mode="w", encoding="utf-8")
+        self.write(
+            {
+                "event": "job",
+                "model": model,
+                "export_dir": str(export_dir),
+                "export_formats": list(export_formats),
+                "quantized": quantized,
+                "files": [[str(path), preset.model_dump(mode="json")] for path, preset in files.items()],
+            }
+        )
+        for path in files:
+            self.file_state(path, self.QUEUED)
+        self.logger.debug("Started job journal: %s", self.path)
+
+    def reopen(self) -> None:
+        """
+        Continues journal of a resumed job
+        """
+        self.close()
+        with open(self.path, mode="rb") as file:
+            file.seek(0, os.SEEK_END)
+            # Last line may be written partially, when application stopped
+            torn = file.tell() > 0 and file.seek(-1, os.SEEK_END) >= 0 and file.read(1) != b"\n"
+        self.file = open(self.path, mode="a", encoding="utf-8")
+        if torn:
+            self.file.write("\n")
+        self.logger.debug("Reopened job journal: %s", self.path)
+
+    def file_state(self, path: Path, state: str, export_dir: Optional[Path] = None) -> None:
+        """
+        Records file state
+
+        :param path: source file
+        :param state: new state
+        :param export_dir: directory with exported transcription, if file is exported
+        """
+        event = {"event": "file", "path": str(path), "state": state}
+        if export_dir is not None:
+            event["export_dir"] = str(export_dir)
+        self.write(event)
+
+    def chunk_transcribed(self, path: Path, index: int, chunk: AudioChunk, transcription: Transcriber.Transcription) -> None:
+        """
+        Records transcription of a long file chunk
+
+        :param path: source file
+        :param index: chunk index
+        :param chunk: transcribed chunk
+        :param transcription: chunk transcription
+        """
+        self.write(
+            {
+                "event": "chunk",
+                "path": str(path),
+                "index": index,
+                "start": chunk.start,
+                "end": chunk.end,
+                "text": transcription.text,
+                "segments": transcription.segments,
+                "language": transcription.language,
+            }
+        )
+
+    def write(self, event: dict) -> None:
+        """
+        Appends event, passes it to the OS and schedules sync to disk
+
+        :param event: JSON-serializable event
+        """
+        with self.lock:
+            if self.file is None:
+                return
+            try:
+                self.file.write(json.dumps(event, ensure_ascii=False) + "\n")
+                self.file.flush()
+            except (OSError, TypeError, ValueError) as e:
+                self.logger.warning("Unable to write job journal: %s", e)
+            if self.timer is None:
+                self.timer = Timer(self.sync_interval_s, self.sync)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def sync(self) -> None:
+        """
+        Syncs recorded events to disk. Runs on timer thread, so that the journal stays available meanwhile
+        """
+        with self.lock:
+            self.timer = None
+            if self.file is None:
+                return
+            try:
+                fd = os.dup(self.file.fileno())
+            except OSError as e:
+                self.logger.warning("Unable to sync job journal: %s", e)
+                return
+        try:
+            os.fsync(fd)
+        except OSError as e:
+            self.logger.warning("Unable to sync job journal: %s", e)
+        finally:
+            os.close(fd)
+
+    def close(self, sync: bool = True) -> None:
+        """
+        Closes journal file, keeping it for resume
+
+        :param sync: whether to sync the events, that are not synced yet, to disk
+        """
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if self.file is not None:
+                try:
+                    if sync:
+                        self.file.flush()
+                        os.fsync(self.file.fileno())
+                except OSError as e:
+                    self.logger.warning("Unable to sync job journal: %s", e)
+                self.file.close()
+                self.file = None
+
+    def remove(self) -> None:
+        """
+        Removes journal, once the job completes or user discards it
+        """
+        self.close(sync=False)
+        self.path.unlink(missing_ok=True)
+        self.logger.debug("Removed job journal: %s", self.path)
+
+    def load(self) -> Optional[JournalledJob]:
+        """
+        Restores state of the job, that did not complete
+
+        :return: job, if journal exists and has files to process
+        """
+        try:
+            with open(self.path, mode="r", encoding="utf-8") as file:
+                lines = file.readlines()
+        except OSError:
+            return None
+
+        job = None
+        for line in lines:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue  # Line was not written completely, when application stopped
+
+            if event["event"] == "job":
+                job = JournalledJob(
+                    model=event["model"],
+                    export_dir=Path(event["export_dir"]),
+                    export_formats=tuple(event.get("export_formats", DEFAULT_FORMATS)),
+                    quantized=event.get("quantized", False),
+                    files={Path(path): ModelSettings(**preset) for path, preset in event["files"]},
+                )
+            elif job is None:
+                continue
+            elif event["event"] == "file":
+                path = Path(event["path"])
+                job.states[path] = event["state"]
+                if "export_dir" in event:
+                    job.exports[path] = Path(event["export_dir"])
+            elif event["event"] == "chunk":
+                job.chunks.setdefault(Path(event["path"]), {})[event["index"]] = ChunkRecord(
+                    start=event["start"],
+                    end=event["end"],
+                    transcription=Transcriber.Transcription(
+                        text=event["text"], segments=event["segments"], language=event["language"]
+                    ),
+                )
+
+        if job is None or len(job.remaining) == 0:
+            return None
+        self.logger.info("Found unfinished job: %s of %s files remaining", len(job.remaining), len(job.files))
+        return job
@@ -0,0 +1,79 @@
+"""
+Log-mel spectrograms computed ahead of transcription
+
+`whisper.transcribe` starts with log-mel spectrogram of the whole audio followed by 30 seconds of silence.
+Preparation processes compute it with the same whisper function, so that transcribe workers, that are scarcer,
+start with the encoder right away. Spectrogram is normalized by its maximum, so it is computed for exactly the audio,
+that is transcribed: the whole file or every chunk of a long one
+"""
+
+from contextlib import contextmanager
+import importlib
+from typing import Iterator, Optional
+
+import numpy as np
+
+
+#: Audio samples per spectrogram frame
+HOP_LENGTH = 160
+#: Frames of 30 seconds of silence, that whisper appends to audio
+PADDING_FRAMES = 3_000
+#: Mel bins of models input, that whisper supports
+SUPPORTED_MELS = (80, 128)
+
+
+def frames(length: int) -> int:
+    """
+    Counts spectrogram frames of audio, that is padded the way `whisper.transcribe` pads it
+
+    :param length: audio samples count
+    :return: frames count
+    """
+    return length // HOP_LENGTH + PADDING_FRAMES
+
+
+def compute(audio: np.ndarray, n_mels: int) -> np.ndarray:
+    """
+    Computes log-mel spectrogram, that `whisper.transcribe` computes from the audio
+
+    :param audio: audio data, 16 kHz
+    :param n_mels: mel bins of the model
+    :return: spectrogram of `(n_mels, frames)` shape
+    """
+    import torch
+    from whisper.audio import N_SAMPLES, log_mel_spectrogram
+
+    with torch.no_grad():
+        return log_mel_spectrogram(torch.from_numpy(np.ascontiguousarray(audio)), n_mels, padding=N_SAMPLES).numpy()
+
+
+@contextmanager
+def precomputed(mel: Optional[np.ndarray]) -> Iterator[None]:
+    """
+    Makes `whisper.transcribe` take the given spectrogram instead of computing it from audio.
+    Spectrogram of other mel bins, e.g. if the model differs from the one it was computed for, is still computed.
+    Replaces whisper module function, so it is not thread-safe: worker processes run a single task at a time
+
+    :param mel: spectrogram, nothing is replaced if not set
+    """
+    if mel is None:
+        yield
+        return
+
+    import torch
+    from whisper.audio import N_SAMPLES
+
+    module = importlib.import_module("whisper.transcribe")
+    original = module.log_mel_spectrogram
+
+    def log_mel_spectrogram(audio, n_mels: int = 80, padding: int = 0, device=None) -> torch.Tensor:
+        if n_mels != mel.shape[0] or padding != N_SAMPLES:
+            return original(audio, n_mels, padding, device)
+        spectrogram = torch.from_numpy(mel)
+        return spectrogram.to(device) if device is not None else spectrogram
+
+    module.log_mel_spectrogram = log_mel_spectrogram
+    try:
+        yield
+    finally:
+        module.log_mel_spectrogram = original
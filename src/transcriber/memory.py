@@ -0,0 +1,128 @@
+"""
+Memory admission control of the transcribe pool
+
+Every transcribe process keeps its model resident, and every running task maps its audio and computes
+log-mel spectrogram of it. Processes count is limited by available memory divided by the model footprint,
+and tasks are sent to the pool only while their audio fits the memory left by the models,
+so that large models and long recordings wait for memory instead of exhausting it
+"""
+
+from logging import getLogger
+import subprocess
+import sys
+from typing import Optional
+
+from .schemas import WhisperModel
+from .spool import SpooledAudio
+
+
+GB = 1024**3
+#: Memory kept free for the application, preparation processes and the system
+HEADROOM = GB
+#: Memory of a running task per audio sample: mapped float32 samples, their padded copy and log-mel spectrogram
+TASK_BYTES_PER_SAMPLE = 12
+
+logger = getLogger(__name__)
+
+
+def available_memory() -> Optional[int]:
+    """
+    Measures memory, that can be allocated without swapping
+
+    :return: available memory in bytes, if platform allows to measure it
+    """
+    try:
+        with open("/proc/meminfo", mode="r", encoding="utf-8") as file:
+            for line in file:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+
+    if sys.platform == "darwin":
+        try:
+            result = subprocess.run(["vm_stat"], capture_output=True, text=True, check=True, timeout=5)
+        except (OSError, subprocess.SubprocessError):
+            return None
+        lines = result.stdout.splitlines()
+        try:
+            page_size = int(lines[0].split("page size of")[1].split()[0])
+            pages = {name.strip(): int(value.strip(" .")) for name, value in (line.split(":") for line in lines[1:])}
+            return (pages["Pages free"] + pages["Pages inactive"] + pages.get("Pages speculative", 0)) * page_size
+        except (IndexError, KeyError, ValueError):
+            return None
+    return None
+
+
+def model_footprint(model: WhisperModel) -> int:
+    """
+    Estimates memory of a process with the model loaded. Quantized models take less, so the estimate is safe for them
+
+    :param model: model description
+    :return: bytes
+    """
+    return model.required_ram * GB
+
+
+def task_footprint(audio: SpooledAudio) -> int:
+    """
+    Estimates memory of a running transcription task
+
+    :param audio: audio to transcribe
+    :return: bytes
+    """
+    return audio.length * TASK_BYTES_PER_SAMPLE
+
+
+def workers_fit(model: WhisperModel, available: int, headroom: int = HEADROOM) -> int:
+    """
+    Counts processes, which models fit into memory
+
+    :param model: model description
+    :param available: available memory, bytes
+    :param headroom: memory to keep free, bytes
+    :return: processes count, at least 1, as the model is loaded anyway
+    """
+    return max(1, (available - headroom) // model_footprint(model))
+
+
+class MemoryBudget:
+    """
+    Memory reserved by tasks in flight. Not thread-safe, the owner serializes access
+    """
+
+    def __init__(self, capacity: Optional[int] = None) -> None:
+        """
+        :param capacity: memory available to tasks in bytes, not limited if not set
+        """
+        self.capacity = capacity
+        self.reserved = 0
+        self.tasks = 0  #: Tasks in flight
+        self.peak_tasks = 0
+        self.peak_reserved = 0
+        self.deferred = 0  #: Tasks, that had to wait for memory
+
+    def reserve(self, size: int) -> bool:
+        """
+        Reserves memory for a task, if it fits. A task is always admitted, if no other is in flight,
+        so that audio larger than the budget is still transcribed
+
+        :param size: task memory, bytes
+        :return: whether the task is admitted
+        """
+        if self.capacity is not None and self.tasks > 0 and self.reserved + size > self.capacity:
+            return False
+        self.reserved += size
+        self.tasks += 1
+        self.peak_tasks = max(self.peak_tasks, self.tasks)
+        self.peak_reserved = max(self.peak_reserved, self.reserved)
+        return True
+
+    def release(self, size: int) -> None:
+        """
+        Releases memory of a completed task
+
+        :param size: task memory, bytes
+        """
+        self.reserved -= size
+        self.tasks -= 1
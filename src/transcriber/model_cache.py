@@ -0,0 +1,148 @@
+"""
+Transcribe pools kept warm between jobs
+
+Processes of a transcribe pool load the model once and keep it, so a pool, that has finished a job,
+is kept with its models loaded and is taken by the next job with the same model, which starts transcribing
+right away instead of loading the model again. Pools are kept within the memory budget,
+that is estimated by the model RAM requirement, and the least recently used ones are shut down first.
+Unless the budget is set, pools are kept, while they fit into memory, and are evicted, once a new pool needs it.
+Cache does not wait for evicted pools to shut down: its owner does it without holding its lock
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from logging import getLogger
+from typing import List, Optional, Tuple
+
+from . import memory
+from .schemas import WhisperModel
+from .topology import PoolLayout
+
+
+#: Memory budget of kept pools, if it is not set and available memory is unknown
+DEFAULT_BUDGET = 8 * memory.GB
+
+
+@dataclass(frozen=True)
+class WarmPool:
+    """
+    Transcribe pool, which processes have the model loaded
+    """
+
+    model: WhisperModel
+    requested: PoolLayout  #: Layout, that the job asked for
+    layout: PoolLayout  #: Layout, that fit into memory
+    pool: ProcessPoolExecutor
+
+    @property
+    def size(self) -> int:
+        """
+        Estimated memory of the pool processes, bytes
+        """
+        return self.layout.workers * memory.model_footprint(self.model)
+
+
+class ModelCache:
+    """
+    Process-lifetime cache of warm transcribe pools, one per model variant. Not thread-safe, the owner serializes access
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None) -> None:
+        """
+        :param max_bytes: memory budget of kept pools, 0 shuts pools down right after their jobs.
+            If not set, pools are kept, while they fit into available memory
+        """
+        self.logger = getLogger(self.__class__.__name__)
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, WarmPool]" = OrderedDict()  #: Model variant -> pool, least recently used first
+        self.hits = self.misses = 0
+
+    @property
+    def size(self) -> int:
+        """
+        Estimated memory of all kept pools, bytes
+        """
+        return sum(entry.size for entry in self.entries.values())
+
+    def budget(self, held: int = 0) -> int:
+        """
+        Measures memory budget of kept pools
+
+        :param held: estimated memory of pools, that are running, but are not kept yet, bytes
+        :return: the set budget, or memory, that kept and held pools take, and available memory without headroom, bytes
+        """
+        if self.max_bytes is not None:
+            return self.max_bytes
+        available = memory.available_memory()
+        if available is None:
+            return DEFAULT_BUDGET
+        # Processes of kept pools hold their memory, so it is not available
+        return max(0, self.size + held + available - memory.HEADROOM)
+
+    def take(self, model: WhisperModel, requested: PoolLayout) -> Tuple[Optional[WarmPool], List[WarmPool]]:
+        """
+        Removes pool of the model from cache to run a job with it. Pool of another layout is evicted,
+        as the job needs the pool, that it asks for
+
+        :param model: model description
+        :param requested: layout, that the job asks for
+        :return: warm pool, if there is one with the same model and layout, evicted pools to shut down
+        """
+        entry = self.entries.pop(model.variant, None)
+        evicted = []
+        if entry is not None and entry.requested != requested:
+            self.logger.debug("Evicting warm pool of %s with another layout: %s", model.variant, entry.requested)
+            evicted.append(entry)
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry, evicted
+
+    def put(self, entry: WarmPool) -> None:
+        """
+        Keeps pool for the next jobs and shuts down the least recently used ones, if they exceed the budget
+
+        :param entry: pool, that has finished its job
+        """
+        budget = self.budget(held=entry.size)
+        if entry.size > budget:
+            entry.pool.shutdown(wait=False)
+            return
+        previous = self.entries.pop(entry.model.variant, None)
+        if previous is not None and previous.pool is not entry.pool:
+            previous.pool.shutdown(wait=False)
+        self.entries[entry.model.variant] = entry
+        for evicted in self.make_room(0, budget):
+            evicted.pool.shutdown(wait=False)
+        self.logger.info(
+            "Keeping %s warm with %s models, %.1fGB kept", entry.layout, entry.model.variant, self.size / memory.GB
+        )
+
+    def make_room(self, size: int, budget: Optional[int] = None) -> List[WarmPool]:
+        """
+        Evicts the least recently used pools, until the others and a pool of the given size fit into the budget.
+        Evicted pools are not shut down, so that the caller waits for their memory to be free without holding its lock
+
+        :param size: estimated memory of the pool to be started, bytes
+        :param budget: memory budget, measured if not set, bytes
+        :return: evicted pools to shut down
+        """
+        budget = self.budget() if budget is None else budget
+        evicted = []
+        while len(self.entries) > 0 and self.size + size > budget:
+            variant, entry = self.entries.popitem(last=False)
+            evicted.append(entry)
+            self.logger.info("Evicted warm pool of %s to fit model cache budget", variant)
+        return evicted
+
+    def clear(self) -> None:
+        """
+        Shuts down all kept pools
+        """
+        while len(self.entries) > 0:
+            _, entry = self.entries.popitem(last=False)
+            entry.pool.shutdown(wait=False)
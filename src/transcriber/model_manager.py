@@ -1,12 +1,14 @@
 from logging import getLogger
-from typing import Iterable, Optional, Tuple
-
-import whisper
-from yaml import safe_load
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Optional, Tuple
 
 from src.settings import settings
+from . import static
 from .schemas import WhisperModel
 
+if TYPE_CHECKING:
+    import whisper
+
 
 class ModelManager:
     MODELS_FILE = settings.STATIC_DIR / "models.yaml"
@@ -14,12 +16,12 @@ class ModelManager:
     def __init__(self) -> None:
         self.logger = getLogger(self.__class__.__name__)
 
-        self._model: Optional[whisper.Whisper] = None
+        self._model: Optional["whisper.Whisper"] = None
         self._model_description: Optional[WhisperModel] = None
         self._available_models: Optional[Tuple[WhisperModel, ...]] = None
 
     @property
-    def model(self) -> whisper.Whisper:
+    def model(self) -> "whisper.Whisper":
         """
         Returns assigned whisper model, if any
 
@@ -31,13 +33,15 @@ class ModelManager:
         return self._model
 
     @model.setter
-    def model(self, v: whisper.Whisper) -> None:
+    def model(self, v: "whisper.Whisper") -> None:
         """
         Sets provided whisper model as a target model to use in the object
 
         :param v: new whisper model
         :raise TypeError: invalid model type
         """
+        import whisper
+
         if not isinstance(v, whisper.Whisper):
             raise TypeError(f"Cannot assign {type(v)} to model")
 
@@ -93,7 +97,7 @@ class ModelManager:
             raise ValueError("Models are duplicated by name")
 
         self._available_models = valid_models
-        self.logger.debug("Available models loaded from yaml file: %s", self.MODELS_FILE)
+        self.logger.debug("Available models loaded from static file: %s", self.MODELS_FILE)
 
     @classmethod
     def load_available_models(cls) -> Tuple[WhisperModel, ...]:
@@ -102,16 +106,45 @@ class ModelManager:
 
         :return: available models information
         """
-        with open(cls.MODELS_FILE) as file:
-            data = safe_load(file.read())["available"]
+        data = static.load(cls.MODELS_FILE.name)["available"]
         return tuple(map(lambda x: WhisperModel(**x), data))
 
     @staticmethod
-    def load_model(model: WhisperModel) -> whisper.Whisper:
+    def load_model(model: WhisperModel) -> "whisper.Whisper":
         """
-        Loads model via `whisper` methods
+        Loads model from memory-mapped checkpoint, or quantized model
 
         :param model: model description
         :returns: whisper
         """
-        return whisper.load_model(name=model.name, download_root=settings.CACHE_DIR)
+        # whisper pulls in torch, which takes seconds to import, so it is imported only in processes, that need it
+        if model.quantized:
+            from . import quantization
+
+            return quantization.load_model(model.name, settings.CACHE_DIR)
+
+        from . import checkpoints
+
+        return checkpoints.load_model(model.name, settings.CACHE_DIR)
+
+    @staticmethod
+    def download_model(model: WhisperModel) -> Path:
+        """
+        Downloads model checkpoint into cache directory, if it is not there yet,
+        without loading model into memory. Checkpoint is converted into memory-mapped one
+        and quantized model is quantized and stored on its first usage, which loads float model once
+
+        :param model: model description
+        :return: memory-mapped checkpoint filepath, or quantized model filepath, if model is quantized
+        """
+        if model.quantized:
+            # Model is quantized once here, so that worker processes do not quantize it concurrently
+            from . import quantization
+
+            return quantization.prepare(model.name, settings.CACHE_DIR)
+
+        from . import checkpoints
+
+        # Checkpoint is converted once here, so that worker processes do not convert it concurrently.
+        # Conversion loads the checkpoint with `whisper.load_model`, which downloads it, if it is not there yet
+        return checkpoints.prepare(model.name, settings.CACHE_DIR)
@@ -0,0 +1,122 @@
+"""
+Dynamic int8 quantization of Whisper models for CPU inference
+
+Weights of linear layers, which take most of the model size and inference time, are converted to int8,
+while activations are quantized on the fly. Convolutions, embeddings and layer norms stay in full precision.
+Quantized models are stored in cache directory, so that a model is quantized only on its first load
+"""
+
+from logging import getLogger
+import os
+from pathlib import Path
+import warnings
+
+import torch
+import whisper
+from whisper.model import Linear
+
+from src.settings import settings
+
+
+QUANTIZED_DIR = settings.CACHE_DIR / "quantized"
+#: torch deprecates quantized tensors in favor of a separate package, but still supports them
+QUANTIZATION_DEPRECATION = ".*quantized tensor creation functions.*"
+
+logger = getLogger(__name__)
+
+
+def quantized_path(name: str, store_dir: Path = QUANTIZED_DIR) -> Path:
+    """
+    Generates filepath of quantized model
+
+    Quantized model is stored as a whole module, which format is specific to torch and whisper versions,
+    so models are stored per versions
+
+    :param name: whisper model name
+    :param store_dir: directory of quantized models
+    :return: quantized model filepath
+    """
+    return store_dir / f"{name}-int8-torch{torch.__version__}-whisper{whisper.__version__}.pt"
+
+
+def quantize(model: whisper.Whisper) -> whisper.Whisper:
+    """
+    Replaces linear layers of float model with dynamically quantized int8 layers
+
+    :param model: float model, is modified in place
+    :return: quantized model
+    """
+    for module in model.modules():
+        # whisper linear layer only casts weights to fp16 inputs, which is not used on CPU,
+        # while quantization swaps modules of exactly `nn.Linear` type
+        if type(module) is Linear:
+            module.__class__ = torch.nn.Linear
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message=QUANTIZATION_DEPRECATION)
+        return torch.ao.quantization.quantize_dynamic(model.float().eval(), {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def save(model: whisper.Whisper, path: Path) -> None:
+    """
+    Atomically stores quantized model
+
+    :param model: quantized model
+    :param path: target file
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    torch.save(model, tmp)
+    os.replace(tmp, path)
+
+
+def load(path: Path) -> whisper.Whisper:
+    """
+    Loads quantized model
+
+    Whole module is unpickled, so that float model is never created and its memory is never allocated.
+    The file is trusted, as it is written by the application itself
+
+    :param path: quantized model file
+    :return: quantized model
+    """
+    with warnings.catch_warnings():
+        # Unpickling quantized tensors warns about deprecated torch internals, which are not used by the application
+        warnings.simplefilter("ignore", UserWarning)
+        model = torch.load(path, map_location="cpu", weights_only=False)
+    if not isinstance(model, whisper.Whisper):
+        raise TypeError(f"Cannot load {type(model)} as quantized model")
+    return model
+
+
+def prepare(name: str, download_root: Path = settings.CACHE_DIR, store_dir: Path = QUANTIZED_DIR) -> Path:
+    """
+    Quantizes float model and stores it, if it is not stored yet
+
+    :param name: whisper model name
+    :param download_root: float checkpoints directory
+    :param store_dir: quantized models directory
+    :return: quantized model filepath
+    """
+    path = quantized_path(name, store_dir)
+    if not path.exists():
+        save(quantize(whisper.load_model(name=name, device="cpu", download_root=download_root)), path)
+        logger.info("Quantized model %s to int8: %s", name, path)
+    return path
+
+
+def load_model(name: str, download_root: Path = settings.CACHE_DIR, store_dir: Path = QUANTIZED_DIR) -> whisper.Whisper:
+    """
+    Loads quantized model, quantizing and storing float model on the first load
+
+    :param name: whisper model name
+    :param download_root: float checkpoints directory
+    :param store_dir: quantized models directory
+    :return: quantized model
+    """
+    path = prepare(name, download_root, store_dir)
+    try:
+        return load(path)
+    except Exception as e:
+        logger.warning("Cannot load quantized model %s, quantizing it again: %s", path, e)
+        path.unlink(missing_ok=True)
+    return load(prepare(name, download_root, store_dir))
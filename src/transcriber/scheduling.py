@@ -0,0 +1,95 @@
+"""
+Priority queue of files, that wait to be dispatched to processing
+
+Files are dispatched in priority order: the lowest value first, files of the same priority in the order they were queued.
+Queued file can be reprioritized or removed at any moment: its heap entry is invalidated and skipped, once it is popped,
+so that every operation takes logarithmic time
+"""
+
+import heapq
+from itertools import count
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .schemas import ModelSettings
+
+
+class FileQueue:
+    """
+    Files with their presets ordered by priority. Not thread-safe, the owner serializes access
+    """
+
+    def __init__(self) -> None:
+        self.heap: List[list] = []  #: `[priority, order, path, preset]` entries, invalidated ones have no path
+        self.entries: Dict[Path, list] = {}  #: Queued file -> its valid heap entry
+        self.priorities: Dict[Path, int] = {}  #: Last priority of every file, that was queued, including dispatched ones
+        self.order = count()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, path: Path) -> bool:
+        return path in self.entries
+
+    def push(self, path: Path, preset: ModelSettings, priority: int) -> None:
+        """
+        Queues file, replacing its previous entry, if it is queued already
+
+        :param path: audio file
+        :param preset: file preset
+        :param priority: dispatch priority, lower values are dispatched first
+        """
+        self.remove(path)
+        entry = [priority, next(self.order), path, preset]
+        self.entries[path] = entry
+        self.priorities[path] = priority
+        heapq.heappush(self.heap, entry)
+
+    def pop(self) -> Optional[Tuple[Path, ModelSettings]]:
+        """
+        Takes the file of the highest priority
+
+        :return: file with its preset, if the queue is not empty
+        """
+        while len(self.heap) > 0:
+            _, _, path, preset = heapq.heappop(self.heap)
+            if path is not None:
+                del self.entries[path]
+                return path, preset
+        return None
+
+    def reprioritize(self, path: Path, priority: int) -> bool:
+        """
+        Changes priority of the queued file. File keeps its place among files of the new priority,
+        as if it was queued again
+
+        :param path: queued file
+        :param priority: new priority
+        :return: whether the file is queued
+        """
+        entry = self.entries.get(path)
+        if entry is None:
+            return False
+        self.push(path, entry[3], priority)
+        return True
+
+    def remove(self, path: Path) -> bool:
+        """
+        Removes file from the queue
+
+        :param path: queued file
+        :return: whether the file was queued
+        """
+        entry = self.entries.pop(path, None)
+        if entry is None:
+            return False
+        entry[2] = None
+        return True
+
+    def clear(self) -> None:
+        """
+        Removes all files
+        """
+        self.heap.clear()
+        self.entries.clear()
+        self.priorities.clear()
@@ -2,9 +2,9 @@ from pathlib import Path
 from typing import Literal, List, Optional
 
 from pydantic import BaseModel, Field, AliasChoices
-from PyQt6.QtCore import QCoreApplication
 
 from src.settings import settings
+from .translation import translate
 
 
 class WhisperModel(BaseModel):
@@ -20,6 +20,17 @@ class WhisperModel(BaseModel):
     is_default: bool = Field(
         validation_alias=AliasChoices("default", "is_default"), default=False, serialization_alias="Доступна локально"
     )
+    quantized: bool = Field(default=False)  #: Whether to run CPU inference with int8 quantized linear layers
+    n_mels: int = Field(default=80)  #: Mel bins of the model input spectrogram
+
+    @property
+    def variant(self) -> str:
+        """
+        Model name, that distinguishes quantized model, whose transcriptions differ from float model ones
+
+        :return: model variant name
+        """
+        return f"{self.name}-int8" if self.quantized else self.name
 
     @property
     def displayed_parameters(self) -> str:
@@ -89,7 +100,31 @@ class WhisperModel(BaseModel):
 
         :return: `is_loaded` description
         """
-        return QCoreApplication.tr("is loaded") if self.is_loaded else QCoreApplication.tr("not loaded")
+        return translate("WhisperModel", "is loaded") if self.is_loaded else translate("WhisperModel", "not loaded")
+
+
+class VADSettings(BaseModel):
+    """
+    Voice activity detection settings, that define which audio frames are cut out as silence
+    """
+
+    detector: str = Field(default="energy")  #: Detector name: "energy", "spectral_flux" or "zero_crossing"
+    threshold: float = Field(default=0.01)  #: Minimal detector feature value of a speech frame
+    adaptive: bool = Field(default=False)  #: Whether to raise threshold above the file noise floor
+    noise_percentile: float = Field(default=10.0, ge=0, le=100)  #: Feature percentile considered noise floor
+    noise_margin: float = Field(default=3.0, gt=0)  #: Adaptive threshold ratio to noise floor
+    hysteresis: float = Field(default=1.0, gt=0, le=1)  #: Ratio of the threshold speech continues above
+    pad_ms: int = Field(default=200, ge=0)  #: Speech is widened by this duration at both sides
+    max_zero_crossing_rate: float = Field(default=0.3, gt=0, le=1)  #: Noisier frames are not speech
+
+
+class PreprocessingSettings(BaseModel):
+    """
+    Audio preprocessing settings, that are applied before transcription
+    """
+
+    highpass_cutoff: Optional[int] = Field(default=None)  #: High-pass denoise cutoff frequency, Hz
+    vad: Optional[VADSettings] = Field(default=None)  #: Silence removal settings
 
 
 class ModelSettings(BaseModel):
@@ -110,3 +145,5 @@ class ModelSettings(BaseModel):
     no_speech_threshold: Optional[float] = Field(default=None)
     logprob_threshold: Optional[float] = Field(default=None)
     compression_ratio_threshold: Optional[float] = Field(default=None)
+
+    preprocessing: PreprocessingSettings = Field(default_factory=PreprocessingSettings)
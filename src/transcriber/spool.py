@@ -0,0 +1,228 @@
+from dataclasses import dataclass, replace
+from logging import getLogger
+import os
+from pathlib import Path
+import shutil
+import sys
+from typing import Tuple
+from uuid import uuid4
+
+import numpy as np
+
+from src.settings import settings
+
+
+@dataclass(frozen=True)
+class SpooledAudio:
+    """
+    Handle of audio data stored in a memory-mapped spool file
+
+    Only the handle is passed between processes, while audio samples stay on disk
+    and in the shared page cache
+    """
+
+    path: Path
+    length: int  #: Samples count
+    sr: int = 16_000
+    offset: int = 0  #: First sample position in the file
+
+    @property
+    def duration(self) -> float:
+        """
+        Audio duration in seconds
+        """
+        return self.length / self.sr
+
+    def open(self) -> np.ndarray:
+        """
+        Maps audio samples into memory
+
+        Copy-on-write mode shares pages with other processes and keeps spool file intact,
+        even if consumer modifies the array
+
+        :return: audio data
+        """
+        if self.length == 0:
+            return np.zeros(0, dtype=np.float32)
+        return np.memmap(
+            self.path, dtype=np.float32, mode="c", shape=(self.length,), offset=self.offset * np.float32().itemsize
+        )
+
+    def view(self, start: int, stop: int) -> "SpooledAudio":
+        """
+        Creates handle of the audio part, that shares the same spool file
+
+        :param start: first sample, relative to current handle
+        :param stop: sample after the last one, relative to current handle
+        :return: part handle
+        """
+        start, stop = max(0, start), min(self.length, stop)
+        return SpooledAudio(path=self.path, length=max(0, stop - start), sr=self.sr, offset=self.offset + start)
+
+    def release(self) -> None:
+        """
+        Removes spool file, including all the views of it
+        """
+        self.path.unlink(missing_ok=True)
+
+
+@dataclass(frozen=True)
+class SpooledMel:
+    """
+    Handle of log-mel spectrogram stored in a memory-mapped spool file
+
+    Frames are stored one after another, so that spectrograms of chunks of a long recording
+    are parts of a single file, like chunks audio
+    """
+
+    path: Path
+    n_mels: int  #: Mel bins
+    frames: int  #: Frames count
+    offset: int = 0  #: First frame position in the file
+
+    def open(self) -> np.ndarray:
+        """
+        Maps spectrogram into memory in copy-on-write mode
+
+        :return: spectrogram of `(n_mels, frames)` shape
+        """
+        if self.frames == 0:
+            return np.zeros((self.n_mels, 0), dtype=np.float32)
+        return np.memmap(
+            self.path,
+            dtype=np.float32,
+            mode="c",
+            shape=(self.frames, self.n_mels),
+            offset=self.offset * self.n_mels * np.float32().itemsize,
+        ).T
+
+    def view(self, start: int, stop: int) -> "SpooledMel":
+        """
+        Creates handle of the spectrogram part, that shares the same spool file
+
+        :param start: first frame, relative to current handle
+        :param stop: frame after the last one, relative to current handle
+        :return: part handle
+        """
+        start, stop = max(0, start), min(self.frames, stop)
+        return SpooledMel(path=self.path, n_mels=self.n_mels, frames=max(0, stop - start), offset=self.offset + start)
+
+    def release(self) -> None:
+        """
+        Removes spool file, including all the views of it
+        """
+        self.path.unlink(missing_ok=True)
+
+
+class AudioSpool:
+    """
+    Directory of memory-mapped audio files owned by a single application process
+
+    Each application process has its own directory, so that concurrently running instances
+    do not clean up each other's files
+    """
+
+    SPOOL_DIR = settings.CACHE_DIR / "spool"
+
+    def __init__(self, owner_pid: int = None) -> None:
+        self.logger = getLogger(self.__class__.__name__)
+        self.directory = self.SPOOL_DIR / str(owner_pid or os.getpid())
+
+    def allocate(self, length: int, sr: int = 16_000) -> Tuple[np.ndarray, SpooledAudio]:
+        """
+        Creates spool file of the given length and maps it into memory for writing
+
+        :param length: samples count
+        :param sr: sample rate
+        :return: writable buffer, handle of the file
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        handle = SpooledAudio(path=self.directory / f"{uuid4().hex}.f32", length=length, sr=sr)
+        if length == 0:
+            handle.path.touch()
+            return np.zeros(0, dtype=np.float32), handle
+        return np.memmap(handle.path, dtype=np.float32, mode="w+", shape=(length,)), handle
+
+    @staticmethod
+    def grow(audio: np.ndarray, handle: SpooledAudio, length: int) -> Tuple[np.ndarray, SpooledAudio]:
+        """
+        Extends spool file, keeping its contents, e.g. if decoder delivers more samples than file header states
+
+        :param audio: writable buffer of the file
+        :param handle: handle of the file
+        :param length: new samples count
+        :return: writable buffer of the new length, handle of the file
+        """
+        if isinstance(audio, np.memmap):
+            audio.flush()
+        with open(handle.path, mode="r+b") as file:
+            file.truncate(length * np.dtype(np.float32).itemsize)
+        return np.memmap(handle.path, dtype=np.float32, mode="r+", shape=(length,)), replace(handle, length=length)
+
+    def store(self, audio: np.ndarray, sr: int = 16_000) -> SpooledAudio:
+        """
+        Writes audio data to a new spool file
+
+        :param audio: audio data
+        :param sr: sample rate
+        :return: handle of the stored audio
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        handle = SpooledAudio(path=self.directory / f"{uuid4().hex}.f32", length=len(audio), sr=sr)
+        audio.astype(np.float32, copy=False).tofile(handle.path)
+        return handle
+
+    def allocate_mel(self, n_mels: int, frames: int) -> Tuple[np.ndarray, SpooledMel]:
+        """
+        Creates spool file for log-mel spectrogram and maps it into memory for writing
+
+        :param n_mels: mel bins
+        :param frames: frames count
+        :return: writable buffer of `(frames, n_mels)` shape, handle of the file
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        handle = SpooledMel(path=self.directory / f"{uuid4().hex}.mel", n_mels=n_mels, frames=frames)
+        if frames == 0:
+            handle.path.touch()
+            return np.zeros((0, n_mels), dtype=np.float32), handle
+        return np.memmap(handle.path, dtype=np.float32, mode="w+", shape=(frames, n_mels)), handle
+
+    def clear(self) -> None:
+        """
+        Removes all files of the spool
+        """
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.logger.debug("Cleared spool directory: %s", self.directory)
+
+    @classmethod
+    def clear_stale(cls) -> None:
+        """
+        Removes spool directories left by application processes that are not running anymore
+        """
+        if not cls.SPOOL_DIR.exists():
+            return
+
+        for directory in cls.SPOOL_DIR.iterdir():
+            if directory.name.isdigit() and not cls.is_running(int(directory.name)):
+                shutil.rmtree(directory, ignore_errors=True)
+                getLogger(cls.__name__).info("Removed stale spool directory: %s", directory)
+
+    @staticmethod
+    def is_running(pid: int) -> bool:
+        """
+        Checks if process with the given id exists
+
+        :param pid: process id
+        :return: whether process is running
+        """
+        if sys.platform == "win32":
+            # Signal 0 terminates process on Windows, so consider it running
+            return True
+
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
@@ -0,0 +1,106 @@
+"""
+Static configuration snapshot
+
+YAML files in static directory are the source of truth, but parsing them on every launch is slow.
+Parsed files are stored in a JSON snapshot together with their digests and are read from it,
+while the digest matches the source file. Outdated snapshot is recompiled on the fly,
+release builds precompile it with:
+
+    python -m src.transcriber.static
+"""
+
+from functools import lru_cache
+from hashlib import sha256
+import json
+from logging import getLogger
+import os
+from pathlib import Path
+import sys
+from typing import Any, Dict
+
+from src.settings import settings
+
+
+SOURCES = ("models.yaml", "presets.yaml", "transcriber.yaml")
+SNAPSHOT_FILE = settings.STATIC_DIR / "snapshot.json"
+
+logger = getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def read_snapshot(path: Path = SNAPSHOT_FILE) -> Dict[str, Any]:
+    """
+    Reads snapshot file
+
+    :param path: snapshot file
+    :return: source filename -> digest and parsed data, empty if snapshot cannot be read
+    """
+    try:
+        with open(path, mode="r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_snapshot(snapshot: Dict[str, Any], path: Path = SNAPSHOT_FILE) -> None:
+    """
+    Atomically replaces snapshot file
+
+    :param snapshot: source filename -> digest and parsed data
+    :param path: snapshot file
+    """
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp, mode="w", encoding="utf-8") as file:
+        json.dump(snapshot, file, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def load(filename: str, static_dir: Path = settings.STATIC_DIR) -> Any:
+    """
+    Loads parsed static file from snapshot, or parses the file, if snapshot is outdated
+
+    :param filename: YAML filename in static directory
+    :param static_dir: static directory
+    :return: parsed file contents
+    """
+    source = (static_dir / filename).read_bytes()
+    digest = sha256(source).hexdigest()
+    snapshot_file = static_dir / SNAPSHOT_FILE.name
+    snapshot = read_snapshot(snapshot_file)
+    entry = snapshot.get(filename)
+    if entry is not None and entry["digest"] == digest:
+        return entry["data"]
+
+    logger.info("Static snapshot is outdated: %s", filename)
+    from yaml import safe_load
+
+    data = safe_load(source)
+    snapshot[filename] = {"digest": digest, "data": data}
+    try:
+        write_snapshot(snapshot, snapshot_file)
+    except OSError as e:
+        logger.warning("Cannot update static snapshot: %s", e)
+    return data
+
+
+def compile_snapshot(static_dir: Path = settings.STATIC_DIR) -> Path:
+    """
+    Parses all static files and writes them to snapshot
+
+    :param static_dir: static directory
+    :return: snapshot file
+    """
+    from yaml import safe_load
+
+    snapshot = {}
+    for filename in SOURCES:
+        source = (static_dir / filename).read_bytes()
+        snapshot[filename] = {"digest": sha256(source).hexdigest(), "data": safe_load(source)}
+    snapshot_file = static_dir / SNAPSHOT_FILE.name
+    write_snapshot(snapshot, snapshot_file)
+    read_snapshot.cache_clear()
+    return snapshot_file
+
+
+if __name__ == "__main__":
+    sys.stdout.write(f"{compile_snapshot()}\n")
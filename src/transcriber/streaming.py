@@ -0,0 +1,135 @@
+"""
+Block-wise signal processing, that carries filter state between blocks,
+so that long audio is processed with memory bounded by block size
+"""
+
+from math import gcd
+from typing import Optional
+
+import numpy as np
+from scipy.signal import butter, firwin, lfilter, lfilter_zi, upfirdn
+
+
+class StreamingResampler:
+    """
+    Polyphase resampler, that produces the same output as `scipy.signal.resample_poly`
+    with default parameters, but processes input block by block
+
+    Input samples, that are still required by the filter, are kept between blocks
+    """
+
+    def __init__(self, sr: int, target_sr: int, n_in: int = 0) -> None:
+        """
+        :param sr: input sample rate
+        :param target_sr: output sample rate
+        :param n_in: expected input samples count, e.g. from file header. Output follows the input,
+            that is actually consumed, which may differ
+        """
+        divisor = gcd(sr, target_sr)
+        self.up, self.down = target_sr // divisor, sr // divisor
+        self.n_out = self.output_length(n_in)  #: Expected output samples count
+        self.consumed = 0  #: Input samples consumed so far
+
+        self.h = np.ones(1)
+        self.pre_remove = 0
+        if not self.passthrough:
+            # Same filter design as resample_poly has
+            max_rate = max(self.up, self.down)
+            half_len = 10 * max_rate
+            h = firwin(2 * half_len + 1, 1.0 / max_rate, window=("kaiser", 5.0)) * self.up
+            n_pre_pad = self.down - half_len % self.down
+            self.h = np.concatenate((np.zeros(n_pre_pad, dtype=h.dtype), h))
+            self.pre_remove = (half_len + n_pre_pad) // self.down
+
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.buffer_start = 0  #: Position of buffer first sample in the input, always a multiple of `down`
+        self.next_out = 0  #: Next output sample to produce
+
+    @property
+    def passthrough(self) -> bool:
+        """
+        Whether input sample rate equals target one
+        """
+        return self.up == self.down
+
+    def output_length(self, n_in: int) -> int:
+        """
+        Counts output samples of the input, as `resample_poly` does
+
+        :param n_in: input samples count
+        :return: output samples count
+        """
+        return -(-n_in * self.up // self.down)
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """
+        Consumes next input block
+
+        :param block: input samples
+        :return: output samples, that are fully determined by input consumed so far
+        """
+        self.consumed += len(block)
+        if self.passthrough:
+            return block
+
+        self.buffer = np.concatenate((self.buffer, block))
+        buffer_end = self.buffer_start + len(self.buffer)
+        # Output m depends on inputs up to floor((m + pre_remove) * down / up)
+        out_end = self.output_length(buffer_end) - self.pre_remove
+        return self.produce(out_end)
+
+    def flush(self) -> np.ndarray:
+        """
+        Produces the rest of output, considering input to end with the last consumed block
+
+        :return: output samples
+        """
+        if self.passthrough:
+            return np.zeros(0, dtype=np.float32)
+        # Input is zero-padded after its end, as the filter tail requires
+        self.buffer = np.concatenate((self.buffer, np.zeros(len(self.h) // self.up + self.down, dtype=np.float32)))
+        return self.produce(self.output_length(self.consumed))
+
+    def produce(self, out_end: int) -> np.ndarray:
+        """
+        Calculates output samples from `next_out` to `out_end` and drops input samples,
+        that are not required anymore
+
+        :param out_end: output sample to stop at (exclusive)
+        :return: output samples
+        """
+        if out_end <= self.next_out:
+            return np.zeros(0, dtype=np.float32)
+
+        filtered = upfirdn(self.h, self.buffer, self.up, self.down)
+        first = self.next_out + self.pre_remove - self.buffer_start * self.up // self.down
+        result = filtered[first : first + out_end - self.next_out].astype(np.float32)
+        self.next_out = out_end
+
+        # Keep inputs, that contribute to the next output sample
+        required = max(0, -(-((self.next_out + self.pre_remove) * self.down - len(self.h) + 1) // self.up))
+        new_start = min(required, self.buffer_start + len(self.buffer)) // self.down * self.down
+        self.buffer = self.buffer[new_start - self.buffer_start :]
+        self.buffer_start = new_start
+        return result
+
+
+class StreamingHighpass:
+    """
+    Butterworth high-pass filter, that processes signal block by block
+    """
+
+    def __init__(self, sr: int = 16_000, cutoff: int = 80) -> None:
+        self.b, self.a = butter(2, cutoff / (sr / 2), btype="highpass")
+        # Zero initial state, as whole-signal filtering has
+        self.state: Optional[np.ndarray] = np.zeros_like(lfilter_zi(self.b, self.a))
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """
+        Filters next block
+
+        :param block: input samples
+        :return: filtered samples
+        """
+        filtered, self.state = lfilter(self.b, self.a, block, zi=self.state)
+        return filtered.astype(np.float32)
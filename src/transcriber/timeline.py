@@ -0,0 +1,98 @@
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+
+from .transcriber import Transcriber
+
+
+def mask_ranges(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Finds continuous ranges of true values in mask
+
+    :param mask: boolean mask
+    :return: ranges starts, ranges stops (exclusive)
+    """
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+    return edges[::2], edges[1::2]
+
+
+@dataclass(frozen=True)
+class TimeMap:
+    """
+    Index of audio ranges kept after silence removal
+
+    Maps timings of the compressed audio, that Whisper transcribes,
+    back to the timings of the original audio
+    """
+
+    original_starts: np.ndarray  #: Kept ranges beginnings in the original audio, seconds
+    compressed_starts: np.ndarray  #: Kept ranges beginnings in the compressed audio, seconds
+    durations: np.ndarray  #: Kept ranges durations, seconds
+    original_duration: float = 0.0  #: Original audio duration, seconds
+
+    @classmethod
+    def from_mask(cls, mask: np.ndarray, frame_len: int, sr: int = 16_000, length: int = None) -> "TimeMap":
+        """
+        Creates time map from frames mask
+
+        :param mask: whether every frame is kept
+        :param frame_len: frame length, samples
+        :param sr:
+        :param length: original audio length, samples. Defaults to frames total length
+        :return: time map
+        """
+        starts, stops = mask_ranges(mask)
+        durations = (stops - starts) * frame_len / sr
+        return cls(
+            original_starts=starts * frame_len / sr,
+            compressed_starts=np.concatenate(([0.0], np.cumsum(durations)[:-1])),
+            durations=durations,
+            original_duration=(length if length is not None else len(mask) * frame_len) / sr,
+        )
+
+    @property
+    def removed_duration(self) -> float:
+        """
+        Duration of audio removed from the original, seconds
+        """
+        return self.original_duration - float(np.sum(self.durations))
+
+    def to_original(self, t: float, is_end: bool = False) -> float:
+        """
+        Converts compressed audio timing to the original audio timing
+
+        Timing at the junction of two ranges belongs to both of them: range end
+        is mapped to the end of the previous range, range start to the beginning of the next one
+
+        :param t: compressed audio timing, seconds
+        :param is_end: whether timing is the end of an interval
+        :return: original audio timing, seconds
+        """
+        if len(self.compressed_starts) == 0:
+            return t
+        index = np.searchsorted(self.compressed_starts, t, side="left" if is_end else "right") - 1
+        index = int(np.clip(index, 0, len(self.compressed_starts) - 1))
+        return float(self.original_starts[index] + t - self.compressed_starts[index])
+
+    def remap(self, transcription: Transcriber.Transcription) -> Transcriber.Transcription:
+        """
+        Moves segments and words timings to the original audio timeline
+
+        :param transcription: transcription of the compressed audio
+        :return: transcription with original audio timings
+        """
+        segments = []
+        for segment in transcription.segments:
+            remapped = {
+                **segment,
+                "start": self.to_original(segment["start"]),
+                "end": self.to_original(segment["end"], is_end=True),
+            }
+            if "words" in segment:
+                remapped["words"] = [
+                    {**word, "start": self.to_original(word["start"]), "end": self.to_original(word["end"], is_end=True)}
+                    for word in segment["words"]
+                ]
+            segments.append(remapped)
+        return Transcriber.Transcription(text=transcription.text, segments=segments, language=transcription.language)
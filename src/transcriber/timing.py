@@ -0,0 +1,174 @@
+"""
+Per-file stage timings of transcription jobs
+
+Durations are measured by processes, that run the stages, and are sent to the engine
+together with stage results, so that timings of different processes are never compared
+"""
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+import json
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from src.settings import settings
+
+
+def timed(func: Callable, *args, **kwargs) -> Tuple[Any, float]:
+    """
+    Runs function and measures its duration. Used to wrap pool tasks
+
+    :param func: function to run
+    :return: function result, duration in seconds
+    """
+    start = perf_counter()
+    result = func(*args, **kwargs)
+    return result, perf_counter() - start
+
+
+class StageTimer:
+    """
+    Accumulates durations of named stages
+    """
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, duration: float) -> None:
+        """
+        Adds duration to stage total
+
+        :param stage: stage name
+        :param duration: seconds
+        """
+        self.stages[stage] = self.stages.get(stage, 0.0) + duration
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        """
+        Adds duration of the wrapped code to stage total
+
+        :param stage: stage name
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, perf_counter() - start)
+
+    def reset(self) -> None:
+        self.stages = {}
+
+
+@dataclass
+class FileTimings:
+    """
+    Where time of a single file processing went
+
+    Stages are: hash, decode, resample, filter, normalize, vad, split (or cache, if prepared audio is cached),
+    mel (log-mel spectrogram, if computed in preparation), inference, export and queue wait: time between stages,
+    when file waits for a free worker or the model
+    """
+
+    path: Path
+    preset: str
+    started: float = field(default_factory=perf_counter)  #: Job-process time, when file was submitted
+    audio_duration: float = 0.0  #: Original audio duration, seconds
+    total: float = 0.0  #: Time from submission to export, seconds
+    reused: bool = False  #: Whether transcription was taken from cache or identical file
+    stages: StageTimer = field(default_factory=StageTimer)
+
+    @property
+    def rtf(self) -> Optional[float]:
+        """
+        Real-time factor: processing time divided by audio duration
+        """
+        return self.total / self.audio_duration if self.audio_duration > 0 else None
+
+    def complete(self) -> None:
+        """
+        Records file completion. Time, that is not spent in any stage, is counted as queue wait
+        """
+        self.total = perf_counter() - self.started
+        self.stages.add("queue_wait", max(0.0, self.total - sum(self.stages.stages.values())))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "path": str(self.path),
+            "preset": self.preset,
+            "audio_duration": self.audio_duration,
+            "total": self.total,
+            "rtf": self.rtf,
+            "reused": self.reused,
+            "stages": self.stages.stages,
+        }
+
+
+class JobStats:
+    """
+    Aggregate throughput of a job
+    """
+
+    def __init__(self) -> None:
+        self.started = perf_counter()
+        self.files = 0
+        self.audio_duration = 0.0  #: Seconds
+        self.stages = StageTimer()
+
+    def add(self, timings: FileTimings) -> None:
+        self.files += 1
+        self.audio_duration += timings.audio_duration
+        for stage, duration in timings.stages.stages.items():
+            self.stages.add(stage, duration)
+
+    @property
+    def throughput(self) -> float:
+        """
+        Audio hours processed per hour of job
+        """
+        return self.audio_duration / max(perf_counter() - self.started, 1e-9)
+
+    @property
+    def slowest_stage(self) -> Optional[Tuple[str, float]]:
+        """
+        Stage, that took most of the time of all files
+
+        :return: stage name and its share of all stages time, if any stage is measured
+        """
+        if len(self.stages.stages) == 0:
+            return None
+        stage = max(self.stages.stages, key=self.stages.stages.get)
+        return stage, self.stages.stages[stage] / max(sum(self.stages.stages.values()), 1e-9)
+
+
+class TimingsLog:
+    """
+    JSON lines file of per-file timings, written next to application logs
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        """
+        :param path: log file, if not the default one
+        """
+        self.logger = getLogger(self.__class__.__name__)
+        self.path = path or settings.LOGGING_DIR / "timings.jsonl"
+        self.lock = Lock()
+
+    def write(self, timings: FileTimings) -> None:
+        """
+        Appends file timings. Failure to write does not fail the job
+
+        :param timings: timings of processed file
+        """
+        with self.lock:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, mode="a", encoding="utf-8") as file:
+                    file.write(json.dumps(timings.to_dict(), ensure_ascii=False) + "\n")
+            except OSError as e:
+                self.logger.warning("Unable to write timings: %s", e)
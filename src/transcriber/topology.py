@@ -0,0 +1,268 @@
+"""
+Sizing of transcribe worker processes and their torch threads
+
+torch parallelizes inference of a single file inside a process. Small models do not keep many threads busy,
+so more processes with fewer threads transcribe more files at once, while larger models benefit from
+more threads per process and take too much memory to be loaded by many processes.
+Layout is chosen from physical cores and the model size, unless it is set explicitly
+or was calibrated on this machine before
+"""
+
+from concurrent.futures import ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime
+import json
+from logging import getLogger
+from math import sqrt
+import os
+from pathlib import Path
+import subprocess
+import sys
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+
+from src.settings import settings
+from . import memory
+from .schemas import ModelSettings, WhisperModel
+from .spool import AudioSpool, SpooledAudio
+from . import worker
+
+
+logger = getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PoolLayout:
+    workers: int  #: Transcribe processes count
+    threads: int  #: torch intra-op threads of every process
+
+    def __str__(self) -> str:
+        return f"{self.workers} workers x {self.threads} threads"
+
+
+def available_cpus() -> int:
+    """
+    Counts logical CPUs, that the current process is allowed to run on
+
+    :return: logical CPUs count
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def physical_cores() -> int:
+    """
+    Counts physical cores available to the current process. Hyper-threads share execution units of a core,
+    so they barely speed up matrix multiplications, while oversubscribing them slows inference down
+
+    :return: physical cores count, logical CPUs count, if topology is unknown
+    """
+    cpus = available_cpus()
+    if sys.platform == "darwin":
+        try:
+            result = subprocess.run(["sysctl", "-n", "hw.physicalcpu"], capture_output=True, text=True, check=True, timeout=5)
+            return max(1, min(cpus, int(result.stdout)))
+        except (OSError, subprocess.SubprocessError, ValueError):
+            return cpus
+    if hasattr(os, "sched_getaffinity"):
+        cores = set()
+        for cpu in os.sched_getaffinity(0):
+            try:
+                siblings = Path(f"/sys/devices/system/cpu/cpu{cpu}/topology/thread_siblings_list").read_text()
+            except OSError:
+                return cpus
+            cores.add(siblings.strip())
+        return max(1, len(cores))
+    return cpus
+
+
+def threads_per_worker(model: WhisperModel) -> int:
+    """
+    Estimates torch threads count, that a single process of the model keeps busy.
+    Matrices grow with the square root of parameters count: tiny and base get 1 thread, small 2, medium 4, large 6
+
+    :param model: model description
+    :return: threads count
+    """
+    return max(1, round(sqrt(model.parameters / 40)))
+
+
+def default_layout(model: WhisperModel, cores: int) -> PoolLayout:
+    """
+    Splits cores between processes of the model
+
+    :param model: model description
+    :param cores: physical cores count
+    :return: layout, that uses all cores
+    """
+    threads = min(cores, threads_per_worker(model))
+    return PoolLayout(workers=max(1, cores // threads), threads=threads)
+
+
+def candidate_layouts(cores: int, max_workers: Optional[int] = None) -> List[PoolLayout]:
+    """
+    Generates layouts, that use all cores, to calibrate: from a single-threaded process per core
+    to a single process with a thread per core
+
+    :param cores: physical cores count
+    :param max_workers: processes count, which models fit into memory, if known
+    :return: layouts
+    """
+    threads = [2**power for power in range(cores.bit_length()) if 2**power <= cores]
+    if threads[-1] != cores:
+        threads.append(cores)
+    layouts = [PoolLayout(workers=cores // count, threads=count) for count in threads]
+    return [layout for layout in layouts if max_workers is None or layout.workers <= max_workers]
+
+
+class CalibrationStore:
+    """
+    Best layouts, that calibration found on this machine, by model variant and cores count
+    """
+
+    FILE = settings.CACHE_DIR / "calibration.json"
+
+    def __init__(self, path: Path = FILE) -> None:
+        self.logger = getLogger(self.__class__.__name__)
+        self.path = path
+
+    @staticmethod
+    def key(model: WhisperModel, cores: int) -> str:
+        return f"{model.variant}:{cores}"
+
+    def load(self) -> Dict[str, dict]:
+        try:
+            with open(self.path, mode="r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, model: WhisperModel, cores: int) -> Optional[PoolLayout]:
+        """
+        Finds calibrated layout
+
+        :param model: model description
+        :param cores: physical cores count
+        :return: best layout, if the model was calibrated with the same cores count
+        """
+        entry = self.load().get(self.key(model, cores))
+        if entry is None:
+            return None
+        return PoolLayout(workers=entry["workers"], threads=entry["threads"])
+
+    def save(self, model: WhisperModel, cores: int, results: Dict[PoolLayout, float]) -> PoolLayout:
+        """
+        Remembers the layout with the highest throughput
+
+        :param model: model description
+        :param cores: physical cores count
+        :param results: layout -> throughput, audio seconds per second
+        :return: best layout
+        """
+        best = max(results, key=results.get)
+        data = self.load()
+        data[self.key(model, cores)] = {
+            "workers": best.workers,
+            "threads": best.threads,
+            "throughput": results[best],
+            "results": {str(layout): throughput for layout, throughput in results.items()},
+            "created": datetime.now().isoformat(timespec="seconds"),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, mode="w", encoding="utf-8") as file:
+            json.dump(data, file, indent=2)
+        os.replace(tmp, self.path)
+        self.logger.info("Calibrated %s on %s cores: %s", model.variant, cores, best)
+        return best
+
+
+def choose_layout(
+    model: WhisperModel,
+    workers: Optional[int] = None,
+    threads: Optional[int] = None,
+    cores: Optional[int] = None,
+    store: Optional[CalibrationStore] = None,
+) -> PoolLayout:
+    """
+    Chooses transcribe pool layout. Explicit values take precedence, the missing one fills the remaining cores.
+    Otherwise, calibrated layout is used, if any, or the default one
+
+    :param model: model description
+    :param workers: processes count override
+    :param threads: torch threads per process override
+    :param cores: physical cores count, detected if not set
+    :param store: calibration results
+    :return: layout
+    """
+    cores = cores or physical_cores()
+    if workers is not None and threads is not None:
+        return PoolLayout(workers, threads)
+    if workers is not None:
+        return PoolLayout(workers, max(1, cores // workers))
+    if threads is not None:
+        return PoolLayout(max(1, cores // threads), threads)
+    return (store or CalibrationStore()).get(model, cores) or default_layout(model, cores)
+
+
+def measure_throughput(
+    model: WhisperModel, layout: PoolLayout, audio: SpooledAudio, preset: ModelSettings, rounds: int = 2
+) -> float:
+    """
+    Transcribes the same audio in every process of the layout several times
+
+    :param model: model description
+    :param layout: layout to measure
+    :param audio: sample audio
+    :param preset: transcription settings
+    :param rounds: transcriptions per process
+    :return: throughput, audio seconds per second
+    """
+    with ProcessPoolExecutor(layout.workers, initializer=worker.init_worker, initargs=(model, layout.threads)) as pool:
+        # Models are loaded before measurement, and every process transcribes once to warm up
+        wait([pool.submit(worker.transcribe, audio, preset, Path("calibration")) for _ in range(layout.workers)])
+        start = perf_counter()
+        tasks = [pool.submit(worker.transcribe, audio, preset, Path("calibration")) for _ in range(layout.workers * rounds)]
+        for task in tasks:
+            task.result()
+        elapsed = perf_counter() - start
+    return audio.duration * len(tasks) / elapsed
+
+
+def calibrate(
+    model: WhisperModel,
+    sample: Path,
+    preset: ModelSettings,
+    cores: Optional[int] = None,
+    duration: float = 30.0,
+    store: Optional[CalibrationStore] = None,
+) -> Tuple[PoolLayout, Dict[PoolLayout, float]]:
+    """
+    Measures throughput of candidate layouts on a sample recording and remembers the best one.
+    Layouts with more processes, than models fit into available memory, are skipped
+
+    :param model: model description, checkpoint must be downloaded
+    :param sample: recording to transcribe
+    :param preset: transcription settings
+    :param cores: physical cores count, detected if not set
+    :param duration: sample duration to transcribe, seconds. Whisper transcribes 30 seconds windows
+    :param store: calibration results
+    :return: best layout, layout -> throughput
+    """
+    from .audio_processor import AudioPreprocessor
+
+    cores = cores or physical_cores()
+    available = memory.available_memory()
+    max_workers = memory.workers_fit(model, available) if available is not None else None
+    spool = AudioSpool()
+    try:
+        prepared = AudioPreprocessor(spool)(sample, preset)
+        audio = prepared.audio.view(0, min(prepared.audio.length, int(duration * prepared.audio.sr)))
+        results = {}
+        for layout in candidate_layouts(cores, max_workers):
+            results[layout] = measure_throughput(model, layout, audio, preset)
+            logger.info("Calibration of %s with %s: %.2f audio seconds per second", model.variant, layout, results[layout])
+    finally:
+        spool.clear()
+    return (store or CalibrationStore()).save(model, cores, results), results
@@ -2,17 +2,15 @@ from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 import re
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Optional, Sequence, Tuple, Union
 
 import numpy as np
-import polars as pl
-from PyQt6.QtCore import QCoreApplication
-import xlsxwriter
-from yaml import safe_load
 
-from src.settings import settings
+from . import export, static
+from . import mel as mel_spectrogram
 from .model_manager import ModelManager
 from .schemas import ModelSettings
+from .translation import translate
 
 
 class Transcriber(ModelManager):
@@ -25,28 +23,66 @@ class Transcriber(ModelManager):
     def __init__(self) -> None:
         super().__init__()
 
-    def transcribe(self, audio: np.ndarray, preset: ModelSettings, path: Path) -> Tuple[Transcription, Path, ModelSettings]:
+    def transcribe(
+        self, audio: np.ndarray, preset: ModelSettings, path: Path, mel: Optional[np.ndarray] = None
+    ) -> Tuple[Transcription, Path, ModelSettings]:
         """
         Runs transcription with parameters specified in preset
 
         :param audio: numpy audio data
         :param preset: transcription settings
         :param path: filepath
+        :param mel: log-mel spectrogram of the audio, computed by whisper if not set
         :return: transcribed data, filepath, preset
         """
-        result = self.model.transcribe(
-            audio=audio, **preset.model_dump(mode="python", exclude_none=True, by_alias=False, exclude={"name"})
-        )
+        with mel_spectrogram.precomputed(mel):
+            result = self.model.transcribe(audio=audio, **self.transcription_options(preset))
         return self.Transcription(**result), path, preset
 
-    def store_transcription(self, transcription: Transcription, target_dir: Path, filename: str, vad: bool) -> Path:
+    def transcribe_batch(
+        self, items: Sequence[Tuple[np.ndarray, ModelSettings, Path, Optional[np.ndarray]]]
+    ) -> List[Union[Tuple[Transcription, Path, ModelSettings], BaseException]]:
+        """
+        Transcribes several short audio files at once, running the model on their windows as a batch.
+        Results are the same, as if every file was transcribed separately
+
+        :param items: numpy audio data, transcription settings, filepath and log-mel spectrogram, if computed,
+            of every file
+        :return: transcribed data, filepath, preset of every file, or the error, that the file failed with
+        """
+        from . import batching
+
+        results = batching.transcribe_batch(
+            self.model, [(audio, self.transcription_options(preset), mel) for audio, preset, _, mel in items]
+        )
+        return [
+            result if isinstance(result, BaseException) else (self.Transcription(**result), path, preset)
+            for result, (_, preset, path, _) in zip(results, items, strict=True)
+        ]
+
+    @staticmethod
+    def transcription_options(preset: ModelSettings) -> Dict[str, Any]:
+        """
+        Converts preset into `whisper.transcribe` options
+
+        :param preset: transcription settings
+        :return: options
         """
-        Creates export directory in target and stores transcription files
+        return preset.model_dump(mode="python", exclude_none=True, by_alias=False, exclude={"name", "preprocessing"})
+
+    def store_transcription(
+        self, transcription: Transcription, target_dir: Path, filename: str, formats: Sequence[str] = export.DEFAULT_FORMATS
+    ) -> Path:
+        """
+        Creates export directory in target and stores transcription files:
+        full text, meta information and segments in every requested format
+
+        Transcription timings must match the original audio timeline
 
         :param transcription: transcription to store
         :param target_dir: target directory
         :param filename: original filename without extension
-        :param vad: whether VAD was used
+        :param formats: segments export formats, see `export.WRITERS`
         :return: path to export directory
         """
         filename_clear = re.sub(r"\W", "", filename)
@@ -62,27 +98,19 @@ class Transcriber(ModelManager):
         with open(export_dir / (filename_clear + " - Meta.txt"), mode="w", encoding="utf-8") as file:
             file.writelines(
                 [
-                    QCoreApplication.tr("Source") + f": {filename}\n",
-                    QCoreApplication.tr("Language") + f": {transcription.language}\n",
-                    QCoreApplication.tr("Created") + f": {datetime.now().strftime('%d %b %Y, %H:%M')}\n",
+                    translate("Transcriber", "Source") + f": {filename}\n",
+                    translate("Transcriber", "Language") + f": {transcription.language}\n",
+                    translate("Transcriber", "Created") + f": {datetime.now().strftime('%d %b %Y, %H:%M')}\n",
                 ]
-                + (
-                    [
-                        QCoreApplication.tr(
-                            "Segments timings can mismatch audio timings, as voice detection was used to remove silence gaps"
-                        )
-                    ]
-                    if vad
-                    else []
-                )
             )
         self.logger.debug("Saved meta file: %s", filename)
 
         if len(transcription.segments) > 0:
-            segments_df = pl.DataFrame(transcription.segments, orient="row")
-            with xlsxwriter.Workbook(export_dir / (filename_clear + " - Segments.xlsx")) as wb:
-                segments_df.write_excel(wb, worksheet="segments")
-            self.logger.debug("Saved segments file: %s", filename)
+            for segments_format in formats:
+                export.WRITERS[segments_format](
+                    transcription.segments, export_dir / f"{filename_clear} - Segments.{segments_format}"
+                )
+                self.logger.debug("Saved segments file: %s - %s", filename, segments_format)
 
         return export_dir
 
@@ -113,6 +141,13 @@ class Transcriber(ModelManager):
 
         :return: languages (code - name)
         """
-        with open(settings.STATIC_DIR / "transcriber.yaml", mode="r", encoding="utf-8") as file:
-            data = safe_load(file.read())
-        return data["languages"]
+        return static.load("transcriber.yaml")["languages"]
+
+    @staticmethod
+    def load_model_settings_presets() -> List[ModelSettings]:
+        """
+        Loads model settings presets from YAML file
+
+        :return: model settings presets
+        """
+        return list(map(lambda x: ModelSettings(**x), static.load("presets.yaml")["presets"]))
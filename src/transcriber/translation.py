@@ -0,0 +1,20 @@
+import sys
+
+
+def translate(context: str, text: str) -> str:
+    """
+    Translates text via Qt translator, if application runs with Qt loaded.
+    Otherwise, e.g. in headless mode, returns text as is, so that transcriber
+    package never imports Qt by itself
+
+    Call it with literal context and text, so that `pylupdate6` extracts them
+    the same way it extracts `QCoreApplication.translate` calls
+
+    :param context: translation context, usually the name of the class, that uses the text
+    :param text: source text
+    :return: translated text
+    """
+    qt_core = sys.modules.get("PyQt6.QtCore")
+    if qt_core is None:
+        return text
+    return qt_core.QCoreApplication.translate(context, text)
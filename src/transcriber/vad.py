@@ -0,0 +1,190 @@
+"""
+Voice activity detection: finds audio frames, that contain speech
+
+Every detector calculates a feature per frame, that is high for speech. Feature is thresholded
+with hysteresis, threshold may adapt to the file noise floor, and the speech mask is widened
+not to cut off beginnings and endings of words. Detectors are chosen by name in presets settings
+"""
+
+from abc import ABC, abstractmethod
+from logging import getLogger
+from typing import Dict, Tuple, Type
+
+import numpy as np
+from scipy.ndimage import maximum_filter1d
+
+from .schemas import VADSettings
+from .timeline import mask_ranges
+
+
+def hysteresis(features: np.ndarray, high: float, low: float) -> np.ndarray:
+    """
+    Marks frames above `high` threshold and their neighbours, that stay above `low` threshold
+
+    :param features: feature per frame
+    :param high: threshold to start speech at
+    :param low: threshold to continue speech above
+    :return: speech mask
+    """
+    starts, stops = mask_ranges(features > low)
+    seeds = np.concatenate(([0], np.cumsum(features > high)))
+    kept = seeds[stops] - seeds[starts] > 0
+
+    edges = np.zeros(len(features) + 1, dtype=np.int32)
+    np.add.at(edges, starts[kept], 1)
+    np.add.at(edges, stops[kept], -1)
+    return np.cumsum(edges[:-1]) > 0
+
+
+def dilate(mask: np.ndarray, radius: int) -> np.ndarray:
+    """
+    Widens true ranges of mask by `radius` elements at both sides
+
+    :param mask: boolean mask
+    :param radius: elements count
+    :return: widened mask
+    """
+    if radius <= 0 or len(mask) == 0:
+        return mask
+    return maximum_filter1d(mask.view(np.uint8), size=2 * radius + 1, mode="constant").astype(bool)
+
+
+class VoiceActivityDetector(ABC):
+    """
+    Base detector, that splits audio into frames and thresholds frames feature
+    """
+
+    name: str
+    #: Frames count to calculate features of at once, so that memory usage is bounded
+    block_frames: int = 4096
+    #: Count of previous frames, that frame feature depends on
+    context_frames: int = 0
+
+    def __init__(self, settings: VADSettings, sr: int = 16_000, frame_ms: int = 30) -> None:
+        self.logger = getLogger(self.__class__.__name__)
+        self.settings = settings
+        self.frame_ms = frame_ms
+        self.frame_len = int(sr * frame_ms / 1_000)
+
+    @abstractmethod
+    def frame_features(self, frames: np.ndarray) -> np.ndarray:
+        """
+        Calculates feature of every frame
+
+        :param frames: frames of `frame_len` samples
+        :return: feature per frame
+        """
+
+    def features(self, audio: np.ndarray) -> np.ndarray:
+        """
+        Calculates feature of every audio frame, processing frames by blocks
+
+        :param audio: audio data
+        :return: feature per frame
+        """
+        frames = audio[: len(audio) // self.frame_len * self.frame_len].reshape(-1, self.frame_len)
+        result = np.empty(len(frames), dtype=np.float32)
+        for start in range(0, len(frames), self.block_frames):
+            context = min(start, self.context_frames)
+            block = self.frame_features(frames[start - context : start + self.block_frames])
+            result[start : start + self.block_frames] = block[context:]
+        return result
+
+    def thresholds(self, features: np.ndarray) -> Tuple[float, float]:
+        """
+        Calculates thresholds to start and to continue speech at
+
+        :param features: feature per frame
+        :return: high threshold, low threshold
+        """
+        high = self.settings.threshold
+        if self.settings.adaptive and len(features) > 0:
+            noise_floor = float(np.percentile(features, self.settings.noise_percentile))
+            high = max(high, noise_floor * self.settings.noise_margin)
+        return high, high * self.settings.hysteresis
+
+    def detect(self, audio: np.ndarray) -> np.ndarray:
+        """
+        Finds speech frames
+
+        :param audio: audio data
+        :return: whether every frame is kept
+        """
+        features = self.features(audio)
+        high, low = self.thresholds(features)
+        self.logger.debug("Thresholds: %.5f / %.5f", high, low)
+        return dilate(hysteresis(features, high, low), int(self.settings.pad_ms / self.frame_ms))
+
+
+#: Detector name -> detector class
+DETECTORS: Dict[str, Type[VoiceActivityDetector]] = {}
+
+
+def register(cls: Type[VoiceActivityDetector]) -> Type[VoiceActivityDetector]:
+    """
+    Makes detector available by its name in presets settings
+    """
+    DETECTORS[cls.name] = cls
+    return cls
+
+
+def get_detector(settings: VADSettings, sr: int = 16_000, frame_ms: int = 30) -> VoiceActivityDetector:
+    """
+    Creates detector, that settings choose
+
+    :param settings: VAD settings
+    :param sr:
+    :param frame_ms: frame duration
+    :return: detector
+    :raise ValueError: unknown detector name
+    """
+    if settings.detector not in DETECTORS:
+        raise ValueError("Unknown VAD detector %s" % settings.detector)
+    return DETECTORS[settings.detector](settings, sr, frame_ms)
+
+
+@register
+class EnergyDetector(VoiceActivityDetector):
+    """
+    Detects speech by frame mean energy
+    """
+
+    name = "energy"
+
+    def frame_features(self, frames: np.ndarray) -> np.ndarray:
+        return np.einsum("ij,ij->i", frames, frames) / frames.shape[1]
+
+
+@register
+class SpectralFluxDetector(VoiceActivityDetector):
+    """
+    Detects speech by spectral flux: magnitude spectrum growth since the previous frame.
+    Stationary noise, like hum or wind, has low flux regardless of its energy
+    """
+
+    name = "spectral_flux"
+    context_frames = 1
+
+    def __init__(self, settings: VADSettings, sr: int = 16_000, frame_ms: int = 30) -> None:
+        super().__init__(settings, sr, frame_ms)
+        self.window = np.hanning(self.frame_len).astype(np.float32)
+
+    def frame_features(self, frames: np.ndarray) -> np.ndarray:
+        spectra = np.abs(np.fft.rfft(frames * self.window, axis=1))
+        growth = np.diff(spectra, axis=0, prepend=spectra[:1])
+        return np.sum(np.maximum(growth, 0), axis=1) / frames.shape[1]
+
+
+@register
+class ZeroCrossingDetector(EnergyDetector):
+    """
+    Detects speech by frame energy, ignoring frames, which zero-crossing rate is too high for speech,
+    like hiss and other broadband noise
+    """
+
+    name = "zero_crossing"
+
+    def frame_features(self, frames: np.ndarray) -> np.ndarray:
+        crossings = np.count_nonzero(np.diff(np.signbit(frames), axis=1), axis=1) / (frames.shape[1] - 1)
+        energy = super().frame_features(frames)
+        return np.where(crossings <= self.settings.max_zero_crossing_rate, energy, 0)
@@ -0,0 +1,164 @@
+"""
+Transcription worker process state
+
+Functions of the module are executed inside pool processes. Whisper model is loaded
+once by pool initializer and stays resident in the process, so that tasks carry
+only audio data and settings and never pickle the model itself
+"""
+
+from dataclasses import dataclass
+from logging import getLogger
+import os
+from pathlib import Path
+import sys
+from time import perf_counter
+from typing import List, Optional, Sequence, Tuple, Union
+
+from .schemas import ModelSettings, WhisperModel
+from .spool import SpooledAudio, SpooledMel
+from .transcriber import Transcriber
+
+
+logger = getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class WorkerStatus:
+    """
+    Lightweight worker state report, that is sent to the main process instead of the model
+    """
+
+    pid: int
+    model: str
+    load_time: float  #: Model load time, seconds
+    peak_rss: Optional[int]  #: Peak resident memory of the process, bytes
+    threads: Optional[int] = None  #: torch intra-op threads of the process
+    load_rss: Optional[int] = None  #: Resident memory taken by model loading, bytes
+    #: Load time and memory of the original checkpoint, if the model was loaded from memory-mapped one
+    unmapped_load_time: Optional[float] = None
+    unmapped_load_rss: Optional[int] = None
+
+
+_transcriber: Optional[Transcriber] = None
+_status: Optional[WorkerStatus] = None
+
+
+def peak_rss() -> Optional[int]:
+    """
+    Returns peak resident set size of the current process
+
+    :return: peak RSS in bytes, if platform allows to measure it
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, other unix systems report kilobytes
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def current_rss() -> Optional[int]:
+    """
+    Returns resident set size of the current process. Memory-mapped model weights count only once read
+
+    :return: RSS in bytes, peak RSS, if platform does not report the current one
+    """
+    try:
+        with open("/proc/self/statm", mode="r", encoding="utf-8") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return peak_rss()
+
+
+def init_worker(model: WhisperModel, threads: Optional[int] = None) -> None:
+    """
+    Pool initializer: loads model into current process and keeps it for further tasks
+
+    :param model: model description to load
+    :param threads: torch intra-op threads count, torch default if not set
+    """
+    global _transcriber, _status
+
+    # torch and whisper are imported beforehand, so that load time and memory are of the model only
+    import torch
+
+    from . import checkpoints
+
+    rss = current_rss()
+    start = perf_counter()
+    transcriber = Transcriber()
+    transcriber.model = Transcriber.load_model(model)
+    load_time = perf_counter() - start
+    load_rss = current_rss() - rss if rss is not None else None
+    if threads is not None:
+        torch.set_num_threads(threads)
+
+    unmapped = checkpoints.baseline(model.name) if not model.quantized else None
+    _transcriber = transcriber
+    _status = WorkerStatus(
+        pid=os.getpid(),
+        model=model.variant,
+        load_time=load_time,
+        peak_rss=peak_rss(),
+        threads=threads,
+        load_rss=load_rss,
+        unmapped_load_time=unmapped.load_time if unmapped is not None else None,
+        unmapped_load_rss=unmapped.load_rss if unmapped is not None else None,
+    )
+    logger.debug("Worker loaded model: %s", _status)
+
+
+def status() -> WorkerStatus:
+    """
+    Reports state of the current process model
+
+    :return: worker status
+    :raise RuntimeError: process was not initialized with a model
+    """
+    if _status is None:
+        raise RuntimeError("Worker process has not been initialized with a model")
+    return _status
+
+
+def get_transcriber() -> Transcriber:
+    """
+    Returns process-resident transcriber
+
+    :return: transcriber with loaded model
+    :raise RuntimeError: process was not initialized with a model
+    """
+    if _transcriber is None:
+        raise RuntimeError("Worker process has not been initialized with a model")
+    return _transcriber
+
+
+def transcribe(
+    audio: SpooledAudio, preset: ModelSettings, path: Path, mel: Optional[SpooledMel] = None
+) -> Tuple[Transcriber.Transcription, Path, ModelSettings]:
+    """
+    Transcribes audio with the model resident in current process
+
+    :param audio: handle of spooled audio data
+    :param preset: transcription settings
+    :param path: filepath
+    :param mel: handle of spooled log-mel spectrogram of the audio, if it was computed in preparation
+    :return: transcribed data, filepath, preset
+    """
+    return get_transcriber().transcribe(audio.open(), preset, path, mel.open() if mel is not None else None)
+
+
+def transcribe_batch(
+    items: Sequence[Tuple[SpooledAudio, ModelSettings, Path, Optional[SpooledMel]]],
+) -> List[Union[Tuple[Transcriber.Transcription, Path, ModelSettings], BaseException]]:
+    """
+    Transcribes several short audio files at once with the model resident in current process
+
+    :param items: handles of spooled audio data, transcription settings, filepath and handle of spooled
+        log-mel spectrogram, if it was computed in preparation, of every file
+    :return: transcribed data, filepath, preset of every file, or the error, that the file failed with
+    """
+    return get_transcriber().transcribe_batch(
+        [(audio.open(), preset, path, mel.open() if mel is not None else None) for audio, preset, path, mel in items]
+    )
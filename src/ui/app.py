@@ -1,16 +1,21 @@
 from logging import getLogger
-from typing import Tuple
+from typing import TYPE_CHECKING, Optional, Tuple
 
 import PyQt6.QtWidgets as QtW
+from PyQt6.QtCore import QTimer
 from PyQt6.QtGui import QAction
 
 from src.transcriber import Transcriber
+from src.transcriber.journal import JobJournal
 from src.transcriber.schemas import WhisperModel
+from src.transcriber.timing import TimingsLog
 from .elements.tables import AudioFilesTable
-from .elements.selectors import ModelsSelector
+from .elements.selectors import ExportFormatsSelector, ModelsSelector
 from .elements.labels import InformationLabel
 from .windows import TaskWindow, ModelsWindow, AboutWindow
-from .bg import ProcessManager
+
+if TYPE_CHECKING:
+    from .bg import ProcessManager
 
 
 class MainWindowHeading(QtW.QWidget):
@@ -36,6 +41,8 @@ class ModelsSelectionLayout(QtW.QWidget):
         super().__init__(*args, **kwargs)
 
         self.model_selector: ModelsSelector = ModelsSelector().fill(available_models)
+        self.quantized_checkbox = QtW.QCheckBox(self.tr("int8"))
+        self.quantized_checkbox.setToolTip(self.tr("Quantized model runs faster on CPU with slightly different results"))
 
         about_window = ModelsWindow(available_models)
         about_button = QtW.QPushButton(self.tr("About models"))
@@ -43,6 +50,7 @@ class ModelsSelectionLayout(QtW.QWidget):
 
         row_layout = QtW.QHBoxLayout()
         row_layout.addWidget(self.model_selector)
+        row_layout.addWidget(self.quantized_checkbox)
         row_layout.addStretch(1)
         row_layout.addWidget(about_button)
         row_layout.setContentsMargins(*([0] * 4))
@@ -64,11 +72,22 @@ class ModelsSelectionLayout(QtW.QWidget):
         """
         return self.model_selector.currentText()
 
+    @property
+    def quantized(self) -> bool:
+        """
+        Returns whether int8 quantized model is selected
+
+        :return: quantization flag
+        """
+        return self.quantized_checkbox.isChecked()
+
     def freeze(self) -> None:
         self.model_selector.setEnabled(False)
+        self.quantized_checkbox.setEnabled(False)
 
     def unfreeze(self) -> None:
         self.model_selector.setEnabled(True)
+        self.quantized_checkbox.setEnabled(True)
 
 
 class MainWindow(QtW.QMainWindow):
@@ -83,17 +102,16 @@ class MainWindow(QtW.QMainWindow):
         super().__init__()
         self.logger = getLogger(self.__class__.__name__)
         self.transcriber: Transcriber = Transcriber()
-        self.process_manager: ProcessManager = ProcessManager(transcriber=self.transcriber)
-        self.process_manager.signal_task_completed.connect(self.unfreeze)
+        self.journal = JobJournal("app")
+        self.__process_manager: Optional["ProcessManager"] = None
 
         self.model_selection_block = ModelsSelectionLayout(self.transcriber.available_models, parent=self)
         self.file_selector_table: AudioFilesTable = AudioFilesTable(languages=self.transcriber.load_available_languages())
+        self.export_formats_selector = ExportFormatsSelector()
 
         self.running_task_window: TaskWindow = TaskWindow(parent=self)
-        self.process_manager.signal_model_loaded.connect(self.running_task_window.handle_model_ready)
-        self.process_manager.signal_file_prepared.connect(self.running_task_window.handle_file_prepared)
-        self.process_manager.signal_file_transcribed.connect(self.running_task_window.handle_file_transcribed)
-        self.process_manager.signal_task_completed.connect(self.running_task_window.handle_task_complete)
+        self.running_task_window.queued_files_list.move_up_button.clicked.connect(self.move_file_up)
+        self.running_task_window.queued_files_list.cancel_button.clicked.connect(self.cancel_file)
 
         menu = self.menuBar()
         file_menu = menu.addMenu("&File")
@@ -114,6 +132,7 @@ class MainWindow(QtW.QMainWindow):
         layout.addWidget(MainWindowHeading())
         layout.addWidget(self.model_selection_block)
         layout.addWidget(self.file_selector_table)
+        layout.addWidget(self.export_formats_selector)
         layout.addWidget(self.start_button)
 
         widget = QtW.QWidget()
@@ -121,13 +140,39 @@ class MainWindow(QtW.QMainWindow):
         self.setCentralWidget(widget)
         self.set_window_size()
         self.setWindowTitle(self.tr("App name"))
+        QTimer.singleShot(0, self.offer_resume)
+
+    @property
+    def process_manager(self) -> "ProcessManager":
+        """
+        Creates transcription engine on first task, as its modules take long to import
+
+        :return: process manager connected to the window
+        """
+        if self.__process_manager is None:
+            from .bg import ProcessManager
+
+            manager = ProcessManager(transcriber=self.transcriber, journal=self.journal, timings_log=TimingsLog())
+            manager.signal_task_completed.connect(self.unfreeze)
+            manager.signal_model_loaded.connect(self.running_task_window.handle_model_ready)
+            manager.signal_file_prepared.connect(self.running_task_window.handle_file_prepared)
+            manager.signal_file_transcribed.connect(self.running_task_window.handle_file_transcribed)
+            manager.signal_file_failed.connect(self.running_task_window.handle_file_failed)
+            manager.signal_file_cancelled.connect(self.running_task_window.handle_file_cancelled)
+            manager.signal_file_completed.connect(self.running_task_window.handle_file_completed)
+            manager.signal_file_measured.connect(self.running_task_window.handle_file_measured)
+            manager.signal_task_completed.connect(self.running_task_window.handle_task_complete)
+            self.__process_manager = manager
+            self.logger.debug("Created process manager")
+        return self.__process_manager
 
     def on_quit(self) -> None:
         """
         Stops running background tasks before application quit
         """
-        self.process_manager.pool.shutdown(cancel_futures=True, wait=False)
-        self.logger.info("Process pool shutdown")
+        if self.__process_manager is not None:
+            self.__process_manager.shutdown()
+            self.logger.info("Process pools shutdown")
         self.logger.info("App quit")
 
     def run_task(self) -> None:
@@ -138,18 +183,70 @@ class MainWindow(QtW.QMainWindow):
         self.logger.info("Starting task")
         self.freeze()
 
-        files_count = len(self.file_selector_table.files)
-        self.running_task_window.files_count = files_count
+        # Files are processed in the order of the table
+        files = {file: file_data.preset for file, file_data in self.file_selector_table.ordered_files.items()}
+        self.running_task_window.files_count = len(files)
+        self.running_task_window.queued_files_list.set_files(list(files))
         self.running_task_window.show()
 
-        # Prepare for task start
-        self.process_manager.pending = files_count + 1
-
         model_desc = next(
             model for model in self.transcriber.available_models if model.name == self.model_selection_block.current_model
-        )
-        self.process_manager.submit_load_model(model_desc)
-        self.process_manager.submit_prepare_files(self.file_selector_table.files)
+        ).model_copy(update={"quantized": self.model_selection_block.quantized})
+        self.process_manager.export_formats = self.export_formats_selector.formats
+        self.process_manager.start(model_desc, files)
+
+    def move_file_up(self) -> None:
+        """
+        Moves file, that is selected in running task window, ahead of the previous one in processing queue.
+        Files, that are already in progress, keep their place
+        """
+        queue = self.running_task_window.queued_files_list
+        path = queue.selected_path
+        previous = queue.previous_path(path) if path is not None else None
+        if previous is None:
+            return
+        if not self.process_manager.reprioritize(path, queue.priorities[previous]):
+            self.logger.info("File %s is already in progress", path.name)
+            return
+        self.process_manager.reprioritize(previous, queue.priorities[path])
+        queue.move_up(path)
+
+    def cancel_file(self) -> None:
+        """
+        Cancels file, that is selected in running task window, unless it is transcribed already
+        """
+        path = self.running_task_window.queued_files_list.selected_path
+        if path is not None and not self.process_manager.cancel(path):
+            self.logger.info("File %s is already transcribed", path.name)
+
+    def offer_resume(self) -> None:
+        """
+        Offers to resume the task, that was interrupted by application quit or crash
+        """
+        job = self.journal.load()
+        if job is None:
+            return
+
+        model_desc = next((model for model in self.transcriber.available_models if model.name == job.model), None)
+        if model_desc is not None:
+            answer = QtW.QMessageBox.question(
+                self,
+                self.tr("Unfinished task"),
+                self.tr("Previous task was interrupted. Resume it?")
+                + f"\n\n{job.model}: {len(job.remaining)} / {len(job.files)}",
+            )
+        if model_desc is None or answer != QtW.QMessageBox.StandardButton.Yes:
+            self.journal.remove()
+            self.logger.info("Discarded unfinished task")
+            return
+
+        self.logger.info("Resuming unfinished task")
+        model_desc = model_desc.model_copy(update={"quantized": job.quantized})
+        self.freeze()
+        self.running_task_window.files_count = len(job.remaining)
+        self.running_task_window.queued_files_list.set_files(list(job.remaining))
+        self.running_task_window.show()
+        self.process_manager.resume(model_desc, job)
 
     def freeze(self) -> None:
         """
@@ -157,6 +254,7 @@ class MainWindow(QtW.QMainWindow):
         """
         self.model_selection_block.freeze()
         self.file_selector_table.setEnabled(False)
+        self.export_formats_selector.setEnabled(False)
         self.start_button.setEnabled(False)
         self.logger.info("Freeze application")
 
@@ -167,6 +265,7 @@ class MainWindow(QtW.QMainWindow):
         self.model_selection_block.unfreeze()
         self.file_selector_table.clear_files()
         self.file_selector_table.setEnabled(True)
+        self.export_formats_selector.setEnabled(True)
         self.logger.info("Unfreeze application")
 
     def set_window_size(self) -> None:
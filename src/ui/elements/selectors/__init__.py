@@ -1,3 +1,4 @@
 from .language import LanguageSelector
 from .models import ModelsSelector
 from .presets import PresetSelector
+from .export_formats import ExportFormatsSelector
@@ -0,0 +1,31 @@
+from typing import Tuple
+
+import PyQt6.QtWidgets as QtW
+
+from src.transcriber import export
+
+
+class ExportFormatsSelector(QtW.QWidget):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+
+        self.checkboxes = {}
+        layout = QtW.QHBoxLayout()
+        layout.addWidget(QtW.QLabel(self.tr("Segments formats")))
+        layout.addStretch(1)
+        for name in export.WRITERS:
+            checkbox = QtW.QCheckBox(name.upper())
+            checkbox.setChecked(name in export.DEFAULT_FORMATS)
+            self.checkboxes[name] = checkbox
+            layout.addWidget(checkbox)
+        layout.setContentsMargins(*([0] * 4))
+        self.setLayout(layout)
+
+    @property
+    def formats(self) -> Tuple[str, ...]:
+        """
+        Returns checked formats
+
+        :return: segments export formats
+        """
+        return tuple(name for name, checkbox in self.checkboxes.items() if checkbox.isChecked())
@@ -9,9 +9,7 @@ from more_itertools.more import last
 from PyQt6 import QtWidgets as QtW
 from PyQt6.QtCore import Qt, pyqtSignal, QCoreApplication
 from PyQt6.QtGui import QKeySequence, QAction
-from yaml import safe_load
-
-from src.settings import settings
+from src.transcriber import Transcriber
 from src.transcriber.schemas import ModelSettings
 from src.ui.elements.selectors import LanguageSelector, PresetSelector
 
@@ -316,6 +314,4 @@ class AudioFilesTable(QtW.QWidget):
 
         :return: model settings presets
         """
-        with open(settings.STATIC_DIR / "presets.yaml", mode="r", encoding="utf-8") as file:
-            data = safe_load(file.read())
-        return list(map(lambda x: ModelSettings(**x), data["presets"]))
+        return Transcriber.load_model_settings_presets()
@@ -43,6 +43,11 @@ class ModelsWindow(QtW.QDialog):
             ),
             self.tr("Source")
             + ': <a href="https://github.com/openai/whisper/blob/main/README.md#available-models-and-languages">OpenAI</a>',
+            self.tr(
+                "Transcription runs in several processes, which count and threads are chosen from CPU cores, "
+                "available memory and the model size. To find the fastest layout on this machine, run a batch "
+                "from the command line with <code>--calibrate</code> once: the application uses calibrated layouts too"
+            ),
         ]
         for par in paragraphs:
             information.add_paragraph(par)
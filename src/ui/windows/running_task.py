@@ -1,9 +1,11 @@
 from logging import getLogger
 from pathlib import Path
+from typing import Dict, Optional, Sequence
 
 import PyQt6.QtWidgets as QtW
 from PyQt6.QtCore import Qt
 
+from src.transcriber.timing import FileTimings, JobStats
 from src.ui.elements.tables import FileList
 from src.ui.elements.labels import ProcessLabel, ProgressBarLabel
 
@@ -31,18 +33,154 @@ class TranscribedFilesList(QtW.QWidget):
         self.list.add_list_item(path)
         self.label.increase_counter()
 
+    def add_failed_item(self, path: Path) -> None:
+        """
+        Add new item for the file, that cannot be transcribed
+
+        :param path: source file path
+        """
+        self.list.addItem(self.tr("Failed") + f": {path.name}")
+        self.label.increase_counter()
+
+    def add_cancelled_item(self, path: Path) -> None:
+        """
+        Add new item for the file, that was cancelled before transcription
+
+        :param path: source file path
+        """
+        self.list.addItem(self.tr("Cancelled") + f": {path.name}")
+        self.label.increase_counter()
+
+
+class QueuedFilesList(QtW.QWidget):
+    """
+    Files of the task, that are not complete yet, in processing order. Selected file can be moved up or cancelled
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.logger = getLogger(self.__class__.__name__)
+        self.priorities: Dict[Path, int] = {}  #: File -> its priority in processing queue
+
+        self.list = QtW.QListWidget()
+        self.list.currentItemChanged.connect(lambda *_: self.update_buttons())
+        self.move_up_button = QtW.QPushButton(self.tr("Move up"))
+        self.cancel_button = QtW.QPushButton(self.tr("Cancel"))
+
+        buttons_layout = QtW.QHBoxLayout()
+        buttons_layout.addStretch(1)
+        buttons_layout.addWidget(self.move_up_button)
+        buttons_layout.addWidget(self.cancel_button)
+        buttons_layout.setContentsMargins(*([0] * 4))
+        buttons = QtW.QWidget()
+        buttons.setLayout(buttons_layout)
+
+        layout = QtW.QVBoxLayout()
+        layout.addWidget(QtW.QLabel(self.tr("Files queue")))
+        layout.addWidget(self.list)
+        layout.addWidget(buttons)
+        layout.setContentsMargins(*([0] * 4))
+        self.setLayout(layout)
+        self.update_buttons()
+
+    def set_files(self, files: Sequence[Path]) -> None:
+        """
+        Lists files of a new task. Files have priorities of their order
+
+        :param files: files in processing order
+        """
+        self.list.clear()
+        self.priorities = {path: priority for priority, path in enumerate(files)}
+        for path in files:
+            item = QtW.QListWidgetItem(path.name)
+            item.setData(Qt.ItemDataRole.UserRole + 1, path)
+            self.list.addItem(item)
+        self.update_buttons()
+
+    @property
+    def selected_path(self) -> Optional[Path]:
+        """
+        Returns selected file
+
+        :return: file, if any is selected
+        """
+        item = self.list.currentItem()
+        return item.data(Qt.ItemDataRole.UserRole + 1) if item is not None else None
+
+    def previous_path(self, path: Path) -> Optional[Path]:
+        """
+        Finds file, that is processed before the given one
+
+        :param path: listed file
+        :return: previous file, if the file is not the first
+        """
+        row = self.row(path)
+        if row is None or row == 0:
+            return None
+        return self.list.item(row - 1).data(Qt.ItemDataRole.UserRole + 1)
+
+    def row(self, path: Path) -> Optional[int]:
+        """
+        Finds list row of the file
+
+        :param path: file
+        :return: row, if file is listed
+        """
+        for row in range(self.list.count()):
+            if self.list.item(row).data(Qt.ItemDataRole.UserRole + 1) == path:
+                return row
+        return None
+
+    def move_up(self, path: Path) -> None:
+        """
+        Swaps file with the previous one, as well as their priorities
+
+        :param path: listed file, that is not the first
+        """
+        row = self.row(path)
+        previous = self.previous_path(path)
+        if row is None or previous is None:
+            return
+        self.priorities[path], self.priorities[previous] = self.priorities[previous], self.priorities[path]
+        self.list.insertItem(row - 1, self.list.takeItem(row))
+        self.list.setCurrentRow(row - 1)
+
+    def remove_file(self, path: Path) -> None:
+        """
+        Removes complete file from the list
+
+        :param path: source file
+        """
+        row = self.row(path)
+        if row is not None:
+            self.list.takeItem(row)
+        self.priorities.pop(path, None)
+        self.update_buttons()
+
+    def update_buttons(self) -> None:
+        """
+        Enables buttons, if a file is selected
+        """
+        selected = self.selected_path is not None
+        self.move_up_button.setEnabled(selected and self.list.currentRow() > 0)
+        self.cancel_button.setEnabled(selected)
+
 
 class TaskWindow(QtW.QDialog):
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         self.logger = getLogger(self.__class__.__name__)
         self.__files_count = 0
+        self.stats = JobStats()
 
         self.setWindowTitle(self.tr("Running task"))
 
         self.model_label = ProcessLabel(self.tr("Model preparation"), self.tr("Loading"))
         self.prepared_files_counter = ProgressBarLabel(self.tr("Files preparation"))
         self.transcribed_files_list = TranscribedFilesList()
+        self.queued_files_list = QueuedFilesList()
+        self.throughput_label = ProcessLabel(self.tr("Throughput"), "—")
+        self.slowest_stage_label = ProcessLabel(self.tr("Slowest stage"), "—")
 
         self.task_complete_label = QtW.QLabel(self.tr("Task complete"))
         self.task_complete_label.setVisible(False)
@@ -51,14 +189,17 @@ class TaskWindow(QtW.QDialog):
         layout.addWidget(self.model_label)
         layout.addStretch(1)
         layout.addWidget(self.prepared_files_counter)
+        layout.addWidget(self.queued_files_list)
         layout.addWidget(self.transcribed_files_list)
         layout.addStretch(1)
         layout.addWidget(self.transcribed_files_list)
+        layout.addWidget(self.throughput_label)
+        layout.addWidget(self.slowest_stage_label)
         layout.addWidget(self.task_complete_label)
 
         self.setLayout(layout)
         self.setMinimumSize(200, 200)
-        self.resize(350, 350)
+        self.resize(350, 500)
 
     @property
     def files_count(self) -> int:
@@ -74,6 +215,9 @@ class TaskWindow(QtW.QDialog):
         if not isinstance(v, int):
             raise TypeError(f"Cannot use type {type(v)} as int")
         self.__files_count = v
+        self.stats = JobStats()
+        self.throughput_label.update_label("—")
+        self.slowest_stage_label.update_label("—")
 
         self.transcribed_files_list.label.set_max_value(v)
         self.prepared_files_counter.set_max_value(v)
@@ -96,6 +240,14 @@ class TaskWindow(QtW.QDialog):
         """
         self.prepared_files_counter.increase_counter()
 
+    def handle_file_completed(self, signal: Path) -> None:
+        """
+        Removes transcribed, failed or cancelled source file from the queue
+
+        :param signal: source file
+        """
+        self.queued_files_list.remove_file(signal)
+
     def handle_file_transcribed(self, signal: Path) -> None:
         """
         Updates transcribed file elements with new processed path
@@ -104,6 +256,33 @@ class TaskWindow(QtW.QDialog):
         """
         self.transcribed_files_list.add_list_item(signal)
 
+    def handle_file_failed(self, signal: Path) -> None:
+        """
+        Updates transcribed file elements with failed source file
+
+        :param signal: failed source file
+        """
+        self.transcribed_files_list.add_failed_item(signal)
+
+    def handle_file_cancelled(self, signal: Path) -> None:
+        """
+        Updates transcribed file elements with cancelled source file
+
+        :param signal: cancelled source file
+        """
+        self.transcribed_files_list.add_cancelled_item(signal)
+
+    def handle_file_measured(self, signal: FileTimings) -> None:
+        """
+        Updates task throughput and the stage, that takes most of the time
+
+        :param signal: timings of exported file
+        """
+        self.stats.add(signal)
+        self.throughput_label.update_label(f"{self.stats.throughput:.1f} " + self.tr("audio hours per hour"))
+        stage, share = self.stats.slowest_stage
+        self.slowest_stage_label.update_label(f"{stage} ({share:.0%})")
+
     def handle_task_complete(self, signal: bool) -> None:
         """
         Shows/hides task complete label depending on new signal